@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Role, Permission
+from .models import User, Role, Permission, OutgoingEmail
 
 class PermissionInline(admin.TabularInline):
     model = Permission
@@ -37,4 +37,11 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('email', 'username', 'password1', 'password2', 'role', 'first_name', 'last_name', 'avatar'),
         }),
     )
-    ordering = ('email',)
\ No newline at end of file
+    ordering = ('email',)
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
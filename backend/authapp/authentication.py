@@ -0,0 +1,75 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .cache import PERMISSION_VERSION_KEY, USER_SNAPSHOT_KEY, USER_VERSION_KEY, get_version, user_cache
+from .models import Role, User
+
+# Everything request handling reads from request.user. The password and the
+# remaining fields stay deferred and load on first access.
+SNAPSHOT_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar',
+    'is_active', 'is_staff', 'is_superuser', 'role_id',
+)
+SNAPSHOT_TIMEOUT = 3600
+
+
+def _dump(instance, field_names):
+    """Raw DB values in concrete-field order, as Model.from_db expects them."""
+    return {
+        field.attname: field.get_prep_value(getattr(instance, field.attname))
+        for field in instance._meta.concrete_fields
+        if field.attname in field_names
+    }
+
+
+def _load(model, values):
+    return model.from_db('default', list(values), list(values.values()))
+
+
+def make_user_snapshot(user):
+    role = user.role
+    return {
+        'user': _dump(user, SNAPSHOT_FIELDS),
+        'role': _dump(role, ('id', 'name', 'description')) if role else None,
+    }
+
+
+def restore_user_snapshot(snapshot):
+    user = _load(User, snapshot['user'])
+    role = _load(Role, snapshot['role']) if snapshot['role'] else None
+    User.role.field.set_cached_value(user, role)
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user and role from a cached snapshot.
+    The key embeds the user's version and the permission version, so any save
+    or delete of the User, its Role or a Permission moves readers to a new entry.
+    Snapshots live in the 'users' cache: culling them there never drops a
+    global stamp from 'default'.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        store = user_cache()
+        key = USER_SNAPSHOT_KEY.format(
+            user_id,
+            get_version(USER_VERSION_KEY.format(user_id), store),
+            get_version(PERMISSION_VERSION_KEY),
+        )
+        snapshot = store.get(key)
+        if snapshot is None:
+            user = super().get_user(validated_token)
+            store.set(key, make_user_snapshot(user), timeout=SNAPSHOT_TIMEOUT)
+            return user
+
+        user = restore_user_snapshot(snapshot)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,50 @@
+import secrets
+import time
+from django.core.cache import cache, caches
+
+PERMISSION_VERSION_KEY = 'authapp:permission_version'
+USER_VERSION_KEY = 'authapp:user_version:{}'
+REVOCATION_VERSION_KEY = 'authapp:revocation_version'
+USER_SNAPSHOT_KEY = 'authapp:user_snapshot:{}:{}:{}'
+
+
+def new_stamp():
+    # Clock plus random low bits, so stamps from different workers never collide
+    # and a lost key never comes back equal to a stale local copy.
+    return (time.time_ns() << 16) | secrets.randbits(16)
+
+
+def user_cache():
+    """The cache for per-user stamps and snapshots, kept off the global stamps in 'default'."""
+    return caches['users']
+
+
+def get_version(key, store=cache):
+    """Return the shared version stamp stored under ``key``, creating it if missing."""
+    version = store.get(key)
+    if version is None:
+        store.add(key, new_stamp(), timeout=None)
+        version = store.get(key)
+    return version
+
+
+def bump_version(key, store=cache):
+    """
+    Invalidate everything built against ``key`` in every worker. The stamp is
+    replaced with a fresh one in a single write: unlike ``incr`` (a get + set
+    on most backends, which also resets the timeout) two concurrent bumps
+    cannot collapse into one value, and the stamp never expires.
+    """
+    version = new_stamp()
+    store.set(key, version, timeout=None)
+    return version
+
+
+def consume(store, key, expected):
+    """Atomically delete ``key`` if it holds ``expected``; True for exactly one caller."""
+    if hasattr(store, 'delete_if_equal'):
+        return store.delete_if_equal(key, expected)
+    # Best effort for backends without compare-and-delete.
+    if store.get(key) != expected:
+        return False
+    return bool(store.delete(key))
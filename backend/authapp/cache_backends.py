@@ -0,0 +1,112 @@
+import base64
+import pickle
+import time
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connections, router, transaction
+from django.utils.timezone import now as tz_now
+
+
+class SharedDatabaseCache(DatabaseCache):
+    """
+    Database-table cache shared by every worker and host, for state that must
+    not live in one process (OTPs, verification flags, rate-limit counters).
+
+    On top of Django's backend it adds an atomic ``incr``, a compare-and-delete
+    for single-use values and a time-gated sweep of expired rows, which uses the
+    index ``createcachetable`` puts on ``expires``.
+    """
+
+    def __init__(self, table, params):
+        super().__init__(table, params)
+        options = params.get('OPTIONS', {})
+        self._sweep_interval = int(options.get('SWEEP_INTERVAL', 300))
+        self._sweep_chunk_size = int(options.get('SWEEP_CHUNK_SIZE', 1000))
+        self._last_sweep = time.monotonic()
+
+    def _encode(self, value):
+        return base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1')
+
+    def _connection(self):
+        db = router.db_for_write(self.cache_model_class)
+        return db, connections[db]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, value, timeout, version)
+        self._maybe_sweep()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = super().add(key, value, timeout, version)
+        self._maybe_sweep()
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db, connection = self._connection()
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        now = connection.ops.adapt_datetimefield_value(tz_now().replace(microsecond=0))
+        select = "SELECT %s FROM %s WHERE %s = %%s AND %s > %%s" % (
+            quote_name('value'), table, quote_name('cache_key'), quote_name('expires'),
+        )
+        if connection.features.has_select_for_update:
+            select += " FOR UPDATE"
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.execute(select, [key, now])
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(base64.b64decode(row[0].encode())) + delta
+            cursor.execute(
+                "UPDATE %s SET %s = %%s WHERE %s = %%s"
+                % (table, quote_name('value'), quote_name('cache_key')),
+                [self._encode(value), key],
+            )
+        return value
+
+    def delete_if_equal(self, key, value, version=None):
+        """
+        Delete ``key`` only if it is live and currently holds ``value``.
+        Returns True for exactly one caller, so the value can be consumed once.
+        """
+        key = self.make_and_validate_key(key, version=version)
+        db, connection = self._connection()
+        quote_name = connection.ops.quote_name
+        now = connection.ops.adapt_datetimefield_value(tz_now().replace(microsecond=0))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM %s WHERE %s = %%s AND %s = %%s AND %s > %%s"
+                % (quote_name(self._table), quote_name('cache_key'), quote_name('value'), quote_name('expires')),
+                [key, self._encode(value), now],
+            )
+            return cursor.rowcount == 1
+
+    def sweep(self):
+        """Delete expired rows in chunks; returns how many were removed."""
+        db, connection = self._connection()
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        now = connection.ops.adapt_datetimefield_value(tz_now().replace(microsecond=0))
+        deleted = 0
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute(
+                    "SELECT %s FROM %s WHERE %s < %%s LIMIT %d"
+                    % (quote_name('cache_key'), table, quote_name('expires'), self._sweep_chunk_size),
+                    [now],
+                )
+                keys = [row[0] for row in cursor.fetchall()]
+                if not keys:
+                    break
+                cursor.execute(
+                    "DELETE FROM %s WHERE %s IN (%s) AND %s < %%s"
+                    % (table, quote_name('cache_key'), ', '.join(['%s'] * len(keys)), quote_name('expires')),
+                    keys + [now],
+                )
+                deleted += cursor.rowcount
+        self._last_sweep = time.monotonic()
+        return deleted
+
+    def _maybe_sweep(self):
+        if self._sweep_interval and time.monotonic() - self._last_sweep >= self._sweep_interval:
+            self.sweep()
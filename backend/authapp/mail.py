@@ -0,0 +1,15 @@
+from django.conf import settings
+from .models import OutgoingEmail
+
+
+def enqueue_email(subject, message, recipient_list, from_email=None):
+    """
+    Queue an email for the ``send_outbox`` worker instead of talking SMTP
+    inside the request.
+    """
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        message=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+        recipients=list(recipient_list),
+    )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from authapp.revocation import prune_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked-token entries whose tokens have expired anyway.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = prune_revoked_tokens(options['chunk_size'])
+        self.stdout.write(f"Pruned {deleted} revoked tokens")
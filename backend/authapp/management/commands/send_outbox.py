@@ -0,0 +1,127 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from authapp.models import OutgoingEmail
+
+UPDATE_FIELDS = ['message', 'status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+LEASE_MARGIN = 60  # seconds on top of the worst case, for the bulk_update and clock skew
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails in batches over one reused SMTP connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when nothing is due.')
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--backoff', type=float, default=30, help='Base retry delay in seconds, doubled per attempt.')
+        parser.add_argument(
+            '--lease', type=float,
+            help='Seconds a claimed batch stays with this worker before another may pick it up. '
+                 'Defaults to (batch size + 1) x EMAIL_TIMEOUT plus a margin; shorter values are refused.',
+        )
+        parser.add_argument('--once', action='store_true', help='Send everything currently due, then exit.')
+
+    def handle(self, *args, **options):
+        options['lease'] = self.batch_lease(options)
+        while True:
+            processed = self.send_batch(options)
+            if processed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+    def batch_lease(self, options):
+        """
+        The lease must outlast the slowest possible batch (the connection and
+        every message each running into EMAIL_TIMEOUT), or another worker
+        re-claims mail that is still being sent and delivers it twice.
+        """
+        timeout = settings.EMAIL_TIMEOUT
+        if timeout is None:
+            if options['lease'] is None:
+                raise CommandError('EMAIL_TIMEOUT is not set, so a batch has no worst case; pass --lease.')
+            return options['lease']
+        worst = (options['batch_size'] + 1) * timeout
+        if options['lease'] is None:
+            return worst + LEASE_MARGIN
+        if options['lease'] < worst:
+            raise CommandError(
+                f"--lease {options['lease']:g}s is shorter than a worst-case batch "
+                f"({options['batch_size']} emails x EMAIL_TIMEOUT {timeout}s); use at least {worst}s."
+            )
+        return options['lease']
+
+    def claim_batch(self, options):
+        """
+        Mark due rows as ``sending`` until the lease runs out, in a transaction
+        that only lasts as long as the claim. A worker that dies mid-batch
+        leaves its rows to be picked up again once the lease expires.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            # skip_locked lets several workers claim at once without waiting on each other.
+            batch = list(
+                OutgoingEmail.objects.select_for_update(skip_locked=True)
+                .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:options['batch_size']]
+            )
+            OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                status='sending', next_attempt_at=now + timedelta(seconds=options['lease'])
+            )
+        for email in batch:
+            email.status = 'pending'
+        return batch
+
+    def send_batch(self, options):
+        batch = self.claim_batch(options)
+        if not batch:
+            return 0
+
+        # SMTP happens outside any transaction, so a slow server holds no row locks.
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            for email in batch:
+                self.record_failure(email, e, options)
+        else:
+            try:
+                for email in batch:
+                    self.send_one(connection, email, options)
+            finally:
+                connection.close()
+
+        OutgoingEmail.objects.bulk_update(batch, UPDATE_FIELDS)
+
+        sent = sum(1 for email in batch if email.status == 'sent')
+        self.stdout.write(f"Sent {sent} of {len(batch)} emails")
+        return len(batch)
+
+    def send_one(self, connection, email, options):
+        try:
+            EmailMessage(
+                email.subject, email.message, email.from_email, email.recipients, connection=connection
+            ).send()
+        except Exception as e:
+            self.record_failure(email, e, options)
+            return
+        email.status = 'sent'
+        email.sent_at = timezone.now()
+        email.last_error = ''
+        # Bodies carry OTPs and generated passwords; keep only the delivery record.
+        email.message = ''
+
+    def record_failure(self, email, error, options):
+        email.attempts += 1
+        email.last_error = str(error)
+        if email.attempts >= options['max_attempts']:
+            email.status = 'failed'
+        else:
+            delay = options['backoff'] * 2 ** (email.attempts - 1)
+            email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
@@ -0,0 +1,16 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Delete expired rows from the shared database cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='shared')
+
+    def handle(self, *args, **options):
+        store = caches[options['alias']]
+        if not hasattr(store, 'sweep'):
+            self.stdout.write(f"Cache '{options['alias']}' does not support sweeping")
+            return
+        self.stdout.write(f"Removed {store.sweep()} expired entries")
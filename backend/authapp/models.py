@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .cache import PERMISSION_VERSION_KEY, USER_VERSION_KEY, bump_version, user_cache
 
 class Role(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -45,6 +47,39 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+class OutgoingEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.jti
+
 @receiver(post_save, sender=Role)
 def set_default_permissions(sender, instance, created, **kwargs):
     if created:
@@ -52,9 +87,9 @@ def set_default_permissions(sender, instance, created, **kwargs):
             {'page': 'dashboard', 'can_view': True},
             {'page': 'profile', 'can_view': True},
         ]
-        for perm in default_permissions:
-            try:
-                Permission.objects.create(
+        try:
+            Permission.objects.bulk_create([
+                Permission(
                     role=instance,
                     page=perm['page'],
                     can_view=perm['can_view'],
@@ -63,5 +98,19 @@ def set_default_permissions(sender, instance, created, **kwargs):
                     can_delete=False,
                     is_login_page=False
                 )
-            except Exception as e:
-                print(f"Error creating permission for {perm['page']}: {str(e)}")
\ No newline at end of file
+                for perm in default_permissions
+            ])
+        except Exception as e:
+            print(f"Error creating default permissions for {instance.name}: {str(e)}")
+
+@receiver([post_save, post_delete], sender=Role)
+@receiver([post_save, post_delete], sender=Permission)
+def invalidate_permission_matrix(sender, **kwargs):
+    # Covers the is_login_page UPDATE in Permission.save, which runs inside the same save.
+    # Bump after commit so no worker recompiles from rows that are not visible yet.
+    transaction.on_commit(lambda: bump_version(PERMISSION_VERSION_KEY))
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_version(sender, instance, **kwargs):
+    key = USER_VERSION_KEY.format(instance.pk)
+    transaction.on_commit(lambda: bump_version(key, user_cache()))
@@ -1,23 +1,118 @@
-from django.contrib.auth.models import User
+import threading
+from rest_framework.permissions import BasePermission
+from .cache import PERMISSION_VERSION_KEY, get_version
 from .models import Permission
 
-def has_permission(user, page, action='can_view'):
+ACTIONS = ('can_view', 'can_add', 'can_edit', 'can_delete')
+ACTION_BITS = {action: 1 << index for index, action in enumerate(ACTIONS)}
+
+_compiled = {'version': None, 'roles': {}}
+_compile_lock = threading.Lock()
+
+
+def compile_permissions():
+    """Build the role -> page -> action matrix from a single query."""
+    roles = {}
+    rows = Permission.objects.values_list('role_id', 'role__name', 'page', *ACTIONS, 'is_login_page')
+    for role_id, role_name, page, *flags, is_login_page in rows:
+        role = roles.setdefault(role_id, {'name': role_name, 'pages': {}, 'login_page': None})
+        role['pages'][page] = dict(zip(ACTIONS, flags))
+        if is_login_page:
+            role['login_page'] = page
+    return roles
+
+
+def get_compiled_permissions():
+    """Return ``{'version', 'roles'}``, rebuilding only when the shared version moved."""
+    global _compiled
+    version = get_version(PERMISSION_VERSION_KEY)
+    if _compiled['version'] != version:
+        with _compile_lock:
+            if _compiled['version'] != version:
+                _compiled = {'version': version, 'roles': compile_permissions()}
+    return _compiled
+
+
+def get_permission_matrix():
+    return get_compiled_permissions()['roles']
+
+
+def get_role_permissions(role_id):
+    """Return ``{page: {action: bool}}`` for a role."""
+    if not role_id:
+        return {}
+    return get_permission_matrix().get(role_id, {}).get('pages', {})
+
+
+def pack_permission_claims(user):
+    """Encode the user's role matrix as JWT claims: one action bitmask per page."""
+    compiled = get_compiled_permissions()
+    pages = compiled['roles'].get(user.role_id, {}).get('pages', {})
+    return {
+        'role_id': user.role_id,
+        'perm_v': compiled['version'],
+        'perms': {
+            page: sum(bit for action, bit in ACTION_BITS.items() if flags[action])
+            for page, flags in pages.items()
+        },
+    }
+
+
+def claims_permission(user, token, page, action):
+    """
+    Answer from the token's permission claims, or return None when the token
+    carries none or they were issued against an older version or role.
+    """
+    if token is None or 'perm_v' not in token:
+        return None
+    if token.get('role_id') != getattr(user, 'role_id', None):
+        return None
+    if token['perm_v'] != get_version(PERMISSION_VERSION_KEY):
+        return None
+    return bool(token.get('perms', {}).get(page, 0) & ACTION_BITS[action])
+
+
+def has_permission(user, page, action='can_view', token=None):
     if user.is_superuser:
         return True
-    if not user.role:
-        print(f"No role assigned to user {user.email}")
-        return False
-    has_perm = Permission.objects.filter(
-        role=user.role,
-        page=page,
-        **{action: True}
-    ).exists()
-    print(f"User {user.email} permission check for {page} {action}: {has_perm}")
-    return has_perm
+    allowed = claims_permission(user, token, page, action)
+    if allowed is not None:
+        return allowed
+    return get_role_permissions(getattr(user, 'role_id', None)).get(page, {}).get(action, False)
+
 
 def get_role_login_page(role):
     """Retrieve the designated login page for a role."""
     if not role:
         return None
-    permission = Permission.objects.filter(role=role, is_login_page=True).first()
-    return permission.page if permission else None
\ No newline at end of file
+    return get_permission_matrix().get(role.pk, {}).get('login_page')
+
+
+class HasPagePermission(BasePermission):
+    """
+    Check the action mapped to the request method against ``view.page_name``.
+    Methods missing from ``method_actions`` are always allowed.
+    """
+    method_actions = {
+        'POST': 'can_add',
+        'PATCH': 'can_edit',
+        'DELETE': 'can_delete',
+    }
+
+    def has_permission(self, request, view):
+        action = self.method_actions.get(request.method)
+        if action is None:
+            return True
+        return has_permission(request.user, getattr(view, 'page_name', ''), action, request.auth)
+
+
+class HasAddPermission(HasPagePermission):
+    method_actions = {'POST': 'can_add'}
+
+
+class HasEditPermission(HasPagePermission):
+    method_actions = {'PATCH': 'can_edit'}
+
+
+class HasDeletePermission(HasPagePermission):
+    method_actions = {'DELETE': 'can_delete'}
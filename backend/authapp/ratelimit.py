@@ -0,0 +1,39 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+def get_client_ip(request):
+    """
+    Client address as DRF throttles see it. X-Forwarded-For is only trusted
+    for the ``REST_FRAMEWORK['NUM_PROXIES']`` hops our own proxies add.
+    """
+    return BaseThrottle().get_ident(request)
+
+
+def is_rate_limited(scope, ident, limit=None, window=None):
+    """
+    Record a hit for ``ident`` under ``scope`` and report whether it exceeds the limit.
+
+    Uses a sliding-window counter: the current fixed window's count plus the
+    previous window's count weighted by how much of it still overlaps.
+    Limits default to ``settings.RATE_LIMITS[scope]`` as ``(limit, window_seconds)``.
+    """
+    if limit is None or window is None:
+        limit, window = settings.RATE_LIMITS[scope]
+    store = caches['shared']
+    now = time.time()
+    current = int(now // window)
+    key = f"ratelimit:{scope}:{ident}:{{}}"
+
+    store.add(key.format(current), 0, timeout=window * 2)
+    try:
+        count = store.incr(key.format(current))
+    except ValueError:
+        # Expired between add and incr; start the window again.
+        store.set(key.format(current), 1, timeout=window * 2)
+        count = 1
+    previous = store.get(key.format(current - 1), 0)
+    overlap = 1 - (now % window) / window
+    return previous * overlap + count > limit
@@ -0,0 +1,88 @@
+import hashlib
+import math
+import threading
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from .cache import REVOCATION_VERSION_KEY, bump_version, get_version
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing of one blake2b digest."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+_state = {'version': None, 'filter': BloomFilter(1)}
+_state_lock = threading.Lock()
+
+
+def get_revocation_filter():
+    """Return this process's filter of live revoked jtis, rebuilt when the shared version moves."""
+    global _state
+    version = get_version(REVOCATION_VERSION_KEY)
+    if _state['version'] != version:
+        with _state_lock:
+            if _state['version'] != version:
+                jtis = list(
+                    RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('jti', flat=True)
+                )
+                # Leave headroom so revocations added locally keep the false-positive rate low.
+                bloom = BloomFilter(max(len(jtis) * 2, 1024))
+                for jti in jtis:
+                    bloom.add(jti)
+                _state = {'version': version, 'filter': bloom}
+    return _state['filter']
+
+
+def is_revoked(jti):
+    """The filter answers the common not-revoked case; only possible hits reach the DB."""
+    if jti not in get_revocation_filter():
+        return False
+    return RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+
+
+def revoke(token):
+    """Revoke a validated token until its own expiry."""
+    jti = token.payload[api_settings.JTI_CLAIM]
+    revoked, _ = RevokedToken.objects.get_or_create(
+        jti=jti, defaults={'expires_at': datetime_from_epoch(token.payload['exp'])}
+    )
+    get_revocation_filter().add(jti)
+    transaction.on_commit(lambda: bump_version(REVOCATION_VERSION_KEY))
+    return revoked
+
+
+def prune_revoked_tokens(chunk_size=1000):
+    """Delete entries past their token's expiry, oldest first; returns the number removed."""
+    deleted = 0
+    while True:
+        ids = list(
+            RevokedToken.objects.filter(expires_at__lte=timezone.now())
+            .order_by('expires_at').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        deleted += RevokedToken.objects.filter(id__in=ids).delete()[0]
+    if deleted:
+        bump_version(REVOCATION_VERSION_KEY)
+    return deleted
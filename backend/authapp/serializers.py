@@ -1,11 +1,15 @@
 from rest_framework import serializers
 from .models import User, Role, Permission
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 import string
 import random
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from .permissions import ACTIONS, pack_permission_claims
+from .cache import PERMISSION_VERSION_KEY, bump_version
+from .mail import enqueue_email
+from .tokens import RevocableRefreshToken
 
 class PermissionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,6 +21,81 @@ class PermissionSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Login page must have view permission enabled.")
         return data
 
+def apply_permission_matrix(role, entries):
+    """
+    Upsert a role's page permissions with one bulk insert and one bulk update.
+    Each entry is a dict with ``page``, the action flags and optionally
+    ``is_login_page``; at most one entry may set it, and it then clears the
+    flag on every other page of the role. Bulk writes skip signals, so the
+    version is bumped here.
+    """
+    fields = list(ACTIONS) + ['is_login_page']
+    login_pages = [entry['page'] for entry in entries if entry.get('is_login_page')]
+    if len(login_pages) > 1:
+        raise ValueError("Only one page can be the login page.")
+    to_create, to_update = [], {}
+
+    with transaction.atomic():
+        # Locked so a concurrent login-page change can't slip in between this read and the writes.
+        existing = {perm.page: perm for perm in Permission.objects.select_for_update().filter(role=role)}
+        for entry in entries:
+            perm = existing.get(entry['page'])
+            if perm is None:
+                to_create.append(Permission(
+                    role=role, page=entry['page'], **{field: entry.get(field, False) for field in fields}
+                ))
+                continue
+            changed = [field for field in fields if field in entry and getattr(perm, field) != entry[field]]
+            for field in changed:
+                setattr(perm, field, entry[field])
+            if changed:
+                to_update[perm.page] = perm
+
+        if login_pages:
+            # Decide the flag on every row here, so the bulk writes can't restore a stale one.
+            for perm in to_create:
+                perm.is_login_page = perm.page == login_pages[0]
+            for perm in existing.values():
+                is_login_page = perm.page == login_pages[0]
+                if perm.is_login_page != is_login_page:
+                    perm.is_login_page = is_login_page
+                    to_update[perm.page] = perm
+        if to_create:
+            Permission.objects.bulk_create(to_create)
+        if to_update:
+            Permission.objects.bulk_update(list(to_update.values()), fields)
+        transaction.on_commit(lambda: bump_version(PERMISSION_VERSION_KEY))
+    return to_create, list(to_update.values())
+
+class PermissionMatrixEntrySerializer(serializers.Serializer):
+    page = serializers.CharField(max_length=100)
+    can_view = serializers.BooleanField(default=False)
+    can_add = serializers.BooleanField(default=False)
+    can_edit = serializers.BooleanField(default=False)
+    can_delete = serializers.BooleanField(default=False)
+    is_login_page = serializers.BooleanField(required=False)
+
+    def validate(self, data):
+        if data.get('is_login_page') and not data.get('can_view'):
+            raise serializers.ValidationError("Login page must have view permission enabled.")
+        return data
+
+class PermissionBulkSerializer(serializers.Serializer):
+    role = serializers.PrimaryKeyRelatedField(queryset=Role.objects.all())
+    permissions = PermissionMatrixEntrySerializer(many=True)
+
+    def validate_permissions(self, value):
+        pages = [entry['page'] for entry in value]
+        if len(pages) != len(set(pages)):
+            raise serializers.ValidationError("Each page may only appear once.")
+        if sum(1 for entry in value if entry.get('is_login_page')) > 1:
+            raise serializers.ValidationError("Only one page can be the login page.")
+        return value
+
+    def create(self, validated_data):
+        apply_permission_matrix(validated_data['role'], validated_data['permissions'])
+        return validated_data['role']
+
 class RoleCreateSerializer(serializers.ModelSerializer):
     permissions = PermissionSerializer(many=True, required=False)
 
@@ -25,14 +104,21 @@ class RoleCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'description', 'permissions')
         read_only_fields = ('id',)
 
+    def validate_permissions(self, value):
+        if sum(1 for entry in value if entry.get('is_login_page')) > 1:
+            raise serializers.ValidationError("Only one page can be the login page.")
+        return value
+
     def create(self, validated_data):
         permissions_data = validated_data.pop('permissions', [])
-        role = Role.objects.create(**validated_data)
-        
-        if permissions_data:
-            for perm_data in permissions_data:
-                Permission.objects.create(role=role, **perm_data)
-        
+        with transaction.atomic():
+            role = Role.objects.create(**validated_data)
+            if permissions_data:
+                # Upsert, since set_default_permissions has already added its rows.
+                apply_permission_matrix(role, [
+                    {key: value for key, value in perm_data.items() if key != 'role'}
+                    for perm_data in permissions_data
+                ])
         return role
 
     def to_representation(self, instance):
@@ -67,6 +153,18 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
+class UserListSerializer(serializers.ModelSerializer):
+    role_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = ('id', 'email', 'username', 'first_name', 'last_name', 'avatar', 'role_id')
+
+class SessionUserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'email', 'username', 'first_name', 'last_name', 'avatar', 'is_superuser')
+
 class UserCreateSerializer(serializers.ModelSerializer):
     role_id = serializers.PrimaryKeyRelatedField(
         queryset=Role.objects.all(), source='role', required=True
@@ -94,29 +192,25 @@ class UserCreateSerializer(serializers.ModelSerializer):
             f'Please log in at {settings.FRONTEND_URL}/login and change your password after your first login.\n\n'
             f'Regards,\nYour Team'
         )
-        from_email = settings.DEFAULT_FROM_EMAIL
-        recipient_list = [user.email]
- 
-        try:
-            send_mail(
-                subject,
-                message,
-                from_email,
-                recipient_list,
-                fail_silently=False,
-            )
-        except Exception as e:
-            print(f"Failed to send email: {str(e)}")
+        enqueue_email(subject, message, [user.email])
  
         return user
     
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RevocableRefreshToken
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
         token['role'] = user.role.name if user.role else None
+        if settings.JWT_PERMISSION_CLAIMS:
+            for claim, value in pack_permission_claims(user).items():
+                token[claim] = value
         return token
 
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
+
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
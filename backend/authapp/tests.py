@@ -1,3 +1,442 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache, caches
+from django.conf import settings
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from .authentication import CachedJWTAuthentication
+from .cache import PERMISSION_VERSION_KEY, USER_SNAPSHOT_KEY, USER_VERSION_KEY, bump_version, get_version
+from .mail import enqueue_email
+from .management.commands.send_outbox import Command as SendOutbox
+from .models import OutgoingEmail, Permission, RevokedToken, Role, User
+from .permissions import (
+    ACTION_BITS, claims_permission, get_compiled_permissions, get_role_login_page, get_role_permissions,
+    has_permission,
+)
+from .ratelimit import get_client_ip, is_rate_limited
+from .revocation import BloomFilter, is_revoked, prune_revoked_tokens
+from .serializers import CustomTokenObtainPairSerializer, PermissionBulkSerializer, RoleCreateSerializer
+from .throttling import get_hash_avoided_counts
+from .tokens import RevocableAccessToken, RevocableRefreshToken
 
-# Create your tests here.
+# Keep tests off the on-disk caches the running site uses; "shared" is the test database.
+TEST_CACHES = {
+    **settings.CACHES,
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'authapp-tests'},
+    'users': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'authapp-tests-users'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class VersionStampTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_replaces_stamp(self):
+        before = get_version(PERMISSION_VERSION_KEY)
+        after = bump_version(PERMISSION_VERSION_KEY)
+        self.assertNotEqual(before, after)
+        self.assertEqual(get_version(PERMISSION_VERSION_KEY), after)
+
+    def test_bumped_stamp_never_expires(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            bump_version(PERMISSION_VERSION_KEY)
+        self.assertIsNone(cache_set.call_args.kwargs['timeout'])
+
+    def test_bumps_never_repeat(self):
+        stamps = {bump_version(PERMISSION_VERSION_KEY) for _ in range(100)}
+        self.assertEqual(len(stamps), 100)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CompiledPermissionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.role = Role.objects.create(name='Operator')
+
+    def test_matrix_follows_permission_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            perm = Permission.objects.create(role=self.role, page='valves', can_view=True)
+        self.assertEqual(
+            get_role_permissions(self.role.id)['valves'],
+            {'can_view': True, 'can_add': False, 'can_edit': False, 'can_delete': False},
+        )
+        version = get_compiled_permissions()['version']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            perm.can_edit = True
+            perm.is_login_page = True
+            perm.save()
+        self.assertNotEqual(get_compiled_permissions()['version'], version)
+        self.assertTrue(get_role_permissions(self.role.id)['valves']['can_edit'])
+        self.assertEqual(get_role_login_page(self.role), 'valves')
+
+    def test_unknown_role_has_no_pages(self):
+        self.assertEqual(get_role_permissions(None), {})
+        self.assertEqual(get_role_permissions(self.role.id + 1), {})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PermissionMatrixTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.role = Role.objects.create(name='Operator')
+        Permission.objects.update_or_create(
+            role=self.role, page='dashboard', defaults={'can_view': True, 'is_login_page': True},
+        )
+
+    def apply(self, permissions):
+        serializer = PermissionBulkSerializer(data={'role': self.role.id, 'permissions': permissions})
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+
+    def test_new_login_page_replaces_old_one_in_same_update(self):
+        self.apply([
+            {'page': 'dashboard', 'can_view': True, 'can_add': True},
+            {'page': 'complaints', 'can_view': True, 'is_login_page': True},
+        ])
+        login_pages = Permission.objects.filter(role=self.role, is_login_page=True).values_list('page', flat=True)
+        self.assertEqual(list(login_pages), ['complaints'])
+        self.assertTrue(Permission.objects.get(role=self.role, page='dashboard').can_add)
+        self.assertEqual(get_role_login_page(self.role), 'complaints')
+        self.assertTrue(get_role_permissions(self.role.id)['dashboard']['can_add'])
+
+    def test_update_without_login_page_keeps_it(self):
+        self.apply([{'page': 'dashboard', 'can_view': True, 'can_edit': True}])
+        self.assertTrue(Permission.objects.get(role=self.role, page='dashboard').is_login_page)
+
+    def test_more_than_one_login_page_is_rejected(self):
+        permissions = [
+            {'page': 'dashboard', 'can_view': True, 'is_login_page': True},
+            {'page': 'complaints', 'can_view': True, 'is_login_page': True},
+        ]
+        bulk = PermissionBulkSerializer(data={'role': self.role.id, 'permissions': permissions})
+        self.assertFalse(bulk.is_valid())
+        # The nested serializer wants an existing role and checks (role, page) is unused.
+        nested = [{**entry, 'role': self.role.id, 'page': f"{entry['page']}-new"} for entry in permissions]
+        role = RoleCreateSerializer(data={'name': 'Viewer', 'permissions': nested})
+        self.assertFalse(role.is_valid())
+        self.assertEqual(role.errors['permissions'], ['Only one page can be the login page.'])
+
+
+@override_settings(CACHES=TEST_CACHES, JWT_PERMISSION_CLAIMS=True)
+class PermissionClaimTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.role = Role.objects.create(name='Operator')
+        Permission.objects.create(role=self.role, page='valves', can_view=True, can_edit=True)
+        self.user = User.objects.create_user(email='op@example.com', username='op', password='pw', role=self.role)
+
+    def claims(self):
+        return dict(CustomTokenObtainPairSerializer.get_token(self.user).access_token.payload)
+
+    def test_token_carries_permission_bitmap(self):
+        token = self.claims()
+        self.assertEqual(token['role_id'], self.role.id)
+        self.assertEqual(token['perms']['valves'], ACTION_BITS['can_view'] | ACTION_BITS['can_edit'])
+        self.assertTrue(claims_permission(self.user, token, 'valves', 'can_edit'))
+        self.assertFalse(claims_permission(self.user, token, 'valves', 'can_delete'))
+
+    def test_claims_from_older_version_are_ignored(self):
+        token = self.claims()
+        with self.captureOnCommitCallbacks(execute=True):
+            Permission.objects.filter(role=self.role).update(can_delete=True)
+            bump_version(PERMISSION_VERSION_KEY)
+        self.assertIsNone(claims_permission(self.user, token, 'valves', 'can_delete'))
+        self.assertTrue(has_permission(self.user, 'valves', 'can_delete', token))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SessionETagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='s@example.com', username='s', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_revalidation(self):
+        response = self.client.get('/api/auth/session/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(header=header):
+                self.assertEqual(self.client.get('/api/auth/session/', HTTP_IF_NONE_MATCH=header).status_code, 304)
+
+    def test_partial_or_changed_tags_do_not_match(self):
+        etag = self.client.get('/api/auth/session/')['ETag']
+        for header in (f'"x{etag[1:-1]}x"', etag[1:-1], '"other"'):
+            with self.subTest(header=header):
+                self.assertEqual(self.client.get('/api/auth/session/', HTTP_IF_NONE_MATCH=header).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Changed'
+            self.user.save()
+        self.assertEqual(self.client.get('/api/auth/session/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class UserListingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.role = Role.objects.create(name='Operator')
+        self.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pw')
+        for i in range(5):
+            User.objects.create_user(
+                email=f'user{i}@example.com', username=f'user{i}', password='pw',
+                role=self.role if i % 2 else None,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_cursor_pages_cover_every_user_once(self):
+        seen, url = [], '/api/auth/users/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [user['id'] for user in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, sorted(User.objects.values_list('id', flat=True)))
+
+    def test_search_and_role_filter_on_server(self):
+        response = self.client.get('/api/auth/users/', {'search': 'user3'})
+        self.assertEqual([user['username'] for user in response.data['results']], ['user3'])
+
+        response = self.client.get('/api/auth/users/', {'role': self.role.id})
+        self.assertEqual({user['username'] for user in response.data['results']}, {'user1', 'user3'})
+        self.assertEqual(list(response.data['roles']), [self.role.id])
+        self.assertEqual(self.client.get('/api/auth/users/', {'role': 'abc'}).status_code, 400)
+
+
+class OutboxTests(TestCase):
+    options = {'batch_size': 50, 'max_attempts': 3, 'backoff': 30, 'lease': 300}
+
+    def test_sends_due_mail_and_drops_body(self):
+        email = enqueue_email('OTP', 'code 123456', ['a@example.com'])
+        call_command('send_outbox', '--once', stdout=StringIO())
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'sent')
+        self.assertEqual(email.message, '')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, 'code 123456')
+
+    def test_claimed_rows_are_leased_to_one_worker(self):
+        email = enqueue_email('OTP', 'code', ['a@example.com'])
+        command = SendOutbox(stdout=StringIO())
+        self.assertEqual(command.claim_batch(self.options), [email])
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'sending')
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(command.claim_batch(self.options), [])
+
+        # Once the lease runs out the row is due again, e.g. after a worker crash.
+        OutgoingEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(command.claim_batch(self.options), [email])
+
+    @override_settings(EMAIL_TIMEOUT=30)
+    def test_lease_covers_a_worst_case_batch(self):
+        command = SendOutbox(stdout=StringIO())
+        self.assertEqual(command.batch_lease({'batch_size': 50, 'lease': None}), 51 * 30 + 60)
+        self.assertEqual(command.batch_lease({'batch_size': 10, 'lease': 600}), 600)
+        with self.assertRaises(CommandError):
+            call_command('send_outbox', '--once', '--lease', '300', stdout=StringIO())
+
+    def test_failures_back_off_then_give_up(self):
+        email = enqueue_email('OTP', 'code', ['a@example.com'])
+        command = SendOutbox(stdout=StringIO())
+        with mock.patch('authapp.management.commands.send_outbox.EmailMessage.send', side_effect=OSError('down')):
+            for attempt in range(1, 4):
+                OutgoingEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+                command.send_batch(self.options)
+                email.refresh_from_db()
+                self.assertEqual(email.attempts, attempt)
+                self.assertEqual(email.last_error, 'down')
+        self.assertEqual(email.status, 'failed')
+        self.assertEqual(email.message, 'code')
+
+
+@override_settings(RATE_LIMITS={**settings.RATE_LIMITS, 'otp_email': (2, 900), 'otp_ip': (3, 900)})
+class OTPRateLimitTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        User.objects.create_user(email='a@example.com', username='a', password='pw')
+        User.objects.create_user(email='b@example.com', username='b', password='pw')
+
+    def request_otp(self, email, **extra):
+        return self.client.post('/api/auth/forgot-password/', {'email': email}, **extra).status_code
+
+    def test_limits_per_email_and_per_ip(self):
+        self.assertEqual([self.request_otp('a@example.com') for _ in range(3)], [200, 200, 429])
+        # The address has now made three requests, its limit.
+        self.assertEqual(self.request_otp('b@example.com'), 429)
+
+    def test_forwarded_for_cannot_mint_new_identities(self):
+        statuses = [
+            self.request_otp(email, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+            for i, email in enumerate(['a@example.com', 'b@example.com', 'a@example.com', 'b@example.com'])
+        ]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    def test_otp_is_redeemed_once(self):
+        self.request_otp('a@example.com')
+        otp = caches['shared'].get('otp_a@example.com')
+        verify = {'email': 'a@example.com', 'otp': otp}
+        self.assertEqual(self.client.post('/api/auth/otp-verification/', verify).status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/otp-verification/', verify).status_code, 400)
+
+
+class RateLimitTests(TestCase):
+    def request(self):
+        return RequestFactory().get('/', REMOTE_ADDR='203.0.113.9', HTTP_X_FORWARDED_FOR='1.2.3.4, 198.51.100.7')
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        self.assertEqual(get_client_ip(self.request()), '203.0.113.9')
+
+    def test_only_our_proxy_hops_are_trusted(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            self.assertEqual(get_client_ip(self.request()), '198.51.100.7')
+
+    def test_sliding_window_counts_previous_window(self):
+        caches['shared'].clear()
+        # Only the limiter's clock is faked; the cache still expires rows on real time.
+        with mock.patch('authapp.ratelimit.time') as clock:
+            clock.time.return_value = 1000.0
+            self.assertEqual([is_rate_limited('test', 'x', 2, 100) for _ in range(3)], [False, False, True])
+            # 80% into the next window, a fifth of the previous three hits still count.
+            clock.time.return_value = 1180.0
+            self.assertFalse(is_rate_limited('test', 'x', 2, 100))
+            self.assertTrue(is_rate_limited('test', 'x', 2, 100))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        self.user = User.objects.create_user(email='r@example.com', username='r', password='pw')
+
+    def test_logout_revokes_refresh_and_access_tokens(self):
+        refresh = RevocableRefreshToken.for_user(self.user)
+        access = str(refresh.access_token)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(client.get('/api/auth/session/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/auth/logout/', {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(client.get('/api/auth/session/').status_code, 401)
+        self.assertEqual(self.client.post('/api/auth/token/refresh/', {'refresh': str(refresh)}).status_code, 401)
+        self.assertTrue(is_revoked(refresh['jti']))
+
+    def test_other_tokens_stay_valid(self):
+        revoked, kept = RevocableRefreshToken.for_user(self.user), RevocableRefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            revoked.blacklist()
+        self.assertFalse(is_revoked(kept['jti']))
+        self.assertEqual(self.client.post('/api/auth/token/refresh/', {'refresh': str(kept)}).status_code, 200)
+
+    def test_prune_removes_only_expired_entries(self):
+        now = timezone.now()
+        RevokedToken.objects.create(jti='old', expires_at=now - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='live', expires_at=now + timedelta(minutes=1))
+        self.assertEqual(prune_revoked_tokens(chunk_size=1), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+        self.assertTrue(is_revoked('live'))
+        self.assertFalse(is_revoked('old'))
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(500)
+        jtis = [f'jti-{i}' for i in range(500)]
+        for jti in jtis:
+            bloom.add(jti)
+        self.assertTrue(all(jti in bloom for jti in jtis))
+        false_positives = sum(f'other-{i}' in bloom for i in range(5000))
+        self.assertLess(false_positives, 50)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['users'].clear()
+        self.role = Role.objects.create(name='Operator')
+        self.user = User.objects.create_user(email='c@example.com', username='c', password='pw', role=self.role)
+        self.token = RevocableAccessToken.for_user(self.user)
+
+    def get_user(self):
+        return CachedJWTAuthentication().get_user(self.token)
+
+    def test_second_lookup_skips_the_database(self):
+        self.get_user()
+        with self.assertNumQueries(0):
+            user = self.get_user()
+            self.assertEqual((user.pk, user.email, user.role.name), (self.user.pk, 'c@example.com', 'Operator'))
+
+    def test_user_and_role_changes_are_seen(self):
+        self.get_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Renamed'
+            self.user.save()
+        self.assertEqual(self.get_user().first_name, 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role.name = 'Supervisor'
+            self.role.save()
+        self.assertEqual(self.get_user().role.name, 'Supervisor')
+
+    def test_snapshots_stay_out_of_the_stamp_cache(self):
+        self.get_user()
+        key = USER_SNAPSHOT_KEY.format(
+            self.user.pk,
+            get_version(USER_VERSION_KEY.format(self.user.pk), caches['users']),
+            get_version(PERMISSION_VERSION_KEY),
+        )
+        self.assertIsNotNone(caches['users'].get(key))
+        self.assertIsNone(cache.get(key))
+        self.assertIsNone(cache.get(USER_VERSION_KEY.format(self.user.pk)))
+
+    def test_deactivated_user_is_rejected(self):
+        self.get_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.get_user()
+
+
+@override_settings(RATE_LIMITS={**settings.RATE_LIMITS, 'auth_ip': (4, 60), 'auth_account': (2, 900)})
+class AuthThrottleTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        User.objects.create_user(email='t@example.com', username='t', password='pw')
+
+    def login(self, email, password='wrong', **extra):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': password}, **extra).status_code
+
+    def test_account_window_rejects_before_hashing(self):
+        with mock.patch('django.contrib.auth.hashers.PBKDF2PasswordHasher.verify', return_value=False) as verify:
+            statuses = [self.login('t@example.com') for _ in range(3)]
+        self.assertEqual(statuses, [400, 400, 429])
+        self.assertEqual(verify.call_count, 2)
+        # Emails are normalised, so case and padding don't open a new window.
+        self.assertEqual(self.login(' T@Example.com '), 429)
+
+    def test_ip_window_spans_accounts(self):
+        statuses = [self.login(f'user{i}@example.com') for i in range(5)]
+        self.assertEqual(statuses, [400, 400, 400, 400, 429])
+        self.assertEqual(self.login('other@example.com', REMOTE_ADDR='198.51.100.1'), 400)
+        self.assertEqual(get_hash_avoided_counts(), {'total': 1, 'auth_ip': 1, 'auth_account': 0})
+
+    def test_window_reopens_after_it_passes(self):
+        with mock.patch('authapp.ratelimit.time') as clock:
+            clock.time.return_value = 10_000.0
+            self.assertEqual([self.login('t@example.com') for _ in range(3)], [400, 400, 429])
+            # Two full windows later nothing from the earlier hits still counts.
+            clock.time.return_value = 10_000.0 + 2 * 900
+            self.assertEqual(self.login('t@example.com'), 400)
@@ -0,0 +1,28 @@
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .revocation import is_revoked, revoke
+
+
+class RevocableTokenMixin:
+    """Checks and records revocation in authapp's RevokedToken store instead of token_blacklist."""
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        if is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError('Token has been revoked')
+
+    def blacklist(self):
+        return revoke(self)
+
+    def outstand(self):
+        # Only revoked tokens are stored; issued ones are not tracked.
+        return None
+
+
+class RevocableAccessToken(RevocableTokenMixin, AccessToken):
+    pass
+
+
+class RevocableRefreshToken(RevocableTokenMixin, RefreshToken):
+    access_token_class = RevocableAccessToken
@@ -1,9 +1,11 @@
 from django.urls import path
+from rest_framework_simplejwt.views import TokenRefreshView
 from authapp.views import (
     LoginView, LogoutView, ProfileView, ForgotPasswordView, OTPVerificationView,
     ResetPasswordView, ChangePasswordView, RoleView, RoleDetailView,
     PermissionView, PermissionDetailView, UserManagementView, UserDetailView,
-    CustomTokenObtainPairView, PermissionListView
+    CustomTokenObtainPairView, PermissionListView, SessionView, PermissionBulkView,
+    AuthThrottleMetricsView
 )
 from django.conf import settings
 from django.conf.urls.static import static
@@ -12,15 +14,19 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('profile/', ProfileView.as_view(), name='profile'),
+    path('session/', SessionView.as_view(), name='session'),
     path('forgot-password/', ForgotPasswordView.as_view(), name='forgot_password'),
     path('otp-verification/', OTPVerificationView.as_view(), name='otp_verification'),
     path('reset-password/', ResetPasswordView.as_view(), name='reset_password'),
     path('change-password/', ChangePasswordView.as_view(), name='change_password'),
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('throttle-metrics/', AuthThrottleMetricsView.as_view(), name='throttle_metrics'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('roles/', RoleView.as_view(), name='role_list'),
     path('roles/<int:pk>/', RoleDetailView.as_view(), name='role_detail'),
     path('permissions/', PermissionView.as_view(), name='permission_create'),
     path('permissions/list/', PermissionListView.as_view(), name='permission_list'),
+    path('permissions/bulk/', PermissionBulkView.as_view(), name='permission_bulk'),
     path('permissions/<int:pk>/', PermissionDetailView.as_view(), name='permission_detail'),
     path('users/', UserManagementView.as_view(), name='user_management'),
     path('users/<int:pk>/', UserDetailView.as_view(), name='user_detail'),
@@ -7,17 +7,27 @@ from .models import User, Role, Permission
 from .serializers import (
     LoginSerializer, UserSerializer, UserCreateSerializer, ForgotPasswordSerializer,
     OTPVerificationSerializer, ResetPasswordSerializer, ChangePasswordSerializer,
-    CustomTokenObtainPairSerializer, RoleSerializer, PermissionSerializer
+    CustomTokenObtainPairSerializer, RoleSerializer, PermissionSerializer, SessionUserSerializer,
+    PermissionBulkSerializer, UserListSerializer
 )
-from django.core.cache import cache
+from .pagination import UserCursorPagination
+from django.db.models import Q
+from django.core.cache import caches
 from django.utils.crypto import get_random_string
+from django.utils.http import parse_etags
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.core.mail import send_mail
+from .tokens import RevocableRefreshToken
+from .revocation import revoke
+from .mail import enqueue_email
 from django.conf import settings
 from rest_framework import viewsets
 from .models import Role
 from .serializers import RoleCreateSerializer
+from .permissions import has_permission, get_role_login_page, get_compiled_permissions
+from .cache import USER_VERSION_KEY, get_version, consume, user_cache
+from .ratelimit import is_rate_limited, get_client_ip
+from .throttling import AuthIPThrottle, AuthAccountThrottle, get_hash_avoided_counts
+import hashlib
 
 class RoleViewSet(viewsets.ModelViewSet):
     queryset = Role.objects.all()
@@ -30,31 +40,15 @@ class HasPermission(BasePermission):
         if request.user.is_superuser:
             return True
         page = view.__class__.__name__.lower().replace('view', '')
-        return has_permission(request.user, page)
-
-def has_permission(user, page, action='can_view'):
-    if user.is_superuser:
-        return True
-    if not user.role:
-        return False
-    return Permission.objects.filter(
-        role=user.role,
-        page=page,
-        **{action: True}
-    ).exists()
-
-def get_role_login_page(role):
-    """Retrieve the designated login page for a role."""
-    if not role:
-        return None
-    permission = Permission.objects.filter(role=role, is_login_page=True).first()
-    return permission.page if permission else None
+        return has_permission(request.user, page, token=request.auth)
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [AuthIPThrottle, AuthAccountThrottle]
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [AuthIPThrottle, AuthAccountThrottle]
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -81,8 +75,11 @@ class LogoutView(APIView):
             refresh_token = request.data.get("refresh")
             if not refresh_token:
                 return Response({"error": "Refresh token is required"}, status=status.HTTP_400_BAD_REQUEST)
-            token = RefreshToken(refresh_token)
+            token = RevocableRefreshToken(refresh_token)
             token.blacklist()
+            # Also retire the access token this request came with.
+            if request.auth is not None:
+                revoke(request.auth)
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -112,6 +109,37 @@ class ProfileView(APIView):
             }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def etag_matches(if_none_match, etag):
+    """Weak comparison against every tag in an If-None-Match header, as RFC 9110 requires."""
+    tags = parse_etags(if_none_match)
+    return '*' in tags or etag in {tag.removeprefix('W/') for tag in tags}
+
+class SessionView(ProfileView):
+    """
+    Everything the cms needs on page load in one response: the user, their role,
+    the flattened permission map and the login page. Carries a strong ETag built
+    from the user and permission versions, so unchanged sessions return 304.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    def get(self, request):
+        user = request.user
+        compiled = get_compiled_permissions()
+        etag = '"%s"' % hashlib.sha1(
+            f"{user.pk}:{get_version(USER_VERSION_KEY.format(user.pk), user_cache())}:{compiled['version']}".encode()
+        ).hexdigest()
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag_matches(request.headers.get('If-None-Match', ''), etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        role = compiled['roles'].get(user.role_id, {})
+        return Response({
+            'user': SessionUserSerializer(user).data,
+            'role': {'id': user.role_id, 'name': role.get('name') or user.role.name} if user.role_id else None,
+            'permissions': role.get('pages', {}),
+            'login_page': role.get('login_page'),
+        }, headers=headers)
+
 class ForgotPasswordView(APIView):
     permission_classes = [AllowAny]
 
@@ -119,30 +147,21 @@ class ForgotPasswordView(APIView):
         serializer = ForgotPasswordSerializer(data=request.data)
         if serializer.is_valid():
             email = serializer.validated_data['email']
+            email_limited = is_rate_limited('otp_email', email)
+            ip_limited = is_rate_limited('otp_ip', get_client_ip(request))
+            if email_limited or ip_limited:
+                return Response({'error': 'Too many OTP requests. Please try again later.'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
             try:
                 user = User.objects.get(email=email)
                 otp = get_random_string(length=6, allowed_chars='0123456789')
-                cache.set(f"otp_{email}", otp, timeout=300)
-
-                subject = 'Your OTP for Password Reset'
-                message = f'Your OTP to reset your password is: {otp}\nThis OTP is valid for 5 minutes.'
-                from_email = settings.DEFAULT_FROM_EMAIL
-                recipient_list = [email]
-
-                try:
-                    send_mail(
-                        subject,
-                        message,
-                        from_email,
-                        recipient_list,
-                        fail_silently=False,
-                    )
-                    return Response({'message': 'OTP sent to your email'}, status=status.HTTP_200_OK)
-                except Exception as e:
-                    return Response(
-                        {'error': f'Failed to send email: {str(e)}'},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
+                caches['shared'].set(f"otp_{email}", otp, timeout=300)
+
+                enqueue_email(
+                    'Your OTP for Password Reset',
+                    f'Your OTP to reset your password is: {otp}\nThis OTP is valid for 5 minutes.',
+                    [email],
+                )
+                return Response({'message': 'OTP sent to your email'}, status=status.HTTP_200_OK)
             except User.DoesNotExist:
                 return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -155,28 +174,31 @@ class OTPVerificationView(APIView):
         if serializer.is_valid():
             email = serializer.validated_data['email']
             otp = serializer.validated_data['otp']
-            cached_otp = cache.get(f"otp_{email}")
-            if cached_otp and cached_otp == otp:
-                cache.set(f"verified_{email}", True, timeout=600)
+            email_limited = is_rate_limited('otp_verify_email', email)
+            ip_limited = is_rate_limited('otp_verify_ip', get_client_ip(request))
+            if email_limited or ip_limited:
+                return Response({'error': 'Too many attempts. Please try again later.'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            # Compare-and-delete: a given OTP can be redeemed exactly once.
+            if consume(caches['shared'], f"otp_{email}", otp):
+                caches['shared'].set(f"verified_{email}", True, timeout=600)
                 return Response({'message': 'OTP verified successfully'}, status=status.HTTP_200_OK)
             return Response({'error': 'Invalid or expired OTP'}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class ResetPasswordView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [AuthIPThrottle, AuthAccountThrottle]
 
     def post(self, request):
         serializer = ResetPasswordSerializer(data=request.data)
         if serializer.is_valid():
             email = serializer.validated_data['email']
-            if not cache.get(f"verified_{email}"):
+            if not consume(caches['shared'], f"verified_{email}", True):
                 return Response({'error': 'OTP not verified'}, status=status.HTTP_400_BAD_REQUEST)
             try:
                 user = User.objects.get(email=email)
                 user.set_password(serializer.validated_data['new_password'])
                 user.save()
-                cache.delete(f"verified_{email}")
-                cache.delete(f"otp_{email}")
                 return Response({'message': 'Password reset successfully'}, status=status.HTTP_200_OK)
             except User.DoesNotExist:
                 return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -184,6 +206,7 @@ class ResetPasswordView(APIView):
 
 class ChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [AuthIPThrottle, AuthAccountThrottle]
 
     def post(self, request):
         serializer = ChangePasswordSerializer(data=request.data, context={'request': request})
@@ -193,18 +216,27 @@ class ChangePasswordView(APIView):
             return Response({'message': 'Password changed successfully'}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class AuthThrottleMetricsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_superuser:
+            return Response({'error': 'Only superadmin can view throttle metrics'}, status=status.HTTP_403_FORBIDDEN)
+        counts = get_hash_avoided_counts()
+        return Response({'hashes_avoided': counts.pop('total'), 'by_scope': counts})
+
 class RoleView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        if not has_permission(request.user, 'role', 'can_view'):
+        if not has_permission(request.user, 'role', 'can_view', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         roles = Role.objects.all()
         serializer = RoleSerializer(roles, many=True)
         return Response(serializer.data)
 
     def post(self, request):
-        if not has_permission(request.user, 'role', 'can_add'):
+        if not has_permission(request.user, 'role', 'can_add', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         serializer = RoleSerializer(data=request.data)
         if serializer.is_valid():
@@ -224,7 +256,7 @@ class RoleDetailView(APIView):
             return Response({'error': 'Role not found'}, status=status.HTTP_404_NOT_FOUND)
 
     def put(self, request, pk):
-        if not has_permission(request.user, 'role', 'can_edit'):
+        if not has_permission(request.user, 'role', 'can_edit', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         try:
             role = Role.objects.get(pk=pk)
@@ -237,7 +269,7 @@ class RoleDetailView(APIView):
             return Response({'error': 'Role not found'}, status=status.HTTP_404_NOT_FOUND)
 
     def delete(self, request, pk):
-        if not has_permission(request.user, 'role', 'can_delete'):
+        if not has_permission(request.user, 'role', 'can_delete', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         try:
             role = Role.objects.get(pk=pk)
@@ -250,7 +282,7 @@ class PermissionView(APIView):
     permission_classes = [HasPermission]
 
     def post(self, request):
-        if not has_permission(request.user, 'permission', 'can_add'):
+        if not has_permission(request.user, 'permission', 'can_add', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         serializer = PermissionSerializer(data=request.data)
         if serializer.is_valid():
@@ -262,17 +294,31 @@ class PermissionListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        if not has_permission(request.user, 'permission', 'can_view'):
+        if not has_permission(request.user, 'permission', 'can_view', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         permissions = Permission.objects.all()
         serializer = PermissionSerializer(permissions, many=True)
         return Response(serializer.data)
 
+class PermissionBulkView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not (has_permission(request.user, 'permission', 'can_add', request.auth)
+                and has_permission(request.user, 'permission', 'can_edit', request.auth)):
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = PermissionBulkSerializer(data=request.data)
+        if serializer.is_valid():
+            role = serializer.save()
+            permissions = Permission.objects.filter(role=role)
+            return Response(PermissionSerializer(permissions, many=True).data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 class PermissionDetailView(APIView):
     permission_classes = [HasPermission]
 
     def put(self, request, pk):
-        if not has_permission(request.user, 'permission', 'can_edit'):
+        if not has_permission(request.user, 'permission', 'can_edit', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         try:
             permission = Permission.objects.get(pk=pk)
@@ -285,7 +331,7 @@ class PermissionDetailView(APIView):
             return Response({'error': 'Permission not found'}, status=status.HTTP_404_NOT_FOUND)
 
     def delete(self, request, pk):
-        if not has_permission(request.user, 'permission', 'can_delete'):
+        if not has_permission(request.user, 'permission', 'can_delete', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         try:
             permission = Permission.objects.get(pk=pk)
@@ -298,11 +344,31 @@ class UserManagementView(APIView):
     permission_classes = [IsAuthenticated]
  
     def get(self, request):
-        if not has_permission(request.user, 'usermanagement', 'can_view'):
+        if not has_permission(request.user, 'usermanagement', 'can_view', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        users = User.objects.only(*UserListSerializer.Meta.fields)
+        search = request.query_params.get('search')
+        if search:
+            users = users.filter(
+                Q(email__icontains=search) | Q(username__icontains=search) |
+                Q(first_name__icontains=search) | Q(last_name__icontains=search)
+            )
+        role_id = request.query_params.get('role')
+        if role_id:
+            try:
+                users = users.filter(role_id=int(role_id))
+            except ValueError:
+                return Response({'error': 'role must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = UserCursorPagination()
+        page = paginator.paginate_queryset(users, request, view=self)
+        # Each role is serialized once and referenced by id from the user rows.
+        roles = Role.objects.filter(id__in={user.role_id for user in page}).prefetch_related('permissions')
+        response = paginator.get_paginated_response(
+            UserListSerializer(page, many=True).data
+        )
+        response.data['roles'] = {role['id']: role for role in RoleSerializer(roles, many=True).data}
+        return response
  
     def post(self, request):
         if not request.user.is_superuser:
@@ -317,7 +383,7 @@ class UserDetailView(APIView):
     permission_classes = [HasPermission]
 
     def get(self, request, pk):
-        if not has_permission(request.user, 'userdetail', 'can_view'):
+        if not has_permission(request.user, 'userdetail', 'can_view', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         try:
             user = User.objects.get(pk=pk)
@@ -327,7 +393,7 @@ class UserDetailView(APIView):
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
     def put(self, request, pk):
-        if not has_permission(request.user, 'userdetail', 'can_edit'):
+        if not has_permission(request.user, 'userdetail', 'can_edit', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         try:
             user = User.objects.get(pk=pk)
@@ -340,7 +406,7 @@ class UserDetailView(APIView):
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
     def delete(self, request, pk):
-        if not has_permission(request.user, 'userdetail', 'can_delete'):
+        if not has_permission(request.user, 'userdetail', 'can_delete', request.auth):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         try:
             user = User.objects.get(pk=pk)
@@ -94,6 +94,53 @@ DATABASES = {
     }
 }
 
+# Cache
+# 'default' is shared by every gunicorn worker on the host; holds the permission and revocation
+# version stamps, so nothing that grows per user or per request may go in it.
+# 'shared' is a DB table visible to every host; holds OTPs and rate-limit counters.
+# Create its table with `python manage.py createcachetable`.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    },
+    'shared': {
+        'BACKEND': os.getenv('SHARED_CACHE_BACKEND', 'authapp.cache_backends.SharedDatabaseCache'),
+        'LOCATION': os.getenv('SHARED_CACHE_LOCATION', 'kwa_shared_cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'SWEEP_INTERVAL': int(os.getenv('SHARED_CACHE_SWEEP_INTERVAL', '300')),
+        },
+    },
+    # Per-user version stamps and request.user snapshots; one or more entries per active user.
+    'users': {
+        'BACKEND': os.getenv('USER_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('USER_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'users')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    # Clustered valve map tiles; kept apart so a full pyramid never culls the auth stamps.
+    'tiles': {
+        'BACKEND': os.getenv('TILE_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('TILE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'tiles')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+# Sliding-window limits as (requests, window seconds)
+RATE_LIMITS = {
+    'otp_email': (5, 900),
+    'otp_ip': (20, 900),
+    'otp_verify_email': (5, 900),
+    'otp_verify_ip': (20, 900),
+    # Password-hashing endpoints: login, token, change and reset password
+    'auth_ip': (60, 60),
+    'auth_account': (10, 900),
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -133,11 +180,14 @@ AUTH_USER_MODEL = 'authapp.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authapp.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Reverse proxies in front of gunicorn. 0 keys throttles and rate limits on
+    # REMOTE_ADDR and ignores X-Forwarded-For, which clients can set freely.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
 }
 
 # Simple JWT settings
@@ -147,8 +197,14 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Logout and rotation revoke by jti in authapp.RevokedToken (see authapp/revocation.py)
+    'AUTH_TOKEN_CLASSES': ('authapp.tokens.RevocableAccessToken',),
+    'TOKEN_REFRESH_SERIALIZER': 'authapp.serializers.RevocableTokenRefreshSerializer',
 }
 
+# Embed the role's permission bitmap and version in tokens so checks can skip the DB
+JWT_PERMISSION_CLAIMS = os.getenv('JWT_PERMISSION_CLAIMS', 'False') == 'True'
+
 # CORS settings (for frontend-backend communication)
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS').split(',')
 
@@ -159,10 +215,12 @@ CSRF_TRUSTED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS').split(',')
 CORS_ALLOW_CREDENTIALS = True
 
 # Email settings 
+# Requests only queue mail; `manage.py send_outbox` delivers it.
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '30'))
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
\ No newline at end of file
@@ -0,0 +1,174 @@
+import csv
+import io
+import zipfile
+from collections import Counter
+from datetime import datetime
+from django.db import transaction
+from rest_framework import serializers
+from area.models import Area
+from .models import Complaint, ComplaintRollup, ComplaintSearchTerm, assign_numbers
+from .serializers import ComplaintSerializer
+
+BATCH_SIZE = 1000
+MAX_ERRORS = 200  # per-row errors kept in the summary; the command can write all of them
+COLUMNS = ('area', 'complaint_type', 'name', 'date', 'address', 'phone_number', 'department', 'status')
+
+
+def _header(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def _cell(value):
+    """Spreadsheet cell -> what the serializer expects; None for blanks."""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # phone numbers typed into numeric cells
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value in (None, '') else value
+
+
+class UnreadableFile(ValueError):
+    """The upload could not be decoded or parsed as CSV/XLSX."""
+
+
+def read_rows(upload, filename):
+    """
+    Yield one dict per data row of a CSV or XLSX file (by ``filename``
+    extension), keyed by the lower-cased header row. Rows are read lazily, so
+    memory stays flat however long the sheet is. Each call starts from the top
+    of ``upload``; decode and parse errors are raised as UnreadableFile.
+    """
+    upload.seek(0)
+    if filename.lower().endswith('.xlsx'):
+        import openpyxl  # only needed for spreadsheet uploads
+        from openpyxl.utils.exceptions import InvalidFileException
+
+        try:
+            workbook = openpyxl.load_workbook(upload, read_only=True, data_only=True)
+        except (InvalidFileException, zipfile.BadZipFile, KeyError) as e:
+            # KeyError: a zip archive without the workbook parts.
+            raise UnreadableFile(f'not an .xlsx workbook ({e})') from e
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            headers = [_header(value) for value in next(rows, ())]
+            for values in rows:
+                yield dict(zip(headers, values))
+        finally:
+            workbook.close()
+    else:
+        text = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+        try:
+            for row in csv.DictReader(text):
+                yield {_header(key): value for key, value in row.items()}
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise UnreadableFile(str(e)) from e
+        finally:
+            text.detach()  # leave ``upload`` open for the next pass
+
+
+class AreaNameField(serializers.RelatedField):
+    """``area`` by name (case-insensitive) or id, resolved from a map loaded once per import."""
+
+    default_error_messages = {'does_not_exist': 'Unknown area "{value}".'}
+
+    def __init__(self, areas, **kwargs):
+        self.areas = areas
+        super().__init__(read_only=False, queryset=Area.objects.none(), **kwargs)
+
+    def to_internal_value(self, data):
+        area = self.areas.get(str(data).strip().lower())
+        if area is None:
+            self.fail('does_not_exist', value=data)
+        return area
+
+
+class ComplaintImportSerializer(ComplaintSerializer):
+    """ComplaintSerializer rules, with areas looked up in memory instead of per row."""
+
+    def __init__(self, *args, areas, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['area'] = AreaNameField(areas=areas)
+
+
+def area_map():
+    areas = {}
+    for area in Area.objects.all():
+        areas[str(area.id)] = area
+        areas.setdefault(area.area_name.strip().lower(), area)
+    return areas
+
+
+def _flatten(detail):
+    return {
+        field: ' '.join(str(message) for message in messages) if isinstance(messages, list) else str(messages)
+        for field, messages in detail.items()
+    }
+
+
+def _insert(complaints):
+    # Numbers come from their own short counter transactions so the counter
+    # rows are not locked while the chunk inserts; a failed chunk leaves a gap.
+    assign_numbers(complaints)
+    with transaction.atomic():
+        Complaint.objects.bulk_create(complaints)
+        # bulk_create sends no post_save, so count and index the rows here.
+        ComplaintRollup.adjust(Counter(complaint.rollup_key() for complaint in complaints))
+        if any(complaint.id is None for complaint in complaints):
+            # MySQL does not return ids from bulk inserts; tickets are unique.
+            ids = dict(
+                Complaint.objects.filter(
+                    ticket_number__in=[complaint.ticket_number for complaint in complaints]
+                ).values_list('ticket_number', 'id')
+            )
+            for complaint in complaints:
+                complaint.id = ids[complaint.ticket_number]
+        ComplaintSearchTerm.index(complaints)
+
+
+def import_complaints(open_rows, user=None, batch_size=BATCH_SIZE, dry_run=False, on_error=None):
+    """
+    Validate the rows from ``open_rows()`` (a callable returning a fresh
+    iterator of dicts, e.g. ``read_rows``) and insert the valid ones with
+    bulk_create, ``batch_size`` at a time. Invalid rows are skipped and
+    reported by 1-based data row number; ``on_error(row, errors)`` is called
+    for each. With ``dry_run`` nothing is written.
+
+    Unless ``dry_run``, the rows are read through once before the first
+    insert, so a file that fails to decode part-way raises without having
+    written anything and can simply be fixed and uploaded again.
+    Returns ``{'rows', 'imported', 'failed', 'errors'}``.
+    """
+    if not dry_run:
+        for _ in open_rows():
+            pass
+    serializer = ComplaintImportSerializer(areas=area_map())
+    summary = {'rows': 0, 'imported': 0, 'failed': 0, 'errors': []}
+    batch = []
+    for number, row in enumerate(open_rows(), start=1):
+        data = {column: _cell(row.get(column)) for column in COLUMNS}
+        if all(value is None for value in data.values()):
+            continue
+        summary['rows'] += 1
+        try:
+            validated = serializer.run_validation({key: value for key, value in data.items() if value is not None})
+        except serializers.ValidationError as error:
+            errors = _flatten(error.detail)
+            summary['failed'] += 1
+            if len(summary['errors']) < MAX_ERRORS:
+                summary['errors'].append({'row': number, 'errors': errors})
+            if on_error is not None:
+                on_error(number, errors)
+            continue
+        batch.append(Complaint(created_by=user, **validated))
+        if len(batch) >= batch_size:
+            if not dry_run:
+                _insert(batch)
+            summary['imported'] += len(batch)
+            batch = []
+    if batch:
+        if not dry_run:
+            _insert(batch)
+        summary['imported'] += len(batch)
+    return summary
@@ -0,0 +1,46 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from complaints.imports import BATCH_SIZE, UnreadableFile, import_complaints, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import complaints from a call-centre CSV or XLSX sheet (AddComplaint columns, area by name).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='.csv or .xlsx file with a header row.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows inserted per bulk_create.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+        parser.add_argument('--errors', help='Write every rejected row to this CSV (row, field, error).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path.lower().endswith(('.csv', '.xlsx')):
+            raise CommandError('Expected a .csv or .xlsx file.')
+
+        report = open(options['errors'], 'w', newline='', encoding='utf-8') if options['errors'] else None
+        try:
+            writer = None
+            if report is not None:
+                writer = csv.writer(report)
+                writer.writerow(['row', 'field', 'error'])
+
+            def on_error(row, errors):
+                if writer is not None:
+                    writer.writerows([row, field, message] for field, message in errors.items())
+
+            with open(path, 'rb') as handle:
+                summary = import_complaints(
+                    lambda: read_rows(handle, path), batch_size=options['batch_size'], dry_run=options['dry_run'],
+                    on_error=on_error,
+                )
+        except UnreadableFile as e:
+            raise CommandError(f'Could not read {path}: {e}')
+        finally:
+            if report is not None:
+                report.close()
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(f"{verb} {summary['imported']} of {summary['rows']} rows; {summary['failed']} rejected")
+        if writer is None:
+            for error in summary['errors'][:20]:
+                self.stdout.write(f"  row {error['row']}: {error['errors']}")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from complaints.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recount complaints and repair the dashboard rollup table. Safe to run on a schedule, e.g. nightly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1, help='Complaint dates recounted per transaction.')
+
+    def handle(self, *args, **options):
+        fixed = rebuild_rollups(options['days'])
+        self.stdout.write(
+            f"Rollups reconciled: {fixed['created']} created, {fixed['updated']} updated, {fixed['deleted']} deleted"
+        )
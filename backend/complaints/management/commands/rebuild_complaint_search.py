@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from complaints.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the complaint search index, e.g. after complaints were changed with raw SQL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Complaints re-indexed per transaction.')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(options['chunk_size'])
+        self.stdout.write(f"Indexed {indexed} complaints")
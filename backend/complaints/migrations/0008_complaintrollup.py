@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('area', '0001_initial'),
+        ('complaints', '0007_complaint_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplaintRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('department', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('completed', 'Completed'), ('accepted', 'Accepted'), ('processing', 'Processing'), ('return_for_review', 'Return for Review')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='complaint_rollups', to='area.area')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'day'], name='complaint_rollup_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'area', 'department', 'status'), name='unique_complaint_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+from collections import Counter
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def backfill_rollups(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Complaint = apps.get_model('complaints', 'Complaint')
+    ComplaintRollup = apps.get_model('complaints', 'ComplaintRollup')
+    totals = Counter()
+    high = Complaint.objects.using(db).aggregate(high=Max('id'))['high'] or 0
+    for start in range(0, high + 1, 50000):
+        rows = (
+            Complaint.objects.using(db).filter(id__gte=start, id__lt=start + 50000)
+            .values('date', 'area_id', 'department', 'status')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        for row in rows:
+            totals[(row['date'], row['area_id'], row['department'], row['status'])] += row['total']
+    ComplaintRollup.objects.using(db).bulk_create(
+        [
+            ComplaintRollup(day=day, area_id=area_id, department=department, status=status, count=total)
+            for (day, area_id, department, status), total in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def clear_rollups(apps, schema_editor):
+    db = schema_editor.connection.alias
+    apps.get_model('complaints', 'ComplaintRollup').objects.using(db).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0008_complaintrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, clear_rollups),
+    ]
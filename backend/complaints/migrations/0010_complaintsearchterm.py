@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0009_backfill_complaint_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplaintSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=3)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('complaint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='complaints.complaint')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'complaint', 'weight'], name='complaint_search_term_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+import re
+from django.db import migrations, transaction
+
+# Frozen copies of complaints.models as of this migration, so later changes
+# to the live index rules do not change what this backfill writes.
+SEARCH_FIELDS = (('ticket_number', 4), ('phone_number', 4), ('name', 2), ('address', 1))
+WORD_RE = re.compile(r'\w+')
+
+
+def search_terms(text):
+    terms = set()
+    for word in WORD_RE.findall(str(text or '').casefold()):
+        if len(word) < 3:
+            terms.add(word)
+        else:
+            terms.update(word[start:start + 3] for start in range(len(word) - 2))
+    return terms
+
+
+def complaint_terms(complaint):
+    weights = {}
+    for field, weight in SEARCH_FIELDS:
+        value = getattr(complaint, field)
+        if field == 'phone_number':
+            value = re.sub(r'\D', '', value or '')
+        for term in search_terms(value):
+            weights[term] = max(weights.get(term, 0), weight)
+    return weights
+
+
+def backfill_search_terms(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Complaint = apps.get_model('complaints', 'Complaint')
+    ComplaintSearchTerm = apps.get_model('complaints', 'ComplaintSearchTerm')
+    fields = ['id'] + [field for field, _ in SEARCH_FIELDS]
+    last_id = 0
+    while True:
+        chunk = list(Complaint.objects.using(db).filter(id__gt=last_id).order_by('id').only(*fields)[:2000])
+        if not chunk:
+            return
+        with transaction.atomic(using=db):
+            # A rerun after a failure replaces the chunks that already committed.
+            ComplaintSearchTerm.objects.using(db).filter(complaint_id__in=[complaint.id for complaint in chunk]).delete()
+            ComplaintSearchTerm.objects.using(db).bulk_create(
+                [
+                    ComplaintSearchTerm(term=term, complaint_id=complaint.id, weight=weight)
+                    for complaint in chunk
+                    for term, weight in complaint_terms(complaint).items()
+                ],
+                batch_size=2000,
+            )
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+    # Postings are written per complaint chunk, and each chunk replaces its own
+    # rows, so search fills in as the backfill runs and a failed run can be rerun.
+    atomic = False
+
+    dependencies = [
+        ('complaints', '0010_complaintsearchterm'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:46
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_postings(apps, schema_editor):
+    # An interrupted 0011 backfill that was rerun inserted some chunks twice;
+    # the copies are identical, so the lowest id of each pair is kept.
+    db = schema_editor.connection.alias
+    ComplaintSearchTerm = apps.get_model('complaints', 'ComplaintSearchTerm')
+    high = ComplaintSearchTerm.objects.using(db).aggregate(high=Max('complaint_id'))['high'] or 0
+    for start in range(0, high + 1, 1000):
+        seen, duplicates = set(), []
+        postings = (
+            ComplaintSearchTerm.objects.using(db).filter(complaint_id__gte=start, complaint_id__lt=start + 1000)
+            .order_by('id')
+            .values_list('id', 'term', 'complaint_id')
+        )
+        for posting_id, term, complaint_id in postings.iterator(chunk_size=5000):
+            if (term, complaint_id) in seen:
+                duplicates.append(posting_id)
+            else:
+                seen.add((term, complaint_id))
+        for index in range(0, len(duplicates), 1000):
+            ComplaintSearchTerm.objects.using(db).filter(id__in=duplicates[index:index + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+    # Each range's DELETE commits on its own; a failed run simply starts over.
+    atomic = False
+
+    dependencies = [
+        ('complaints', '0011_backfill_complaint_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_postings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='complaintsearchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'complaint'), name='unique_complaint_search_term'),
+        ),
+    ]
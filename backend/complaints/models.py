@@ -1,6 +1,77 @@
-from django.db import models
-import re
+from django.db import IntegrityError, models, transaction
+from django.db.models import BigIntegerField, F, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.db.models.functions import Cast, Substr
 from datetime import date
+import re
+
+SERIAL_SEQUENCE = 'serial'
+TICKET_SEQUENCE = 'ticket:{}'
+
+class ComplaintSequence(models.Model):
+    """
+    Counter rows for complaint numbering: one global serial counter and one
+    ticket counter per area prefix. ``value`` is the last number handed out.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def allocate(cls, name, count=1, seed=None):
+        """
+        Reserve ``count`` consecutive numbers and return the first. The counter
+        row is locked only for this short transaction, so concurrent creates
+        never get the same number; a failed insert just leaves a gap.
+        ``seed`` returns the starting value when the counter does not exist yet.
+        """
+        with transaction.atomic():
+            sequence = cls.objects.select_for_update().filter(name=name).first()
+            if sequence is None:
+                cls.objects.get_or_create(name=name, defaults={'value': seed() if seed else 0})
+                sequence = cls.objects.select_for_update().get(name=name)
+            first = sequence.value + 1
+            sequence.value += count
+            sequence.save(update_fields=['value'])
+        return first
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+def ticket_prefix(area):
+    return area.area_name[:3].upper()
+
+def _max_serial():
+    # One-time scan when the counter is first created; existing serials are numeric strings.
+    return Complaint.objects.aggregate(value=Max(Cast('serial_no', BigIntegerField())))['value'] or 0
+
+def _max_ticket(prefix):
+    return Complaint.objects.filter(ticket_number__startswith=prefix).aggregate(
+        value=Max(Cast(Substr('ticket_number', len(prefix) + 1), BigIntegerField()))
+    )['value'] or 0
+
+def assign_numbers(complaints):
+    """
+    Fill in missing serial and ticket numbers for ``complaints`` (with ``area``
+    loaded), reserving one block per counter: a single locked update for the
+    serials and one per area prefix, however many complaints there are.
+    """
+    pending_serial = [complaint for complaint in complaints if not complaint.serial_no]
+    if pending_serial:
+        first = ComplaintSequence.allocate(SERIAL_SEQUENCE, len(pending_serial), _max_serial)
+        for offset, complaint in enumerate(pending_serial):
+            complaint.serial_no = f"{first + offset:03d}"
+
+    by_prefix = {}
+    for complaint in complaints:
+        if not complaint.ticket_number:
+            by_prefix.setdefault(ticket_prefix(complaint.area), []).append(complaint)
+    for prefix, group in by_prefix.items():
+        first = ComplaintSequence.allocate(
+            TICKET_SEQUENCE.format(prefix), len(group), lambda: _max_ticket(prefix)
+        )
+        for offset, complaint in enumerate(group):
+            complaint.ticket_number = f"{prefix}{first + offset:03d}"
 
 class Complaint(models.Model):
     STATUS_CHOICES = [
@@ -22,24 +93,168 @@ class Complaint(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
     created_by = models.ForeignKey('authapp.User', on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        # Each matches a list filter plus the (date, id) page order; InnoDB appends id itself.
+        indexes = [
+            models.Index(fields=['date', 'id'], name='complaint_date_idx'),
+            models.Index(fields=['status', 'date'], name='complaint_status_date_idx'),
+            models.Index(fields=['department', 'date'], name='complaint_dept_date_idx'),
+            models.Index(fields=['area', 'date'], name='complaint_area_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in field_names for field in ROLLUP_FIELDS):
+            # What the stored row counts towards, to move it when the key changes.
+            instance._rollup_key = instance.rollup_key()
+        if all(field in field_names for field, _ in SEARCH_FIELDS):
+            instance._search_key = instance.search_key()
+        return instance
+
+    def rollup_key(self):
+        return (self.date, self.area_id, self.department, self.status)
+
+    def search_key(self):
+        return tuple(getattr(self, field) for field, _ in SEARCH_FIELDS)
+
     def save(self, *args, **kwargs):
-        if not self.serial_no:
-            last_complaint = Complaint.objects.order_by('-serial_no').first()
-            if last_complaint:
-                self.serial_no = f"{int(last_complaint.serial_no) + 1:03d}"
-            else:
-                self.serial_no = "001"
-
-        if not self.ticket_number:
-            area_code = self.area.area_name[:3].upper()
-            last_ticket = Complaint.objects.filter(area=self.area).order_by('-ticket_number').first()
-            if last_ticket and re.match(r'^[A-Z]{3}\d{3}$', last_ticket.ticket_number):
-                ticket_number = int(last_ticket.ticket_number[3:]) + 1
-            else:
-                ticket_number = 1
-            self.ticket_number = f"{area_code}{ticket_number:03d}"
-
-        super().save(*args, **kwargs)
+        if not self.serial_no or not self.ticket_number:
+            assign_numbers([self])
+        # The row and the rollup/search updates its signals make commit together.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"Complaint by {self.name} in {self.area.area_name}"
\ No newline at end of file
+        return f"Complaint by {self.name} in {self.area.area_name}"
+
+ROLLUP_FIELDS = ('date', 'area_id', 'department', 'status')
+# Searchable fields and the weight a match in each adds to a result's score.
+SEARCH_FIELDS = (('ticket_number', 4), ('phone_number', 4), ('name', 2), ('address', 1))
+WORD_RE = re.compile(r'\w+')
+
+def search_terms(text):
+    """Lower-cased trigrams of each word in ``text``; words under three characters are kept whole."""
+    terms = set()
+    for word in WORD_RE.findall(str(text or '').casefold()):
+        if len(word) < 3:
+            terms.add(word)
+        else:
+            terms.update(word[start:start + 3] for start in range(len(word) - 2))
+    return terms
+
+def complaint_terms(complaint):
+    """``{term: weight}`` for one complaint, each term at its best field's weight."""
+    weights = {}
+    for field, weight in SEARCH_FIELDS:
+        value = getattr(complaint, field)
+        if field == 'phone_number':
+            # "+91 98765-43210" is searchable as any run of its digits.
+            value = re.sub(r'\D', '', value or '')
+        for term in search_terms(value):
+            weights[term] = max(weights.get(term, 0), weight)
+    return weights
+
+class ComplaintRollup(models.Model):
+    """
+    Complaint counts per (day, area, department, status), kept current by the
+    Complaint signals below so dashboards never aggregate the complaint table.
+    Bulk writes that skip signals must call ``adjust`` themselves;
+    ``rebuild_complaint_rollups`` repairs any drift.
+    """
+    day = models.DateField()
+    area = models.ForeignKey('area.Area', on_delete=models.CASCADE, related_name='complaint_rollups')
+    department = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=Complaint.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'area', 'department', 'status'], name='unique_complaint_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'day'], name='complaint_rollup_status_idx'),
+        ]
+
+    @classmethod
+    def adjust(cls, deltas):
+        """
+        Apply ``{(day, area_id, department, status): change}``. Each counter is
+        moved with one ``count = count + n`` UPDATE, so concurrent writers never
+        lose increments; a missing row is created, retrying the UPDATE if
+        another writer created it first. Keys are visited in order so two
+        transactions lock rows in the same sequence.
+        """
+        for (day, area_id, department, status), change in sorted(deltas.items()):
+            if not change:
+                continue
+            key = {'day': day, 'area_id': area_id, 'department': department, 'status': status}
+            if cls.objects.filter(**key).update(count=F('count') + change) or change < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(count=change, **key)
+            except IntegrityError:
+                cls.objects.filter(**key).update(count=F('count') + change)
+
+    def __str__(self):
+        return f"{self.day} {self.area_id} {self.department} {self.status}: {self.count}"
+
+class ComplaintSearchTerm(models.Model):
+    """
+    Inverted index for complaint search: one row per (trigram, complaint).
+    A query becomes the trigrams of its words and is answered from the term
+    index alone, so phone, ticket and partial address lookups never scan the
+    complaint table.
+    """
+    term = models.CharField(max_length=3)
+    complaint = models.ForeignKey(Complaint, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'complaint'], name='unique_complaint_search_term'),
+        ]
+        # Covers the search query: postings for a term, with their weights, without row lookups.
+        indexes = [
+            models.Index(fields=['term', 'complaint', 'weight'], name='complaint_search_term_idx'),
+        ]
+
+    @classmethod
+    def index(cls, complaints):
+        """Replace the terms of ``complaints``, which must have ids."""
+        rows = [
+            cls(term=term, complaint_id=complaint.id, weight=weight)
+            for complaint in complaints
+            for term, weight in complaint_terms(complaint).items()
+        ]
+        with transaction.atomic():
+            cls.objects.filter(complaint_id__in=[complaint.id for complaint in complaints]).delete()
+            cls.objects.bulk_create(rows, batch_size=2000)
+
+    def __str__(self):
+        return f"{self.term} -> {self.complaint_id}"
+
+@receiver(post_save, sender=Complaint)
+def index_saved_complaint(sender, instance, created, **kwargs):
+    key = instance.search_key()
+    if created or key != getattr(instance, '_search_key', None):
+        ComplaintSearchTerm.index([instance])
+    instance._search_key = key
+
+@receiver(post_save, sender=Complaint)
+def count_saved_complaint(sender, instance, created, **kwargs):
+    key = instance.rollup_key()
+    previous = None if created else getattr(instance, '_rollup_key', None)
+    if not created and previous is None:
+        return  # loaded without the rollup fields; left to the rebuild command
+    if key != previous:
+        deltas = {key: 1}
+        if previous is not None:
+            deltas[previous] = -1
+        ComplaintRollup.adjust(deltas)
+    instance._rollup_key = key
+
+@receiver(post_delete, sender=Complaint)
+def count_deleted_complaint(sender, instance, **kwargs):
+    ComplaintRollup.adjust({getattr(instance, '_rollup_key', None) or instance.rollup_key(): -1})
\ No newline at end of file
@@ -0,0 +1,111 @@
+import base64
+from datetime import date
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+COUNT_CAP = 10000
+
+
+def approximate_count(queryset, cap=COUNT_CAP):
+    """
+    ``(count, exact)`` without scanning millions of rows: an exact count of at
+    most ``cap`` rows, and past that MySQL's optimizer estimate for the query.
+    """
+    capped = queryset.order_by()[:cap + 1].count()
+    if capped <= cap:
+        return capped, True
+    connection = connections[queryset.db]
+    if connection.vendor != 'mysql':
+        return cap, False
+    sql, params = queryset.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}", params)
+        columns = [column[0] for column in cursor.description]
+        row = dict(zip(columns, cursor.fetchone()))
+    estimate = int((row.get('rows') or 0) * float(row.get('filtered') or 100) / 100)
+    return max(estimate, cap), False
+
+
+class ComplaintCursorPagination(BasePagination):
+    """
+    Keyset pagination on (date, id). Each page continues from the last row
+    with ``date < d OR (date = d AND id < i)``, which the date indexes serve
+    directly, so page 10,000 costs the same as page 1. ``?ordering=date``
+    lists oldest first; the default is newest first.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_queryset = queryset
+        ascending = request.query_params.get('ordering') == 'date'
+        queryset = queryset.order_by(*(('date', 'id') if ascending else ('-date', '-id')))
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            cursor_date, cursor_id = cursor
+            if ascending:
+                queryset = queryset.filter(Q(date__gt=cursor_date) | Q(date=cursor_date, id__gt=cursor_id))
+            else:
+                queryset = queryset.filter(Q(date__lt=cursor_date) | Q(date=cursor_date, id__lt=cursor_id))
+
+        page_size = self.get_page_size(request)
+        rows = list(queryset[:page_size + 1])
+        self.page = rows[:page_size]
+        self.has_next = len(rows) > page_size
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor_date, cursor_id = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+            return date.fromisoformat(cursor_date), int(cursor_id)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, complaint):
+        return base64.urlsafe_b64encode(f"{complaint.date.isoformat()}|{complaint.id}".encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        count, exact = approximate_count(self.base_queryset)
+        return Response({
+            'next': self.get_next_link(),
+            'count': count,
+            'count_is_exact': exact,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_is_exact': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
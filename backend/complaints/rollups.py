@@ -0,0 +1,82 @@
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, Sum
+from .models import Complaint, ComplaintRollup
+
+GROUP_FIELDS = {
+    'day': ('day',),
+    'area': ('area', 'area__area_name'),
+    'department': ('department',),
+    'status': ('status',),
+}
+
+
+def _reconcile(first, last):
+    """
+    Recount complaints dated ``first``..``last`` and correct their rollup rows in
+    one short transaction. The rows are locked before counting, so a writer
+    either committed before the count saw its complaint or waits and applies
+    its change on top; corrections go through ``adjust`` like any other write.
+    """
+    with transaction.atomic():
+        existing = {
+            (day, area_id, department, status): count
+            for day, area_id, department, status, count in (
+                ComplaintRollup.objects.select_for_update()
+                .filter(day__gte=first, day__lte=last)
+                .values_list('day', 'area_id', 'department', 'status', 'count')
+            )
+        }
+        rows = (
+            Complaint.objects.filter(date__gte=first, date__lte=last)
+            .values('date', 'area_id', 'department', 'status')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        totals = {(row['date'], row['area_id'], row['department'], row['status']): row['total'] for row in rows}
+        deltas = {
+            key: totals.get(key, 0) - existing.get(key, 0)
+            for key in existing.keys() | totals.keys()
+            if totals.get(key, 0) != existing.get(key, 0)
+        }
+        ComplaintRollup.adjust(deltas)
+        deleted, _ = ComplaintRollup.objects.filter(day__gte=first, day__lte=last, count=0).delete()
+    created = sum(1 for key in deltas if key not in existing)
+    updated = sum(1 for key in deltas if key in existing and totals.get(key))
+    return created, updated, deleted
+
+
+def rebuild_rollups(days=1):
+    """
+    Recount every complaint and correct only the rollup rows that differ,
+    ``days`` distinct dates per transaction so live writers are held up for
+    one short range at a time rather than a whole-table scan.
+    Returns ``{'created', 'updated', 'deleted'}`` row counts; non-zero numbers
+    mean the counters had drifted (e.g. after a raw UPDATE or bulk import).
+    """
+    dates = sorted(
+        set(Complaint.objects.order_by().values_list('date', flat=True).distinct())
+        | set(ComplaintRollup.objects.order_by().values_list('day', flat=True).distinct())
+    )
+    fixed = Counter()
+    for index in range(0, len(dates), days):
+        group = dates[index:index + days]
+        created, updated, deleted = _reconcile(group[0], group[-1])
+        fixed.update(created=created, updated=updated, deleted=deleted)
+    return {'created': fixed['created'], 'updated': fixed['updated'], 'deleted': fixed['deleted']}
+
+
+def complaint_stats(queryset, group_by):
+    """
+    Sum rollup ``queryset`` by the ``group_by`` names (keys of GROUP_FIELDS).
+    Returns ``(total, rows)``; groups that net to zero are left out.
+    """
+    fields = [field for name in group_by for field in GROUP_FIELDS[name]]
+    total = queryset.aggregate(total=Sum('count'))['total'] or 0
+    if not fields:
+        return total, []
+    rows = queryset.values(*fields).annotate(count=Sum('count')).filter(count__gt=0).order_by(*fields)
+    return total, [
+        {('area_name' if key == 'area__area_name' else key): value for key, value in row.items()}
+        for row in rows
+    ]
@@ -0,0 +1,100 @@
+import re
+from django.db.models import Count, Sum
+from .models import Complaint, ComplaintSearchTerm, SEARCH_FIELDS, WORD_RE, search_terms
+
+MAX_QUERY_TERMS = 64
+# Most postings read per query. A term in more complaints than this only
+# ranks its newest holders, which keeps broad queries as fast as narrow ones.
+CANDIDATE_LIMIT = 2000
+DIALLING_PREFIX_RE = re.compile(r'\+\d{1,3}\b')
+
+
+def query_terms(query):
+    """
+    ``(terms, words)`` for ``query``: index terms a match must contain, and
+    short words ("12" in "mg road 12") it must contain as text, since they
+    have no trigrams to look up. A query of short words only looks them up
+    whole. A dialling prefix ("+91") is dropped: phone numbers are indexed as
+    their digit run, so "+91 98765 43210" still finds "98765 43210".
+    """
+    query = DIALLING_PREFIX_RE.sub(' ', str(query or ''))
+    terms = search_terms(query)
+    trigrams = {term for term in terms if len(term) == 3}
+    if not trigrams:
+        return sorted(terms)[:MAX_QUERY_TERMS], []
+    words = {word for word in WORD_RE.findall(query.casefold()) if len(word) < 3}
+    return sorted(trigrams)[:MAX_QUERY_TERMS], sorted(words)
+
+
+def _search_text(complaint):
+    values = [str(getattr(complaint, field) or '').casefold() for field, _ in SEARCH_FIELDS]
+    values.append(re.sub(r'\D', '', complaint.phone_number or ''))
+    return ' '.join(values)
+
+
+def search_complaints(query, queryset=None, limit=100):
+    """
+    Complaints matching every word of ``query`` (by trigram) in name, address,
+    phone number or ticket number, best first. A result's score is the sum of
+    its matched terms' field weights (ticket/phone over name over address);
+    ties go to the most recently added. ``queryset`` restricts the candidates,
+    e.g. to the list filters. Returns ``(complaints, count, exact)``: up to
+    ``limit`` complaints with ``score`` set, and how many matched in all.
+
+    Candidates come from the query's rarest term, at most CANDIDATE_LIMIT of
+    them, and only their postings are aggregated, so the cost is bounded by
+    the rarest term rather than the most common one. When the rarest term has
+    more postings than that, older matches are missed and ``exact`` is False.
+    """
+    terms, words = query_terms(query)
+    if not terms:
+        return [], 0, True
+    postings = ComplaintSearchTerm.objects.all()
+    if queryset is not None and queryset.query.where:
+        postings = postings.filter(complaint__in=queryset.order_by().values('id'))
+
+    sizes = {term: postings.filter(term=term)[:CANDIDATE_LIMIT + 1].count() for term in terms}
+    rarest = min(terms, key=sizes.get)
+    if not sizes[rarest]:
+        return [], 0, True
+    exact = sizes[rarest] <= CANDIDATE_LIMIT
+    candidates = list(
+        postings.filter(term=rarest).order_by('-complaint_id').values_list('complaint_id', flat=True)[:CANDIDATE_LIMIT]
+    )
+    if words:
+        fields = ['id'] + [field for field, _ in SEARCH_FIELDS]
+        candidates = [
+            complaint.id for complaint in Complaint.objects.filter(id__in=candidates).only(*fields)
+            if all(word in _search_text(complaint) for word in words)
+        ]
+    # Every match among the candidates, so the count is real; at most CANDIDATE_LIMIT rows.
+    matches = list(
+        postings.filter(term__in=terms, complaint_id__in=candidates)
+        .values('complaint_id')
+        .annotate(matched=Count('term', distinct=True), score=Sum('weight'))
+        .filter(matched=len(terms))
+        .order_by('-score', '-complaint_id')
+        .values_list('complaint_id', 'score')
+    )
+    ranked = matches[:limit]
+    complaints = Complaint.objects.in_bulk([complaint_id for complaint_id, _ in ranked])
+    results = []
+    for complaint_id, score in ranked:
+        complaint = complaints.get(complaint_id)
+        if complaint is not None:
+            complaint.score = score
+            results.append(complaint)
+    return results, len(matches), exact
+
+
+def rebuild_search_index(chunk_size=2000):
+    """Re-index every complaint, ``chunk_size`` per transaction. Returns the number indexed."""
+    fields = ['id'] + [field for field, _ in SEARCH_FIELDS]
+    indexed, last_id = 0, 0
+    while True:
+        chunk = list(Complaint.objects.filter(id__gt=last_id).order_by('id').only(*fields)[:chunk_size])
+        if not chunk:
+            return indexed
+        ComplaintSearchTerm.index(chunk)
+        indexed += len(chunk)
+        last_id = chunk[-1].id
@@ -1,3 +1,298 @@
-from django.test import TestCase
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
+from django.apps import apps
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from rest_framework.test import APIClient
+from area.models import Area
+from authapp.models import User
+from .imports import UnreadableFile, import_complaints, read_rows
+from .models import (
+    SERIAL_SEQUENCE, Complaint, ComplaintRollup, ComplaintSearchTerm, ComplaintSequence, assign_numbers,
+    complaint_terms,
+)
+from .pagination import approximate_count
+from .rollups import rebuild_rollups
+from .search import search_complaints
 
-# Create your tests here.
+# Stands in for the schema editor; the data migrations only read its alias.
+MIGRATION_EDITOR = SimpleNamespace(connection=connection)
+
+# Keep tests off the on-disk cache the running site uses.
+TEST_CACHES = {
+    **settings.CACHES,
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'complaints-tests'},
+    'users': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'complaints-tests-users'},
+}
+
+
+def make_complaint(area, **fields):
+    values = {
+        'complaint_type': 'Leak', 'name': 'Anil Kumar', 'address': 'MG Road, Kochi',
+        'phone_number': '9876543210', 'department': 'Water', **fields,
+    }
+    return Complaint.objects.create(area=area, **values)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ComplaintTestCase(TestCase):
+    def setUp(self):
+        self.area = Area.objects.create(area_name='Kochi')
+        self.user = User.objects.create_superuser(email='admin@example.com', username='admin', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class NumberAllocationTests(ComplaintTestCase):
+    def test_blocks_never_overlap(self):
+        blocks = [
+            (ComplaintSequence.allocate('test', count), count) for count in (1, 5, 1, 10, 3)
+        ]
+        numbers = [first + offset for first, count in blocks for offset in range(count)]
+        self.assertEqual(numbers, list(range(1, 21)))
+
+    def test_counter_starts_after_existing_numbers(self):
+        Complaint.objects.bulk_create([
+            Complaint(area=self.area, serial_no='041', ticket_number='KOC041', complaint_type='Leak', name='A',
+                      address='', phone_number='', department='Water'),
+        ])
+        complaint = make_complaint(self.area)
+        self.assertEqual((complaint.serial_no, complaint.ticket_number), ('042', 'KOC042'))
+
+    def test_batch_numbers_are_unique_per_prefix(self):
+        other = Area.objects.create(area_name='Aluva')
+        complaints = [
+            Complaint(area=area, complaint_type='Leak', name='A', address='', phone_number='', department='Water')
+            for area in [self.area, other] * 5
+        ]
+        assign_numbers(complaints)
+        self.assertEqual(len({complaint.serial_no for complaint in complaints}), 10)
+        tickets = sorted(complaint.ticket_number for complaint in complaints)
+        self.assertEqual(tickets, [f'ALU00{i}' for i in range(1, 6)] + [f'KOC00{i}' for i in range(1, 6)])
+        self.assertEqual(ComplaintSequence.objects.get(name=SERIAL_SEQUENCE).value, 10)
+
+    def test_created_complaints_get_distinct_numbers(self):
+        for _ in range(3):
+            response = self.client.post('/api/complaint/complaints/', {
+                'area': self.area.id, 'complaint_type': 'Leak', 'name': 'A', 'address': 'x',
+                'phone_number': '1', 'department': 'Water',
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(Complaint.objects.values_list('serial_no', flat=True)), ['001', '002', '003'])
+
+
+class CursorPaginationTests(ComplaintTestCase):
+    def setUp(self):
+        super().setUp()
+        start = date(2024, 1, 1)
+        # Several complaints per day, so pages often split inside one date.
+        for i in range(23):
+            make_complaint(self.area, date=start + timedelta(days=i // 4), status='completed' if i % 3 else 'processing')
+
+    def walk(self, **params):
+        seen, url, first = [], '/api/complaint/complaints/', True
+        while url:
+            response = self.client.get(url, {'page_size': 5, **params} if first else None)
+            self.assertEqual(response.status_code, 200)
+            seen += [complaint['id'] for complaint in response.data['results']]
+            url, first = response.data['next'], False
+        return seen
+
+    def test_pages_cover_every_complaint_once_in_order(self):
+        newest = Complaint.objects.order_by('-date', '-id').values_list('id', flat=True)
+        self.assertEqual(self.walk(), list(newest))
+        oldest = Complaint.objects.order_by('date', 'id').values_list('id', flat=True)
+        self.assertEqual(self.walk(ordering='date'), list(oldest))
+
+    def test_filters_carry_across_pages(self):
+        expected = Complaint.objects.filter(status='processing').order_by('-date', '-id').values_list('id', flat=True)
+        self.assertEqual(self.walk(status='processing'), list(expected))
+
+    def test_rows_added_between_pages_do_not_shift_the_next_page(self):
+        response = self.client.get('/api/complaint/complaints/', {'page_size': 5})
+        make_complaint(self.area, date=date(2030, 1, 1))
+        following = self.client.get(response.data['next']).data['results']
+        expected = Complaint.objects.order_by('-date', '-id').values_list('id', flat=True)[6:11]
+        self.assertEqual([complaint['id'] for complaint in following], list(expected))
+
+    def test_counts_and_bad_cursors(self):
+        response = self.client.get('/api/complaint/complaints/', {'page_size': 5})
+        self.assertEqual((response.data['count'], response.data['count_is_exact']), (23, True))
+        self.assertEqual(approximate_count(Complaint.objects.all(), cap=10), (10, False))
+        self.assertEqual(self.client.get('/api/complaint/complaints/', {'cursor': 'garbage'}).status_code, 404)
+
+
+class RollupTests(ComplaintTestCase):
+    day = date(2024, 3, 1)
+
+    def counts(self):
+        return {
+            (rollup.area_id, rollup.status): rollup.count
+            for rollup in ComplaintRollup.objects.filter(count__gt=0)
+        }
+
+    def test_counts_follow_create_update_and_delete(self):
+        first = make_complaint(self.area, date=self.day)
+        second = make_complaint(self.area, date=self.day)
+        self.assertEqual(self.counts(), {(self.area.id, 'processing'): 2})
+        first.status = 'completed'
+        first.save()
+        self.assertEqual(self.counts(), {(self.area.id, 'processing'): 1, (self.area.id, 'completed'): 1})
+        reloaded = Complaint.objects.get(pk=second.pk)
+        reloaded.status = 'accepted'
+        reloaded.save()
+        Complaint.objects.get(pk=first.pk).delete()
+        self.assertEqual(self.counts(), {(self.area.id, 'accepted'): 1})
+
+    def test_stats_groups_and_filters(self):
+        other = Area.objects.create(area_name='Aluva')
+        make_complaint(self.area, date=self.day)
+        make_complaint(self.area, date=self.day, status='completed')
+        make_complaint(other, date=self.day + timedelta(days=1))
+        response = self.client.get('/api/complaint/complaints/stats/', {'group_by': 'area'})
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(
+            [(row['area_name'], row['count']) for row in response.data['results']],
+            [('Kochi', 2), ('Aluva', 1)],
+        )
+        response = self.client.get('/api/complaint/complaints/stats/', {
+            'group_by': 'status', 'status': 'processing,accepted', 'date__lte': self.day.isoformat(),
+        })
+        self.assertEqual(response.data['results'], [{'status': 'processing', 'count': 1}])
+        bad = self.client.get('/api/complaint/complaints/stats/', {'group_by': 'colour'})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_rebuild_repairs_drift(self):
+        make_complaint(self.area, date=self.day)
+        make_complaint(self.area, date=self.day)
+        later = make_complaint(self.area, date=self.day + timedelta(days=3))
+        self.assertEqual(rebuild_rollups(), {'created': 0, 'updated': 0, 'deleted': 0})
+        # Queryset writes skip the signals, so the counters go stale.
+        Complaint.objects.filter(date=self.day).update(status='completed')
+        Complaint.objects.filter(pk=later.pk).update(date=self.day + timedelta(days=5))
+        ComplaintRollup.adjust({(self.day, self.area.id, 'Water', 'completed'): 1})
+        self.assertEqual(rebuild_rollups(days=2), {'created': 1, 'updated': 1, 'deleted': 2})
+        self.assertEqual(
+            {(rollup.day, rollup.status): rollup.count for rollup in ComplaintRollup.objects.all()},
+            {(self.day, 'completed'): 2, (self.day + timedelta(days=5), 'processing'): 1},
+        )
+
+
+class ImportTests(ComplaintTestCase):
+    url = '/api/complaint/complaints/import/'
+    header = 'area,complaint_type,name,date,address,phone_number,department,status\n'
+
+    def upload(self, body, name='complaints.csv', **data):
+        content = body if isinstance(body, bytes) else (self.header + body).encode()
+        return self.client.post(self.url, {'file': SimpleUploadedFile(name, content), **data}, format='multipart')
+
+    def test_valid_rows_import_and_bad_rows_are_listed(self):
+        response = self.upload(
+            'kochi,Leak,Anil,2024-03-01,MG Road,98765,Water,\n'
+            'Nowhere,Leak,Bina,2024-03-01,Fort,12345,Water,\n'
+            ',,,,,,,\n'
+            f'{self.area.id},Leak,,2024-03-02,Fort,12345,Water,completed\n'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            (response.data['rows'], response.data['imported'], response.data['failed']), (3, 1, 2)
+        )
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 4])
+        self.assertIn('area', response.data['errors'][0]['errors'])
+        self.assertIn('name', response.data['errors'][1]['errors'])
+        complaint = Complaint.objects.get()
+        self.assertEqual((complaint.area, complaint.created_by, complaint.ticket_number), (self.area, self.user, 'KOC001'))
+        self.assertEqual(ComplaintRollup.objects.get().count, 1)
+
+    def test_dry_run_writes_nothing(self):
+        response = self.upload('Kochi,Leak,Anil,2024-03-01,MG Road,98765,Water,\n', dry_run='true')
+        self.assertEqual((response.status_code, response.data['imported']), (200, 1))
+        self.assertFalse(Complaint.objects.exists())
+
+    def test_decode_error_after_valid_rows_writes_nothing(self):
+        # Past the first decode chunk, so earlier batches would already be in.
+        valid = (self.header + 'Kochi,Leak,Anil,2024-03-01,MG Road,98765,Water,\n' * 300).encode()
+        upload = io.BytesIO(valid + b'Kochi,Leak,\xff\xfe,2024-03-01,x,1,Water,\n')
+        with self.assertRaises(UnreadableFile):
+            import_complaints(lambda: read_rows(upload, 'complaints.csv'), batch_size=2)
+        self.assertFalse(Complaint.objects.exists())
+        self.assertFalse(ComplaintRollup.objects.exists())
+
+    def test_unreadable_workbooks_are_rejected(self):
+        self.assertEqual(self.upload(b'not a zip', name='complaints.xlsx').status_code, 400)
+        self.assertEqual(self.upload(b'PK\x05\x06' + bytes(18), name='complaints.xlsx').status_code, 400)
+        self.assertEqual(self.upload(b'', name='complaints.txt').status_code, 400)
+
+
+class SearchTests(ComplaintTestCase):
+    def search(self, q, **params):
+        response = self.client.get('/api/complaint/complaints/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def names(self, q, **params):
+        return [complaint['name'] for complaint in self.search(q, **params).data['results']]
+
+    def test_stronger_fields_rank_first(self):
+        make_complaint(self.area, name='Lakshmi', address='Near Joseph church')
+        make_complaint(self.area, name='Joseph', address='Fort Kochi')
+        response = self.search('joseph')
+        self.assertEqual([complaint['name'] for complaint in response.data['results']], ['Joseph', 'Lakshmi'])
+        self.assertGreater(response.data['results'][0]['score'], response.data['results'][1]['score'])
+        self.assertEqual((response.data['count'], response.data['count_is_exact']), (2, True))
+
+    def test_every_word_must_match(self):
+        make_complaint(self.area, name='Anil', address='12 MG Road')
+        make_complaint(self.area, name='Bina', address='48 MG Road')
+        make_complaint(self.area, name='Chitra', address='12 Market Road')
+        self.assertEqual(self.names('mg road 12'), ['Anil'])
+        self.assertEqual(self.names('road 48'), ['Bina'])
+        self.assertEqual(self.names('mg road'), ['Bina', 'Anil'])
+        self.assertEqual(self.names('road', name='Chitra'), ['Chitra'])
+
+    def test_phone_and_ticket_lookups(self):
+        complaint = make_complaint(self.area, name='Anil', phone_number='98765-43210')
+        make_complaint(self.area, name='Bina', phone_number='9123456780')
+        self.assertEqual(self.names('+91 98765 43210'), ['Anil'])
+        self.assertEqual(self.names(complaint.ticket_number.lower()), ['Anil'])
+        self.assertEqual(self.names('nobody'), [])
+
+    def test_count_is_inexact_when_candidates_are_capped(self):
+        for i in range(3):
+            make_complaint(self.area, name=f'Anil {i}')
+        with mock.patch('complaints.search.CANDIDATE_LIMIT', 2):
+            complaints, count, exact = search_complaints('anil')
+        self.assertEqual(([complaint.name for complaint in complaints], count, exact), (['Anil 2', 'Anil 1'], 2, False))
+        self.assertEqual(search_complaints('anil', limit=1)[1:], (3, True))
+
+    def test_backfill_migration_matches_live_index(self):
+        complaints = [make_complaint(self.area, name='Joseph', phone_number='+91 98765 43210'),
+                      make_complaint(self.area, address='12 MG Road')]
+        ComplaintSearchTerm.objects.filter(complaint=complaints[0]).delete()
+        backfill = import_module('complaints.migrations.0011_backfill_complaint_search').backfill_search_terms
+        # Rerunning over complaints that are already indexed replaces their postings.
+        backfill(apps, MIGRATION_EDITOR)
+        backfill(apps, MIGRATION_EDITOR)
+        for complaint in complaints:
+            stored = dict(complaint.search_terms.values_list('term', 'weight'))
+            self.assertEqual(stored, complaint_terms(complaint))
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentAllocationTests(TransactionTestCase):
+    def test_threads_never_share_a_number(self):
+        def allocate(_):
+            try:
+                return [ComplaintSequence.allocate('test', 2) for _ in range(25)]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            firsts = [first for block in pool.map(allocate, range(8)) for first in block]
+        self.assertEqual(sorted(firsts), list(range(1, 401, 2)))
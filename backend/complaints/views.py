@@ -1,16 +1,24 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.filters import OrderingFilter
-from django_filters.rest_framework import DjangoFilterBackend, FilterSet, CharFilter
-from complaints.models import Complaint
+from django_filters.rest_framework import (
+    DjangoFilterBackend, FilterSet, CharFilter, DateFilter, BaseInFilter, NumberFilter
+)
+from complaints.models import Complaint, ComplaintRollup
 from complaints.serializers import ComplaintSerializer
 from complaints.permissions import HasDeletePermission
-from authapp.models import Permission
+from complaints.pagination import ComplaintCursorPagination
+from complaints.rollups import GROUP_FIELDS, complaint_stats
+from complaints.imports import UnreadableFile, import_complaints, read_rows
+from complaints.search import search_complaints
+from authapp.permissions import has_permission
 from rest_framework.response import Response
 from rest_framework import status
 
 class ComplaintFilter(FilterSet):
     name = CharFilter(field_name='name', lookup_expr='icontains')
+    complaint_type = CharFilter(field_name='complaint_type', lookup_expr='exact')
     department = CharFilter(field_name='department', lookup_expr='exact')
     status = CharFilter(field_name='status', lookup_expr='exact')
     date__gte = CharFilter(field_name='date', lookup_expr='gte')
@@ -18,7 +26,21 @@ class ComplaintFilter(FilterSet):
 
     class Meta:
         model = Complaint
-        fields = ['name', 'department', 'status', 'date__gte', 'date__lte']
+        fields = ['name', 'complaint_type', 'department', 'status', 'area', 'date__gte', 'date__lte']
+
+class CharInFilter(BaseInFilter, CharFilter):
+    pass
+
+class ComplaintRollupFilter(FilterSet):
+    date__gte = DateFilter(field_name='day', lookup_expr='gte')
+    date__lte = DateFilter(field_name='day', lookup_expr='lte')
+    area = NumberFilter(field_name='area_id')
+    department = CharFilter(field_name='department', lookup_expr='exact')
+    status = CharInFilter(field_name='status', lookup_expr='in')
+
+    class Meta:
+        model = ComplaintRollup
+        fields = ['date__gte', 'date__lte', 'area', 'department', 'status']
 
 class ComplaintViewSet(viewsets.ModelViewSet):
     queryset = Complaint.objects.all()
@@ -26,23 +48,82 @@ class ComplaintViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, HasDeletePermission]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = ComplaintFilter
-    ordering_fields = ['date', 'serial_no', 'ticket_number']
+    pagination_class = ComplaintCursorPagination
+    # Pages are keyed on (date, id), so date is the only sort order.
+    ordering_fields = ['date']
     ordering = ['-date']
     page_name = 'complaints'
 
+    def list(self, request, *args, **kwargs):
+        """
+        ``?q=`` searches name, address, phone number and ticket number through
+        the search index and returns one ranked page (with ``score``) instead
+        of the date-ordered cursor pages; the other filters still apply.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return super().list(request, *args, **kwargs)
+        limit = self.paginator.get_page_size(request)
+        complaints, count, exact = search_complaints(query, self.filter_queryset(self.get_queryset()), limit)
+        results = self.get_serializer(complaints, many=True).data
+        for result, complaint in zip(results, complaints):
+            result['score'] = complaint.score
+        return Response({'next': None, 'count': count, 'count_is_exact': exact, 'results': results})
+
     def partial_update(self, request, *args, **kwargs):
-        if not request.user.is_superuser and request.user.role:
-            permission = Permission.objects.filter(
-                role=request.user.role,
-                page=self.page_name,
-                can_edit=True
-            ).exists()
-            if not permission:
-                return Response(
-                    {'detail': 'You do not have permission to edit complaints.'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
+        if request.user.role_id and not has_permission(request.user, self.page_name, 'can_edit', request.auth):
+            return Response(
+                {'detail': 'You do not have permission to edit complaints.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         return super().partial_update(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
\ No newline at end of file
+        serializer.save(created_by=self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Import complaints from an uploaded CSV or XLSX ``file`` with the
+        AddComplaint columns (``area`` by name). Rows are validated and
+        inserted in batches; invalid rows are skipped and listed in the
+        response. A file that cannot be read is rejected with 400 before
+        anything is written. ``dry_run=true`` only validates.
+        """
+        if request.user.role_id and not has_permission(request.user, self.page_name, 'can_add', request.auth):
+            return Response(
+                {'detail': 'You do not have permission to add complaints.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        upload = request.FILES.get('file')
+        if upload is None or not upload.name.lower().endswith(('.csv', '.xlsx')):
+            return Response({'error': 'Upload a .csv or .xlsx file.'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('true', '1')
+        try:
+            summary = import_complaints(
+                lambda: read_rows(upload.file, upload.name), user=request.user, dry_run=dry_run
+            )
+        except UnreadableFile as e:
+            return Response({'error': f'Could not read {upload.name}: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_200_OK if dry_run or not summary['imported'] else status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Complaint counts from the rollup table, never the complaints themselves.
+        ``?group_by=area,status`` (any of day, area, department, status), filtered
+        by ``date__gte``, ``date__lte``, ``area``, ``department`` and ``status``
+        (comma-separated, e.g. ``status=processing,accepted`` for open ones).
+        """
+        group_by = [name for name in request.query_params.get('group_by', '').split(',') if name]
+        unknown = [name for name in group_by if name not in GROUP_FIELDS]
+        if unknown:
+            return Response(
+                {'error': f"Unknown group_by: {', '.join(unknown)}. Use {', '.join(GROUP_FIELDS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rollups = ComplaintRollupFilter(request.query_params, queryset=ComplaintRollup.objects.all())
+        if not rollups.is_valid():
+            return Response({'error': rollups.errors}, status=status.HTTP_400_BAD_REQUEST)
+        total, results = complaint_stats(rollups.qs, group_by)
+        return Response({'total': total, 'group_by': group_by, 'results': results})
\ No newline at end of file
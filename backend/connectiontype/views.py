@@ -7,7 +7,7 @@ from .serializers import ConnectionTypeSerializer, ConnectionSerializer
 from .permissions import HasDeletePermission, HasAddPermission, HasEditPermission
 from rest_framework.response import Response
 from rest_framework import status
-from authapp.models import Permission
+from authapp.permissions import has_permission
 
 class ConnectionTypeViewSet(viewsets.ModelViewSet):
     queryset = ConnectionType.objects.all()
@@ -35,15 +35,9 @@ class ConnectionViewSet(viewsets.ModelViewSet):
     page_name = 'e-tapp'
 
     def partial_update(self, request, *args, **kwargs):
-        if not request.user.is_superuser and request.user.role:
-            permission = Permission.objects.filter(
-                role=request.user.role,
-                page=self.page_name,
-                can_edit=True
-            ).exists()
-            if not permission:
-                return Response(
-                    {'detail': 'You do not have permission to edit connections.'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
+        if request.user.role_id and not has_permission(request.user, self.page_name, 'can_edit', request.auth):
+            return Response(
+                {'detail': 'You do not have permission to edit connections.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         return super().partial_update(request, *args, **kwargs)
\ No newline at end of file
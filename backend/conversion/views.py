@@ -7,7 +7,7 @@ from .serializers import ConversionSerializer
 from .permissions import HasDeletePermission, HasEditPermission
 from rest_framework.response import Response
 from rest_framework import status
-from authapp.models import Permission
+from authapp.permissions import has_permission
 
 class ConversionFilter(FilterSet):
     date_gte = DateFilter(field_name='created_at', lookup_expr='gte')
@@ -29,15 +29,9 @@ class ConversionViewSet(viewsets.ModelViewSet):
     page_name = 'e-tapp'
 
     def partial_update(self, request, *args, **kwargs):
-        if not request.user.is_superuser and request.user.role:
-            permission = Permission.objects.filter(
-                role=request.user.role,
-                page=self.page_name,
-                can_edit=True
-            ).exists()
-            if not permission:
-                return Response(
-                    {'detail': 'You do not have permission to edit conversions.'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
+        if request.user.role_id and not has_permission(request.user, self.page_name, 'can_edit', request.auth):
+            return Response(
+                {'detail': 'You do not have permission to edit conversions.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         return super().partial_update(request, *args, **kwargs)
\ No newline at end of file
@@ -7,9 +7,13 @@ done
 
 echo "Applying migrations..."
 python manage.py migrate
+python manage.py createcachetable
 
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
-echo "Starting Gunicorn..."
-gunicorn backend.wsgi:application --bind 0.0.0.0:8000
+echo "Starting email outbox worker..."
+python manage.py send_outbox &
+
+echo "Starting Gunicorn (ASGI)..."
+gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000
@@ -0,0 +1,200 @@
+import math
+import time
+import numpy as np
+from .changes import apply_valve_changes
+from .engine import DEFAULT_FULL_OPEN, DEFAULT_MID_POINT, DEFAULT_STEEPNESS
+from .models import Valve
+
+MIN_OBSERVATIONS = 3
+ITERATIONS = 30
+MAX_ERRORS = 50
+# Openings of exactly 0 or 100 have no logit; pull them in for the starting guess.
+LOGIT_CLIP = 0.5
+# Stay inside the model validators and away from 0, which the engine treats as "unset".
+MID_POINT_RANGE = (1e-3, 1.0)
+STEEPNESS_RANGE = (1e-3, 100.0)
+
+
+def observations_from_rows(rows):
+    """
+    Parse ``[{"valve": id, "turns": n, "opening": percent}, ...]`` (JSON objects
+    or CSV rows) into arrays. Returns ``(valve_ids, turns, openings, errors)``;
+    errors name the row (1-based) and hold at most MAX_ERRORS entries.
+    """
+    valve_ids, turns, openings, errors = [], [], [], []
+    for number, row in enumerate(rows, start=1):
+        try:
+            valve_id = int(row['valve'])
+            turn = float(row['turns'])
+            opening = float(row['opening'])
+        except (KeyError, TypeError, ValueError):
+            error = 'valve, turns and opening are required numbers.'
+        else:
+            if not (math.isfinite(turn) and turn >= 0):
+                error = 'turns must be zero or more.'
+            elif not (math.isfinite(opening) and 0 <= opening <= 100):
+                error = 'opening must be a percentage between 0 and 100.'
+            else:
+                valve_ids.append(valve_id)
+                turns.append(turn)
+                openings.append(opening)
+                continue
+        if len(errors) < MAX_ERRORS:
+            errors.append({'row': number, 'error': error})
+    return (
+        np.array(valve_ids, dtype=np.int64), np.array(turns, dtype=float), np.array(openings, dtype=float), errors
+    )
+
+
+def _predict(ratios, steepness, mid_point):
+    with np.errstate(over='ignore'):
+        return 1.0 / (1.0 + np.exp(-steepness * (ratios - mid_point)))
+
+
+def _sse(groups, ratios, openings, steepness, mid_point, size):
+    residual = openings - 100.0 * _predict(ratios, steepness[groups], mid_point[groups])
+    return np.bincount(groups, weights=residual ** 2, minlength=size)
+
+
+def fit_curves(groups, ratios, openings, steepness, mid_point, iterations=ITERATIONS):
+    """
+    Least-squares fit of every valve's logistic curve at once.
+
+    ``groups`` maps each observation (``ratios`` = turns / full_open_condition,
+    ``openings`` in percent) to a valve index; ``steepness``/``mid_point`` are the
+    current parameters, used where a valve has too little data. A linear fit on
+    the logit gives the starting point, then Levenberg-Marquardt steps minimise
+    the squared opening error, with every per-valve sum built by np.bincount.
+    Returns ``(steepness, mid_point, fitted, sse)`` arrays.
+    """
+    size = len(steepness)
+    count = np.bincount(groups, minlength=size)
+
+    def total(values):
+        return np.bincount(groups, weights=values, minlength=size)
+
+    p = np.clip(openings, LOGIT_CLIP, 100.0 - LOGIT_CLIP) / 100.0
+    logit = np.log(p / (1.0 - p))
+    sx, sy, sxx, sxy = total(ratios), total(logit), total(ratios * ratios), total(ratios * logit)
+    spread = count * sxx - sx ** 2
+    fitted = (count >= MIN_OBSERVATIONS) & (spread > 1e-12)
+    safe_spread = np.where(fitted, spread, 1.0)
+    slope = (count * sxy - sx * sy) / safe_spread
+    intercept = (sy - slope * sx) / np.maximum(count, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        start_mid = np.where(slope > 0, -intercept / slope, DEFAULT_MID_POINT)
+    k = np.where(fitted, np.clip(slope, *STEEPNESS_RANGE), steepness)
+    x0 = np.where(fitted, np.clip(start_mid, *MID_POINT_RANGE), mid_point)
+
+    sse = _sse(groups, ratios, openings, k, x0, size)
+    damping = np.full(size, 1e-3)
+    for _ in range(iterations):
+        kk, xx = k[groups], x0[groups]
+        s = _predict(ratios, kk, xx)
+        residual = openings - 100.0 * s
+        slope_term = 100.0 * s * (1.0 - s)
+        jk = slope_term * (ratios - xx)
+        jx = -slope_term * kk
+        a11, a12, a22 = total(jk * jk), total(jk * jx), total(jx * jx)
+        b1, b2 = total(jk * residual), total(jx * residual)
+        a11 = a11 * (1.0 + damping) + 1e-9
+        a22 = a22 * (1.0 + damping) + 1e-9
+        det = a11 * a22 - a12 ** 2
+        det = np.where(np.abs(det) > 1e-18, det, 1e-18)
+        step_k = (a22 * b1 - a12 * b2) / det
+        step_x = (a11 * b2 - a12 * b1) / det
+        new_k = np.clip(k + step_k, *STEEPNESS_RANGE)
+        new_x0 = np.clip(x0 + step_x, *MID_POINT_RANGE)
+        new_sse = _sse(groups, ratios, openings, new_k, new_x0, size)
+        better = fitted & (new_sse < sse)
+        k, x0, sse = np.where(better, new_k, k), np.where(better, new_x0, x0), np.where(better, new_sse, sse)
+        damping = np.clip(np.where(better, damping / 10.0, damping * 10.0), 1e-9, 1e9)
+    return k, x0, fitted, sse
+
+
+def calibrate(valve_ids, turns, openings, curves):
+    """
+    Fit ``mid_point``/``steepness`` for every observed valve. ``curves`` maps
+    valve id -> (full_open_condition, mid_point, steepness). Returns a list of
+    per-valve results with fit metrics and a summary dict.
+    """
+    started = time.perf_counter()
+    ids = np.unique(valve_ids)
+    groups = np.searchsorted(ids, valve_ids)
+    full_open, mid_point, steepness = (
+        np.array([curves[valve_id][index] or default for valve_id in ids.tolist()], dtype=float)
+        for index, default in enumerate((DEFAULT_FULL_OPEN, DEFAULT_MID_POINT, DEFAULT_STEEPNESS))
+    )
+    ratios = turns / full_open[groups]
+
+    count = np.bincount(groups, minlength=len(ids))
+    before = _sse(groups, ratios, openings, steepness, mid_point, len(ids))
+    k, x0, fitted, after = fit_curves(groups, ratios, openings, steepness, mid_point)
+    mean = np.bincount(groups, weights=openings, minlength=len(ids)) / count
+    spread = np.bincount(groups, weights=(openings - mean[groups]) ** 2, minlength=len(ids))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(spread > 0, 1.0 - after / spread, np.nan)
+    rmse_before, rmse_after = np.sqrt(before / count), np.sqrt(after / count)
+
+    results = []
+    for index, valve_id in enumerate(ids.tolist()):
+        result = {
+            'id': valve_id,
+            'observations': int(count[index]),
+            'status': 'fitted' if fitted[index] else 'insufficient_data',
+            'previous': {
+                'mid_point': float(mid_point[index]),
+                'steepness': float(steepness[index]),
+                'rmse': round(float(rmse_before[index]), 3),
+            },
+        }
+        if fitted[index]:
+            result.update({
+                'mid_point': round(float(x0[index]), 4),
+                'steepness': round(float(k[index]), 4),
+                'rmse': round(float(rmse_after[index]), 3),
+                'r2': None if np.isnan(r2[index]) else round(float(r2[index]), 4),
+            })
+        results.append(result)
+
+    summary = {
+        'valves': len(ids),
+        'observations': int(len(valve_ids)),
+        'fitted': int(fitted.sum()),
+        'median_rmse_before': round(float(np.median(rmse_before[fitted])), 3) if fitted.any() else None,
+        'median_rmse_after': round(float(np.median(rmse_after[fitted])), 3) if fitted.any() else None,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    return results, summary
+
+
+def calibrate_valves(valve_ids, turns, openings, apply=False, user=None):
+    """
+    Fit the observed valves from the database. With ``apply``, valves whose
+    error went down get the new parameters through apply_valve_changes, so the
+    change is audited in ValveLog like any edit. Returns ``{'summary',
+    'results'}``, or only ``{'unknown': [ids]}`` without fitting anything
+    when some ids are not valves.
+    """
+    curves = {
+        valve_id: (full_open, mid_point, steepness)
+        for valve_id, full_open, mid_point, steepness in Valve.objects.filter(
+            id__in=set(valve_ids.tolist())
+        ).values_list('id', 'full_open_condition', 'mid_point', 'steepness')
+    }
+    unknown = sorted(set(valve_ids.tolist()) - set(curves))
+    if unknown:
+        return {'unknown': unknown}
+
+    results, summary = calibrate(valve_ids, turns, openings, curves)
+    applied = []
+    if apply:
+        improved = {
+            result['id']: {'mid_point': result['mid_point'], 'steepness': result['steepness']}
+            for result in results
+            if result['status'] == 'fitted' and result['rmse'] < result['previous']['rmse']
+        }
+        valves = Valve.objects.in_bulk(list(improved))
+        applied, _ = apply_valve_changes([(valves[valve_id], data) for valve_id, data in improved.items()], user)
+    summary['applied'] = len(applied)
+    return {'summary': summary, 'results': results}
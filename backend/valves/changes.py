@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+from .engine import CURVE_FIELDS
+from .models import NUMERIC_LOG_FIELDS, Valve, ValveLog
+from .stream import hub
+from .tiles import invalidate_tiles
+
+
+def apply_valve_changes(changes, user):
+    """
+    Apply ``[(valve, validated_data), ...]`` atomically.
+
+    Fields are diffed in memory, every resulting ValveLog row is written with
+    one bulk_create and the valves with one bulk_update, so the cost no longer
+    grows with the number of changed fields. Map tiles are invalidated on
+    commit, only at the old and new positions of valves that moved or whose
+    opening inputs changed.
+    """
+    logs, valves, fields, tile_points = [], [], {'opening'}, set()
+    map_fields = {'latitude', 'longitude', *CURVE_FIELDS}
+    for valve, data in changes:
+        on_map = map_fields.intersection(data)
+        if on_map:
+            tile_points.add((valve.latitude, valve.longitude))
+        for field, new_value in data.items():
+            old_value = getattr(valve, field)
+            if old_value != new_value:
+                logs.append(ValveLog.for_change(valve, user, field, old_value, new_value))
+
+        if 'current_condition' in data:
+            valve.previous_position = str(valve.current_condition)
+            fields.add('previous_position')
+
+        for attr, value in data.items():
+            setattr(valve, attr, value)
+        valve.opening = valve.compute_opening()
+        if 'latitude' in data or 'longitude' in data:
+            valve.geohash = valve.compute_geohash()
+            fields.add('geohash')
+        fields.update(data)
+        valves.append(valve)
+        if on_map:
+            tile_points.add((valve.latitude, valve.longitude))
+
+    with transaction.atomic():
+        if logs:
+            ValveLog.objects.bulk_create(logs)
+        if valves:
+            Valve.objects.bulk_update(valves, sorted(fields))
+        if tile_points:
+            transaction.on_commit(lambda: invalidate_tiles(tile_points))
+        if logs:
+            transaction.on_commit(hub.notify)
+    return valves, logs
+
+
+# Text CAST can convert without erroring on every backend. Anything else hand-edited
+# into the legacy columns stays as text instead of failing a strict-mode UPDATE.
+NUMBER_PATTERN = r'^[-+]?([0-9]+([.][0-9]*)?|[.][0-9]+)([eE][-+]?[0-9]+)?$'
+
+
+def _text_to_number(column):
+    # str(None) was logged for cleared coordinates; anything else is str(float).
+    return Case(When(**{column: 'None'}, then=Value(None)), default=Cast(column, FloatField()))
+
+
+def _is_convertible(column):
+    return Q(**{f'{column}__isnull': True}) | Q(**{column: 'None'}) | Q(**{f'{column}__regex': NUMBER_PATTERN})
+
+
+def encode_numeric_history(queryset=None, chunk_size=5000):
+    """
+    Move numeric changes still stored as text into old_number/new_number.
+    Each primary-key range of ``chunk_size`` rows is converted in SQL by one
+    UPDATE and committed on its own. Rows whose text is not a plain number
+    are left as they are.
+    """
+    if queryset is None:
+        queryset = ValveLog.objects.all()
+    pending = queryset.filter(changed_field__in=NUMERIC_LOG_FIELDS).exclude(
+        old_value__isnull=True, new_value__isnull=True
+    )
+    last_id, converted = 0, 0
+    while True:
+        chunk_ids = list(pending.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not chunk_ids:
+            return converted
+        with transaction.atomic(using=pending.db):
+            converted += pending.filter(
+                _is_convertible('old_value'), _is_convertible('new_value'),
+                id__gte=chunk_ids[0], id__lte=chunk_ids[-1],
+            ).update(
+                old_number=_text_to_number('old_value'),
+                new_number=_text_to_number('new_value'),
+                old_value=None,
+                new_value=None,
+            )
+        last_id = chunk_ids[-1]
@@ -0,0 +1,77 @@
+import numpy as np
+
+CURVE_FIELDS = ('current_condition', 'full_open_condition', 'mid_point', 'steepness')
+DEFAULT_FULL_OPEN = 100.0
+DEFAULT_MID_POINT = 0.5
+DEFAULT_STEEPNESS = 12.5
+
+
+def opening_percentages(current_condition, full_open_condition, mid_point, steepness):
+    """
+    Vectorized logistic opening curve, matching calculatePercentage in the cms:
+
+        opening = 100 / (1 + e^(-k * (n / N - x0)))
+
+    Accepts scalars or equal-length arrays and returns percentages in [0, 100]
+    rounded to one decimal. Missing or zero N, k and x0 fall back to the model
+    defaults, and a missing n counts as closed, as in the browser.
+    """
+    n = np.nan_to_num(np.asarray(current_condition, dtype=float), nan=0.0)
+    full_open = np.asarray(full_open_condition, dtype=float)
+    x0 = np.asarray(mid_point, dtype=float)
+    k = np.asarray(steepness, dtype=float)
+
+    full_open = np.where(np.isnan(full_open) | (full_open == 0), DEFAULT_FULL_OPEN, full_open)
+    x0 = np.where(np.isnan(x0) | (x0 == 0), DEFAULT_MID_POINT, x0)
+    k = np.where(np.isnan(k) | (k == 0), DEFAULT_STEEPNESS, k)
+
+    with np.errstate(over='ignore'):
+        percentage = 100.0 / (1.0 + np.exp(-k * (n / full_open - x0)))
+    return np.round(np.clip(percentage, 0.0, 100.0), 1)
+
+
+def load_curve_arrays(queryset):
+    """Fetch ids and curve parameters for a queryset as NumPy arrays in one query."""
+    rows = np.array(list(queryset.order_by('id').values_list('id', *CURVE_FIELDS)), dtype=float)
+    rows = rows.reshape(-1, len(CURVE_FIELDS) + 1)
+    ids = rows[:, 0].astype(np.int64)
+    return ids, {field: rows[:, index + 1] for index, field in enumerate(CURVE_FIELDS)}
+
+
+def simulate_openings(ids, arrays, changes=()):
+    """
+    Apply hypothetical ``changes`` to copies of the curve arrays and compute openings.
+    Each change is ``{'ids': [...], <curve field>: value, ...}``. Nothing is written.
+    """
+    arrays = {field: values.copy() for field, values in arrays.items()}
+    positions = {valve_id: index for index, valve_id in enumerate(ids.tolist())}
+    for change in changes:
+        index = np.fromiter((positions[valve_id] for valve_id in change['ids']), dtype=np.int64)
+        for field in CURVE_FIELDS:
+            if field in change:
+                arrays[field][index] = change[field]
+    return arrays, opening_percentages(*(arrays[field] for field in CURVE_FIELDS))
+
+
+def refresh_openings(queryset, chunk_size=1000):
+    """
+    Recompute the stored ``opening`` column for every valve in ``queryset``,
+    walking primary keys in chunks and writing each chunk with one bulk_update.
+    Use after writes that bypass Valve.save (bulk_update, queryset.update).
+    """
+    model = queryset.model
+    last_id, updated = 0, 0
+    while True:
+        chunk_ids = list(
+            queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not chunk_ids:
+            return updated
+        ids, arrays = load_curve_arrays(model.objects.filter(id__in=chunk_ids))
+        openings = opening_percentages(*(arrays[field] for field in CURVE_FIELDS))
+        model.objects.bulk_update(
+            [model(id=valve_id, opening=opening) for valve_id, opening in zip(ids.tolist(), openings.tolist())],
+            ['opening'],
+        )
+        updated += len(chunk_ids)
+        last_id = chunk_ids[-1]
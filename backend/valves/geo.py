@@ -0,0 +1,152 @@
+import math
+import numpy as np
+from django.db.models import Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # cells of roughly 5 m x 5 m
+MAX_COVER_CELLS = 32
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+
+def _bits(precision):
+    """Latitude and longitude bits in a geohash of ``precision`` characters."""
+    total = 5 * precision
+    return total // 2, total - total // 2
+
+
+def _interleave(lat_index, lon_index, precision):
+    """Cell indices -> geohash integer, longitude bit first as geohash defines."""
+    lat_bits, lon_bits = _bits(precision)
+    value = 0
+    for position in range(5 * precision):
+        if position % 2 == 0:
+            lon_bits -= 1
+            bit = (lon_index >> lon_bits) & 1
+        else:
+            lat_bits -= 1
+            bit = (lat_index >> lat_bits) & 1
+        value = (value << 1) | bit
+    return value
+
+
+def _to_text(value, precision):
+    chars = []
+    for _ in range(precision):
+        chars.append(BASE32[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def _cell_index(lat, lon, precision):
+    lat_bits, lon_bits = _bits(precision)
+    lat_index = min(int((lat + 90.0) / 180.0 * (1 << lat_bits)), (1 << lat_bits) - 1)
+    lon_index = min(int((lon + 180.0) / 360.0 * (1 << lon_bits)), (1 << lon_bits) - 1)
+    return lat_index, lon_index
+
+
+def encode(lat, lon, precision=GEOHASH_PRECISION):
+    """Geohash of a point, or None when either coordinate is missing."""
+    if lat is None or lon is None:
+        return None
+    lat = max(-90.0, min(90.0, float(lat)))
+    lon = max(-180.0, min(180.0, float(lon)))
+    return _to_text(_interleave(*_cell_index(lat, lon, precision), precision), precision)
+
+
+def cover(south, west, north, east):
+    """
+    Geohash prefix ranges ``[(low, high), ...]`` covering a bounding box, using
+    the finest precision that needs at most MAX_COVER_CELLS cells. Cells that
+    are consecutive in geohash order are merged into one range.
+
+    Each range is half-open, ``low <= geohash < high``, with ``high`` the next
+    cell's prefix (None past the last cell). Both ends use only geohash
+    characters, so the range holds under case- and accent-insensitive
+    collations such as MySQL's utf8mb4_0900_ai_ci as well as binary ones.
+    """
+    if west > east:
+        # Crosses the antimeridian.
+        return cover(south, west, north, 180.0) + cover(south, -180.0, north, east)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_low, lon_low = _cell_index(south, west, precision)
+        lat_high, lon_high = _cell_index(north, east, precision)
+        if (lat_high - lat_low + 1) * (lon_high - lon_low + 1) <= MAX_COVER_CELLS or precision == 1:
+            break
+    cells = sorted(
+        _interleave(lat_index, lon_index, precision)
+        for lat_index in range(lat_low, lat_high + 1)
+        for lon_index in range(lon_low, lon_high + 1)
+    )
+    ranges = []
+    for cell in cells:
+        if ranges and ranges[-1][1] == cell - 1:
+            ranges[-1][1] = cell
+        else:
+            ranges.append([cell, cell])
+    return [
+        (_to_text(low, precision), _to_text(high + 1, precision) if high + 1 < 32 ** precision else None)
+        for low, high in ranges
+    ]
+
+
+def bbox_filter(south, west, north, east, field='geohash'):
+    """
+    Q object selecting points inside the box: index range scans on the geohash
+    column, then an exact coordinate check on the few candidates they return.
+    """
+    cells = Q()
+    for low, high in cover(south, west, north, east):
+        cell = Q(**{f'{field}__gte': low})
+        if high is not None:
+            cell &= Q(**{f'{field}__lt': high})
+        cells |= cell
+    if west > east:
+        longitude = Q(longitude__gte=west) | Q(longitude__lte=east)
+    else:
+        longitude = Q(longitude__gte=west, longitude__lte=east)
+    return cells & Q(latitude__gte=south, latitude__lte=north) & longitude
+
+
+def bbox_around(lat, lon, radius_m):
+    """(south, west, north, east) of a box containing the circle of ``radius_m``."""
+    dlat = radius_m / METERS_PER_DEGREE
+    dlon = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    if dlon >= 180.0:
+        west, east = -180.0, 180.0
+    else:
+        west = (lon - dlon + 540.0) % 360.0 - 180.0
+        east = (lon + dlon + 540.0) % 360.0 - 180.0
+    return max(lat - dlat, -90.0), west, min(lat + dlat, 90.0), east
+
+
+def distances_m(lat, lon, lats, lons):
+    """Vectorized haversine distance in metres from one point to arrays of points."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lons, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest(queryset, lat, lon, k, start_radius_m=500.0):
+    """
+    The ``k`` valves in ``queryset`` closest to (lat, lon) as ``[(id, metres), ...]``.
+    Searches a box around the point and doubles its radius until it holds ``k``
+    candidates no farther than the radius, so only nearby rows are read.
+    """
+    radius = start_radius_m
+    while True:
+        whole_world = radius >= math.pi * EARTH_RADIUS_M
+        candidates = queryset.exclude(latitude=None).exclude(longitude=None)
+        if not whole_world:
+            candidates = candidates.filter(bbox_filter(*bbox_around(lat, lon, radius)))
+        rows = list(candidates.values_list('id', 'latitude', 'longitude'))
+        if rows:
+            ids, lats, lons = zip(*rows)
+            distance = distances_m(lat, lon, lats, lons)
+            order = np.argsort(distance, kind='stable')[:k]
+            if whole_world or (len(order) == k and distance[order[-1]] <= radius):
+                return [(ids[index], float(distance[index])) for index in order.tolist()]
+        elif whole_world:
+            return []
+        radius *= 2
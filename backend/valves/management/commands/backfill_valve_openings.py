@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from valves.engine import refresh_openings
+from valves.models import Valve
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored opening percentage for existing valves in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = refresh_openings(Valve.objects.all(), options['chunk_size'])
+        self.stdout.write(f"Recomputed opening for {updated} valves")
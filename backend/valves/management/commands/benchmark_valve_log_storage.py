@@ -0,0 +1,110 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Avg, Count, F, Sum
+from django.db.models.functions import Length
+from valves.changes import encode_numeric_history
+from valves.models import NUMERIC_LOG_FIELDS, Valve, ValveLog
+
+DOUBLE_BYTES = 8
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare text and float storage of numeric ValveLog history on synthetic rows: '
+        'column payload, table size (MySQL) and scan speed. Runs only against a scratch '
+        'database alias (migrated with `migrate --database <alias>`); the scratch valve is removed afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', required=True, help='Scratch database alias; never the live one.')
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=3, help='Report the best of this many scans.')
+
+    def handle(self, *args, **options):
+        self.database = options['database']
+        if self.database not in connections.settings:
+            raise CommandError(f"Unknown database alias {self.database!r}.")
+        live, scratch = connections.settings[DEFAULT_DB_ALIAS], connections.settings[self.database]
+        same_server = all(scratch.get(key) == live.get(key) for key in ('ENGINE', 'HOST', 'PORT', 'NAME'))
+        if self.database == DEFAULT_DB_ALIAS or same_server:
+            # The live log feeds SSE dashboards, snapshots and compaction.
+            raise CommandError('Refusing to write synthetic ValveLog rows to the live database.')
+
+        # No coordinates, so creating and removing it touches no map tiles.
+        valve = Valve.objects.using(self.database).create(
+            name='benchmark-valve-log-storage', size='-', full_open_condition=100, current_condition=0, remarks=''
+        )
+        try:
+            logs = ValveLog.objects.using(self.database).filter(valve=valve)
+            self.insert_legacy_rows(valve, options['rows'])
+            text_bytes = logs.aggregate(total=Sum(Length('old_value') + Length('new_value')))['total'] or 0
+            self.report('text', text_bytes, self.best_of(options['repeat'], lambda: self.text_scan(logs)))
+
+            encode_numeric_history(logs)
+            numbers = logs.aggregate(old=Count('old_number'), new=Count('new_number'))
+            number_bytes = (numbers['old'] + numbers['new']) * DOUBLE_BYTES
+            self.report('float', number_bytes, self.best_of(options['repeat'], lambda: self.number_scan(logs)))
+        finally:
+            valve.delete()
+
+    def insert_legacy_rows(self, valve, count, batch_size=5000):
+        """Write rows the way history was stored before typed columns: str(float) in text."""
+        rows = []
+        for _ in range(count):
+            old = round(random.uniform(0, 1000), 2)
+            rows.append(ValveLog(
+                valve=valve,
+                changed_field=random.choice(NUMERIC_LOG_FIELDS),
+                old_value=str(old),
+                new_value=str(round(old + random.uniform(-50, 50), 2)),
+            ))
+        ValveLog.objects.using(self.database).bulk_create(rows, batch_size=batch_size)
+        self.stdout.write(f"Inserted {count} synthetic text-encoded rows")
+        self.stdout.write(f"Table size on disk: {self.table_size()}")
+
+    def text_scan(self, logs):
+        # Text cannot be aggregated in SQL portably; fetch and parse every row.
+        totals = {}
+        for field, old, new in logs.values_list('changed_field', 'old_value', 'new_value').iterator(chunk_size=5000):
+            total, count = totals.get(field, (0.0, 0))
+            totals[field] = (total + float(new) - float(old), count + 1)
+        return {field: total / count for field, (total, count) in totals.items()}
+
+    def number_scan(self, logs):
+        return dict(
+            logs.values('changed_field').annotate(delta=Avg(F('new_number') - F('old_number')))
+            .values_list('changed_field', 'delta')
+        )
+
+    def best_of(self, repeat, scan):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            scan()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def table_size(self):
+        connection = connections[self.database]
+        if connection.vendor != 'mysql':
+            return 'n/a (MySQL only)'
+        table = ValveLog._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE TABLE {connection.ops.quote_name(table)}")
+            cursor.fetchall()
+            cursor.execute(
+                "SELECT data_length + index_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+            return f"{cursor.fetchone()[0] / 1024 / 1024:.1f} MiB"
+
+    def report(self, label, payload_bytes, seconds):
+        self.stdout.write(
+            f"{label:>5}: value payload {payload_bytes / 1024 / 1024:.2f} MiB, "
+            f"average change per field in {seconds * 1000:.1f} ms"
+        )
+        if label == 'float':
+            self.stdout.write(f"Table size on disk: {self.table_size()}")
@@ -0,0 +1,27 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from valves.calibration import calibrate_valves, observations_from_rows
+
+
+class Command(BaseCommand):
+    help = 'Fit valve mid_point/steepness from a CSV of valve,turns,opening readings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with valve, turns and opening columns.')
+        parser.add_argument('--apply', action='store_true', help='Save improved fits (logged in ValveLog).')
+
+    def handle(self, *args, **options):
+        with open(options['path'], newline='', encoding='utf-8-sig') as handle:
+            valve_ids, turns, openings, errors = observations_from_rows(csv.DictReader(handle))
+        if errors:
+            raise CommandError('; '.join(f"row {error['row']}: {error['error']}" for error in errors))
+
+        result = calibrate_valves(valve_ids, turns, openings, apply=options['apply'])
+        if 'unknown' in result:
+            raise CommandError(f"Valves not found: {result['unknown']}")
+        summary = result['summary']
+        self.stdout.write(
+            f"Fitted {summary['fitted']} of {summary['valves']} valves from {summary['observations']} readings "
+            f"in {summary['seconds']}s; median RMSE {summary['median_rmse_before']} -> {summary['median_rmse_after']}; "
+            f"applied {summary['applied']}"
+        )
@@ -0,0 +1,23 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from valves.models import ValveCheckpoint
+from valves.snapshots import write_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Write a checkpoint of every valve for point-in-time snapshots. Schedule it, e.g. hourly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days', type=int, default=None,
+            help='Also delete checkpoints older than this many days, always keeping the newest one.'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = write_checkpoint()
+        self.stdout.write(f"Checkpointed {checkpoint.valve_count} valves at {checkpoint.taken_at:%Y-%m-%d %H:%M:%S}")
+        if options['keep_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['keep_days'])
+            deleted, _ = ValveCheckpoint.objects.filter(taken_at__lt=cutoff).exclude(id=checkpoint.id).delete()
+            self.stdout.write(f"Deleted {deleted} checkpoints older than {options['keep_days']} days")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from valves.retention import compact_valve_logs, months_ago
+
+
+class Command(BaseCommand):
+    help = 'Roll ValveLog entries older than the retention window into per-day summaries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12, help='Keep full history for this many months.')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months must be at least 1.')
+        cutoff = months_ago(options['months'])
+        compacted, touched = compact_valve_logs(cutoff, options['chunk_size'])
+        self.stdout.write(f"Compacted {compacted} log entries before {cutoff:%Y-%m-%d} ({touched} daily summary writes)")
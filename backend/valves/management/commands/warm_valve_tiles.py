@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from valves.models import Valve
+from valves.tiles import MAX_TILE_ZOOM, warm_tiles
+
+
+class Command(BaseCommand):
+    help = 'Precompute and cache the clustered valve map tiles for every zoom level.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-zoom', type=int, default=MAX_TILE_ZOOM)
+
+    def handle(self, *args, **options):
+        written = warm_tiles(Valve.objects.all(), min(options['max_zoom'], MAX_TILE_ZOOM))
+        self.stdout.write(f"Cached {written} valve map tiles")
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:27
+
+import math
+from django.db import migrations, models
+
+
+def opening_percentage(current_condition, full_open_condition, mid_point, steepness):
+    # Frozen copy of valves.engine.opening_percentages for one valve.
+    n = current_condition or 0.0
+    full_open = full_open_condition or 100.0
+    x0 = mid_point or 0.5
+    k = steepness or 12.5
+    exponent = -k * (n / full_open - x0)
+    percentage = 0.0 if exponent > 700 else 100.0 / (1.0 + math.exp(exponent))
+    return round(min(max(percentage, 0.0), 100.0), 1)
+
+
+def backfill_opening(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Valve = apps.get_model('valves', 'Valve')
+    fields = ('current_condition', 'full_open_condition', 'mid_point', 'steepness')
+    last_id = 0
+    while True:
+        chunk = list(Valve.objects.using(db).filter(id__gt=last_id).order_by('id').only('id', *fields)[:2000])
+        if not chunk:
+            return
+        for valve in chunk:
+            valve.opening = opening_percentage(*(getattr(valve, field) for field in fields))
+        Valve.objects.using(db).bulk_update(chunk, ['opening'])
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+    # Opening depends only on the row's own curve fields, so if the backfill dies
+    # part-way a rerun just recomputes the finished chunks to the same values.
+    atomic = False
+
+    dependencies = [
+        ('valves', '0005_remove_valve_location_link_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='valve',
+            name='opening',
+            field=models.FloatField(db_index=True, default=0, editable=False, help_text='Opening percentage from the logistic curve, kept in sync on save.'),
+        ),
+        migrations.RunPython(backfill_opening, migrations.RunPython.noop),
+    ]
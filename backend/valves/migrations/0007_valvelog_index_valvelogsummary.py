@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('valves', '0006_valve_opening'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValveLogSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('changed_field', models.CharField(max_length=100)),
+                ('first_value', models.TextField(help_text='Value before the first change of the day.')),
+                ('last_value', models.TextField(help_text='Value after the last change of the day.')),
+                ('min_value', models.FloatField(blank=True, null=True)),
+                ('max_value', models.FloatField(blank=True, null=True)),
+                ('change_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='valvelog',
+            index=models.Index(fields=['valve', 'timestamp'], name='valvelog_valve_timestamp_idx'),
+        ),
+        migrations.AddField(
+            model_name='valvelogsummary',
+            name='valve',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_summaries', to='valves.valve'),
+        ),
+        migrations.AddConstraint(
+            model_name='valvelogsummary',
+            constraint=models.UniqueConstraint(fields=('valve', 'day', 'changed_field'), name='unique_valvelog_summary'),
+        ),
+    ]
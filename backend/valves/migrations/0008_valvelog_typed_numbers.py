@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('valves', '0007_valvelog_index_valvelogsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='valvelog',
+            name='new_number',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='valvelog',
+            name='old_number',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='valvelog',
+            name='new_value',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='valvelog',
+            name='old_value',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations, transaction
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+
+# Frozen copies of valves.models.NUMERIC_LOG_FIELDS and valves.changes.NUMBER_PATTERN.
+NUMERIC_LOG_FIELDS = (
+    'current_condition', 'full_open_condition', 'mid_point', 'steepness', 'latitude', 'longitude',
+)
+NUMBER_PATTERN = r'^[-+]?([0-9]+([.][0-9]*)?|[.][0-9]+)([eE][-+]?[0-9]+)?$'
+
+
+def text_to_number(column):
+    return Case(When(**{column: 'None'}, then=Value(None)), default=Cast(column, FloatField()))
+
+
+def is_convertible(column):
+    # Text that is not a plain number stays as text instead of failing a strict-mode CAST.
+    return Q(**{f'{column}__isnull': True}) | Q(**{column: 'None'}) | Q(**{f'{column}__regex': NUMBER_PATTERN})
+
+
+def encode_history(apps, schema_editor):
+    db = schema_editor.connection.alias
+    ValveLog = apps.get_model('valves', 'ValveLog')
+    pending = ValveLog.objects.using(db).filter(changed_field__in=NUMERIC_LOG_FIELDS).exclude(
+        old_value__isnull=True, new_value__isnull=True
+    )
+    last_id = 0
+    while True:
+        chunk_ids = list(pending.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:5000])
+        if not chunk_ids:
+            return
+        with transaction.atomic(using=db):
+            pending.filter(
+                is_convertible('old_value'), is_convertible('new_value'),
+                id__gte=chunk_ids[0], id__lte=chunk_ids[-1],
+            ).update(
+                old_number=text_to_number('old_value'),
+                new_number=text_to_number('new_value'),
+                old_value=None,
+                new_value=None,
+            )
+        last_id = chunk_ids[-1]
+
+
+def decode_history(apps, schema_editor):
+    db = schema_editor.connection.alias
+    ValveLog = apps.get_model('valves', 'ValveLog')
+    pending = ValveLog.objects.using(db).filter(changed_field__in=NUMERIC_LOG_FIELDS, old_value__isnull=True)
+    last_id = 0
+    while True:
+        chunk = list(pending.filter(id__gt=last_id).order_by('id')[:5000])
+        if not chunk:
+            return
+        for log in chunk:
+            log.old_value, log.new_value = str(log.old_number), str(log.new_number)
+        ValveLog.objects.using(db).bulk_update(chunk, ['old_value', 'new_value'])
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+    # Each chunk's UPDATE sets the numbers and clears the text together, so rows
+    # converted before a failure drop out of ``pending`` and a rerun resumes.
+    atomic = False
+
+    dependencies = [
+        ('valves', '0008_valvelog_typed_numbers'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode_history, decode_history),
+    ]
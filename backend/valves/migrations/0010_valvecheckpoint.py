@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('valves', '0009_encode_numeric_valvelog_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValveCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(unique=True)),
+                ('valve_count', models.PositiveIntegerField(default=0)),
+                ('data', models.JSONField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='valvelog',
+            index=models.Index(fields=['timestamp'], name='valvelog_timestamp_idx'),
+        ),
+    ]
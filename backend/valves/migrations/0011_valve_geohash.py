@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('valves', '0010_valvecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='valve',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Geohash of latitude/longitude for viewport and nearest-valve queries.', max_length=12, null=True),
+        ),
+    ]
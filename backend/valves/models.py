@@ -1,6 +1,13 @@
+import math
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .engine import CURVE_FIELDS, opening_percentages
+from . import geo
+from .tiles import invalidate_tiles
 
 class Valve(models.Model):
     name = models.CharField(max_length=100)
@@ -39,17 +46,138 @@ class Valve(models.Model):
     previous_position = models.CharField(max_length=100, null=True, blank=True, default=None)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    opening = models.FloatField(
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text="Opening percentage from the logistic curve, kept in sync on save."
+    )
+    geohash = models.CharField(
+        max_length=12,
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Geohash of latitude/longitude for viewport and nearest-valve queries."
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'latitude' in field_names and 'longitude' in field_names:
+            # Where the stored row sits on the map, so a move refreshes the tiles it left.
+            instance._map_point = (instance.latitude, instance.longitude)
+        return instance
+
+    def compute_opening(self):
+        return float(opening_percentages(*(getattr(self, field) for field in CURVE_FIELDS)))
+
+    def compute_geohash(self):
+        return geo.encode(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.opening = self.compute_opening()
+        self.geohash = self.compute_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if update_fields & set(CURVE_FIELDS):
+                update_fields.add('opening')
+            if update_fields & {'latitude', 'longitude'}:
+                update_fields.add('geohash')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
+@receiver([post_save, post_delete], sender=Valve)
+def invalidate_valve_tiles(sender, instance, **kwargs):
+    """New, saved or deleted valves refresh the map tiles around them, at the old position too."""
+    points = [(instance.latitude, instance.longitude), getattr(instance, '_map_point', (None, None))]
+    instance._map_point = points[0]
+    transaction.on_commit(lambda: invalidate_tiles(points))
+
+# Logged as floats; every other field keeps its text in old_value/new_value.
+NUMERIC_LOG_FIELDS = (
+    'current_condition', 'full_open_condition', 'mid_point', 'steepness', 'latitude', 'longitude',
+)
+
+def parse_logged_number(text):
+    """Number in unconverted ValveLog text ('12.5', legacy '11,5'); None for 'None' or anything else."""
+    try:
+        number = float(str(text).strip().replace(',', '.'))
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
 class ValveLog(models.Model):
     valve = models.ForeignKey(Valve, related_name='logs', on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     changed_field = models.CharField(max_length=100)
-    old_value = models.TextField()
-    new_value = models.TextField()
+    old_value = models.TextField(null=True, blank=True)
+    new_value = models.TextField(null=True, blank=True)
+    old_number = models.FloatField(null=True, blank=True)
+    new_number = models.FloatField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['valve', 'timestamp'], name='valvelog_valve_timestamp_idx'),
+            models.Index(fields=['timestamp'], name='valvelog_timestamp_idx'),
+        ]
+
+    @classmethod
+    def for_change(cls, valve, user, field, old, new):
+        """Build a log row, storing numeric fields as floats and the rest as text."""
+        if field in NUMERIC_LOG_FIELDS:
+            return cls(valve=valve, user=user, changed_field=field, old_number=old, new_number=new)
+        return cls(valve=valve, user=user, changed_field=field, old_value=str(old), new_value=str(new))
+
+    # Numeric history that could not be converted keeps its text, so fall back to it.
+    @property
+    def old(self):
+        if self.changed_field in NUMERIC_LOG_FIELDS and self.old_value is None:
+            return self.old_number
+        return self.old_value
+
+    @property
+    def new(self):
+        if self.changed_field in NUMERIC_LOG_FIELDS and self.new_value is None:
+            return self.new_number
+        return self.new_value
+
+    def __str__(self):
+        return f"{self.valve.name} - {self.changed_field} changed on {self.timestamp}"
+
+class ValveLogSummary(models.Model):
+    """One row per valve, day and field for ValveLog entries past the retention window."""
+    valve = models.ForeignKey(Valve, related_name='log_summaries', on_delete=models.CASCADE)
+    day = models.DateField()
+    changed_field = models.CharField(max_length=100)
+    first_value = models.TextField(help_text="Value before the first change of the day.")
+    last_value = models.TextField(help_text="Value after the last change of the day.")
+    min_value = models.FloatField(null=True, blank=True)
+    max_value = models.FloatField(null=True, blank=True)
+    change_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['valve', 'day', 'changed_field'], name='unique_valvelog_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.valve.name} - {self.changed_field} on {self.day} ({self.change_count} changes)"
+
+class ValveCheckpoint(models.Model):
+    """
+    Column-oriented copy of every valve's logged fields at ``taken_at``:
+    ``{"id": [...], "<field>": [...]}``. Point-in-time snapshots start here
+    and replay only the ValveLog rows written after it.
+    """
+    taken_at = models.DateTimeField(unique=True)
+    valve_count = models.PositiveIntegerField(default=0)
+    data = models.JSONField()
+
     def __str__(self):
-        return f"{self.valve.name} - {self.changed_field} changed on {self.timestamp}"
\ No newline at end of file
+        return f"Checkpoint of {self.valve_count} valves at {self.taken_at}"
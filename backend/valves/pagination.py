@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ValveLogCursorPagination(CursorPagination):
+    """Newest first; keyset pagination rides the (valve, timestamp) index."""
+    ordering = ('-timestamp', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class ValveLogSummaryCursorPagination(CursorPagination):
+    ordering = ('-day', 'changed_field')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import NUMERIC_LOG_FIELDS, ValveLog, ValveLogSummary
+
+
+def months_ago(months, now=None):
+    """Return the same wall-clock time ``months`` calendar months before ``now``."""
+    now = now or timezone.now()
+    month_index = now.year * 12 + now.month - 1 - months
+    year, month = divmod(month_index, 12)
+    day = now.day
+    while True:
+        try:
+            return now.replace(year=year, month=month + 1, day=day)
+        except ValueError:
+            # Clamp e.g. 31 March to the last day of February.
+            day -= 1
+
+
+def _as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_text(value):
+    return '' if value is None else str(value)
+
+
+def _merge_range(summary, value):
+    number = _as_number(value)
+    if number is None:
+        return
+    summary.min_value = number if summary.min_value is None else min(summary.min_value, number)
+    summary.max_value = number if summary.max_value is None else max(summary.max_value, number)
+
+
+def compact_valve_logs(cutoff, chunk_size=5000):
+    """
+    Roll ValveLog rows older than ``cutoff`` into per-day ValveLogSummary rows
+    (first, last, min, max and change count per valve and field), then delete them.
+
+    Rows are read in timestamp order and each chunk is summarized, merged into any
+    summary an earlier chunk or run already wrote for that day, and deleted in one
+    transaction, so the command can be interrupted and rerun safely.
+    Returns ``(compacted_logs, touched_summaries)``.
+    """
+    compacted, touched = 0, 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                ValveLog.objects.filter(timestamp__lt=cutoff)
+                .order_by('timestamp', 'id')
+                .values_list(
+                    'id', 'valve_id', 'changed_field', 'old_value', 'new_value', 'old_number', 'new_number', 'timestamp'
+                )[:chunk_size]
+            )
+            if not rows:
+                return compacted, touched
+
+            keys = {
+                (valve_id, timezone.localdate(timestamp), field)
+                for _, valve_id, field, *_, timestamp in rows
+            }
+            existing = {
+                (summary.valve_id, summary.day, summary.changed_field): summary
+                for summary in ValveLogSummary.objects.filter(
+                    valve_id__in={key[0] for key in keys},
+                    day__in={key[1] for key in keys},
+                    changed_field__in={key[2] for key in keys},
+                )
+                if (summary.valve_id, summary.day, summary.changed_field) in keys
+            }
+
+            created = {}
+            for _, valve_id, field, old_text, new_text, old_number, new_number, timestamp in rows:
+                numeric = field in NUMERIC_LOG_FIELDS
+                old_value = old_number if numeric and old_text is None else old_text
+                new_value = new_number if numeric and new_text is None else new_text
+                key = (valve_id, timezone.localdate(timestamp), field)
+                summary = existing.get(key) or created.get(key)
+                if summary is None:
+                    summary = created[key] = ValveLogSummary(
+                        valve_id=valve_id, day=key[1], changed_field=field, first_value=_as_text(old_value),
+                    )
+                    _merge_range(summary, old_value)
+                summary.last_value = _as_text(new_value)
+                summary.change_count += 1
+                _merge_range(summary, new_value)
+
+            ValveLogSummary.objects.bulk_create(created.values())
+            if existing:
+                ValveLogSummary.objects.bulk_update(
+                    existing.values(), ['last_value', 'min_value', 'max_value', 'change_count']
+                )
+            ValveLog.objects.filter(id__in=[row[0] for row in rows]).delete()
+
+        compacted += len(rows)
+        touched += len(created) + len(existing)
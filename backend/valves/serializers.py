@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Valve, ValveLog
+from .models import Valve, ValveLog, ValveLogSummary
+from .changes import apply_valve_changes
 
 class ValveSerializer(serializers.ModelSerializer):
     def validate_full_open_condition(self, value):
@@ -36,8 +37,9 @@ class ValveSerializer(serializers.ModelSerializer):
             'previous_position',
             'latitude',
             'longitude',
+            'opening',
         ]
-        read_only_fields = ['previous_position']
+        read_only_fields = ['previous_position', 'opening']
 
     def create(self, validated_data):
         if 'previous_position' not in validated_data:
@@ -45,29 +47,35 @@ class ValveSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
-        old_current_condition = instance.current_condition
-
-        for field, new_value in validated_data.items():
-            old_value = getattr(instance, field)
-            if old_value != new_value:
-                ValveLog.objects.create(
-                    valve=instance,
-                    user=self.context['request'].user,
-                    changed_field=field,
-                    old_value=str(old_value),
-                    new_value=str(new_value)
-                )
-
-        if 'current_condition' in validated_data:
-            instance.previous_position = str(old_current_condition)
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
+        apply_valve_changes([(instance, validated_data)], self.context['request'].user)
         return instance
 
 class ValveLogSerializer(serializers.ModelSerializer):
+    # Numbers for numeric fields, text for name, size and remarks.
+    old_value = serializers.ReadOnlyField(source='old')
+    new_value = serializers.ReadOnlyField(source='new')
+
     class Meta:
         model = ValveLog
-        fields = '__all__'
\ No newline at end of file
+        exclude = ['old_number', 'new_number']
+
+class ValveLogSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ValveLogSummary
+        fields = '__all__'
+
+class ValveConditionChangeSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    current_condition = serializers.FloatField(required=False, min_value=0, max_value=1000)
+    full_open_condition = serializers.FloatField(required=False, min_value=0, max_value=1000)
+    mid_point = serializers.FloatField(required=False, min_value=0, max_value=1)
+    steepness = serializers.FloatField(required=False, min_value=0, max_value=100)
+
+    def validate(self, data):
+        if len(data) == 1:
+            raise serializers.ValidationError("Specify at least one condition to change.")
+        return data
+
+class ValveSimulationSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    changes = ValveConditionChangeSerializer(many=True, required=False)
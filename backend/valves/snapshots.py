@@ -0,0 +1,81 @@
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from .engine import CURVE_FIELDS, opening_percentages
+from .models import NUMERIC_LOG_FIELDS, Valve, ValveCheckpoint, ValveLog, ValveLogSummary, parse_logged_number
+
+SNAPSHOT_FIELDS = ('name', 'size', 'remarks') + NUMERIC_LOG_FIELDS
+# Log timestamps are set before commit, so a change stamped just before a
+# checkpoint may land after it was read. Replaying that window again is
+# harmless: replay only ever sets a field to its latest logged value.
+REPLAY_OVERLAP = timedelta(minutes=1)
+
+
+def write_checkpoint():
+    """Store the current value of every snapshot field for all valves in one row."""
+    with transaction.atomic():
+        taken_at = timezone.now()
+        rows = list(Valve.objects.order_by('id').values_list('id', *SNAPSHOT_FIELDS))
+        data = {'id': [row[0] for row in rows]}
+        for index, field in enumerate(SNAPSHOT_FIELDS, start=1):
+            data[field] = [row[index] for row in rows]
+        return ValveCheckpoint.objects.create(taken_at=taken_at, valve_count=len(rows), data=data)
+
+
+def valve_state_at(at):
+    """
+    Reconstruct every valve as of ``at`` from the nearest earlier checkpoint plus
+    the ValveLog rows between them. Returns ``None`` when no checkpoint precedes
+    ``at``, else a dict with the states, the checkpoint used, how many log rows
+    were replayed and whether retention already compacted part of that window.
+
+    Valves created after the checkpoint are not included; changes that bypass
+    ValveLog (admin edits, new valves) are picked up by the next checkpoint.
+    """
+    checkpoint = ValveCheckpoint.objects.filter(taken_at__lte=at).order_by('-taken_at').first()
+    if checkpoint is None:
+        return None
+
+    data = checkpoint.data
+    states = {
+        valve_id: {'id': valve_id, **{field: data[field][index] for field in SNAPSHOT_FIELDS}}
+        for index, valve_id in enumerate(data['id'])
+    }
+
+    logs = (
+        ValveLog.objects.filter(
+            timestamp__gt=checkpoint.taken_at - REPLAY_OVERLAP,
+            timestamp__lte=at,
+            changed_field__in=SNAPSHOT_FIELDS,
+        )
+        .order_by('timestamp', 'id')
+        .values_list('valve_id', 'changed_field', 'new_value', 'new_number')
+    )
+    replayed = 0
+    for valve_id, field, new_value, new_number in logs.iterator(chunk_size=5000):
+        state = states.get(valve_id)
+        if state is None:
+            continue
+        if field not in NUMERIC_LOG_FIELDS:
+            state[field] = new_value
+        elif new_number is not None or new_value is None:
+            state[field] = new_number
+        else:
+            # Unconverted history (e.g. a legacy '11,5') still has only its text.
+            state[field] = parse_logged_number(new_value)
+        replayed += 1
+
+    results = list(states.values())
+    openings = opening_percentages(*([state[field] for state in results] for field in CURVE_FIELDS))
+    for state, opening in zip(results, openings.tolist()):
+        state['opening'] = opening
+
+    compacted = ValveLogSummary.objects.filter(
+        day__gte=timezone.localdate(checkpoint.taken_at), day__lte=timezone.localdate(at)
+    ).exists()
+    return {
+        'checkpoint': checkpoint.taken_at,
+        'replayed_logs': replayed,
+        'complete': not compacted or checkpoint.taken_at == at,
+        'results': results,
+    }
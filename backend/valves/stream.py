@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from .models import NUMERIC_LOG_FIELDS, Valve, ValveLog
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0  # seconds between ValveLog polls while anyone is listening
+BATCH_SIZE = 500
+QUEUE_SIZE = 64  # batches buffered per client before it is told to resync
+CATCH_UP_LIMIT = 1000  # log rows replayed for a reconnecting client
+KEEPALIVE_INTERVAL = 15.0
+RESYNC = 'resync'
+VALVE_FIELDS = {field.name for field in Valve._meta.concrete_fields}
+
+
+def latest_log_id():
+    close_old_connections()
+    return ValveLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def fetch_events(after_id, limit=BATCH_SIZE):
+    """
+    Turn ValveLog rows after ``after_id`` into stream events. Returns
+    ``(events, last_id, log_count)`` where events are ``(id, name, payload)``:
+    one ``log`` per row, then one ``valve`` delta per touched valve carrying the
+    current value of each changed field plus its opening.
+    """
+    close_old_connections()
+    rows = list(
+        ValveLog.objects.filter(id__gt=after_id).order_by('id').values_list(
+            'id', 'valve_id', 'user_id', 'changed_field', 'old_value', 'new_value', 'old_number', 'new_number',
+            'timestamp',
+        )[:limit]
+    )
+    if not rows:
+        return [], after_id, 0
+
+    events, touched = [], {}
+    for log_id, valve_id, user_id, field, old_text, new_text, old_number, new_number, timestamp in rows:
+        numeric = field in NUMERIC_LOG_FIELDS
+        events.append((log_id, 'log', {
+            'id': log_id,
+            'valve': valve_id,
+            'user': user_id,
+            'changed_field': field,
+            'old_value': old_number if numeric and old_text is None else old_text,
+            'new_value': new_number if numeric and new_text is None else new_text,
+            'timestamp': timestamp.isoformat(),
+        }))
+        _, fields = touched.get(valve_id, (0, set()))
+        touched[valve_id] = (log_id, fields | ({field} & VALVE_FIELDS))
+
+    changed = set().union(*(fields for _, fields in touched.values()))
+    current = {
+        row['id']: row
+        for row in Valve.objects.filter(id__in=touched).values('id', 'opening', 'previous_position', *changed)
+    }
+    for valve_id, (last_id, fields) in touched.items():
+        valve = current.get(valve_id)
+        if valve is None:
+            continue  # deleted since
+        delta = {'id': valve_id, 'opening': valve['opening']}
+        delta.update((field, valve[field]) for field in fields)
+        if 'current_condition' in fields:
+            delta['previous_position'] = valve['previous_position']
+        events.append((last_id, 'valve', delta))
+    return events, rows[-1][0], len(rows)
+
+
+def format_event(event_id, name, payload):
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+class ValveEventHub:
+    """
+    Per-process fan-out. While any client in this worker is connected, one
+    task tails ValveLog and hands each batch to every subscriber's queue, so
+    the database sees one poll per worker however many dashboards watch.
+    Writes made in this worker wake the poller at once through ``notify``.
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL, queue_size=QUEUE_SIZE):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.last_id = None
+        self._subscribers = set()
+        self._task = None
+        self._loop = None
+        self._wakeup = None
+        self._ready = None
+
+    async def subscribe(self):
+        """
+        Register a queue and return it once the poller has its starting point,
+        so anything logged after this call reaches the queue.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def notify(self):
+        """Thread-safe: poll now instead of at the next interval."""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def _publish(self, batch):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(batch)
+            except asyncio.QueueFull:
+                # Too slow to keep up: drop its backlog and ask it to reload.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def _run(self):
+        fetch = sync_to_async(fetch_events, thread_sensitive=False)
+        try:
+            self.last_id = await sync_to_async(latest_log_id, thread_sensitive=False)()
+            self._ready.set()
+            while self._subscribers:
+                try:
+                    events, self.last_id, count = await fetch(self.last_id)
+                except Exception:
+                    logger.exception("Valve stream poll failed")
+                    events, count = [], 0
+                if events:
+                    self._publish(events)
+                if count >= BATCH_SIZE:
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        except Exception:
+            logger.exception("Valve stream hub stopped")
+        finally:
+            self._ready.set()
+            self.last_id = None
+
+
+hub = ValveEventHub()
+
+
+async def stream_events(last_event_id=None):
+    """
+    Server-sent events for one client: a catch-up from ``last_event_id`` when
+    reconnecting, then live batches from the hub, with keepalive comments.
+    """
+    queue = await hub.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        sent = 0
+        if last_event_id is not None:
+            events, _, count = await sync_to_async(fetch_events, thread_sensitive=False)(
+                last_event_id, CATCH_UP_LIMIT
+            )
+            if count >= CATCH_UP_LIMIT:
+                yield format_event(last_event_id, RESYNC, {})
+            else:
+                for event in events:
+                    yield format_event(*event)
+                sent = max((event_id for event_id, name, _ in events if name == 'log'), default=last_event_id)
+        while True:
+            try:
+                batch = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if batch == RESYNC:
+                yield format_event(hub.last_id or 0, RESYNC, {})
+                continue
+            # Log entries already sent during catch-up are skipped; valve deltas
+            # carry current state, so repeating one is harmless.
+            chunk = ''.join(
+                format_event(*event) for event in batch if event[1] == 'valve' or event[0] > sent
+            )
+            if chunk:
+                yield chunk
+    finally:
+        hub.unsubscribe(queue)
@@ -1,3 +1,472 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from importlib import import_module
+import asyncio
+import json
+import random
+from types import SimpleNamespace
+from unittest import mock
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from authapp.models import User
+from .calibration import calibrate_valves, observations_from_rows
+from .changes import encode_numeric_history
+from .engine import opening_percentages
+from .geo import BASE32, bbox_filter, cover, encode
+from .models import Valve, ValveCheckpoint, ValveLog, ValveLogSummary
+from .retention import compact_valve_logs, months_ago
+from .snapshots import valve_state_at, write_checkpoint
+from . import tiles
+from .stream import RESYNC, ValveEventHub, fetch_events, format_event
 
-# Create your tests here.
+# Stands in for the schema editor; the data migrations only read its alias.
+MIGRATION_EDITOR = SimpleNamespace(connection=connection)
+
+# Tiles live in their own on-disk cache on the running site; keep tests off it.
+TEST_CACHES = {
+    **settings.CACHES,
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'valves-tests'},
+    'users': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'valves-tests-users'},
+    'tiles': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'valves-tests-tiles'},
+}
+
+
+def make_valve(name='V1', current_condition=50, full_open_condition=100, **fields):
+    return Valve.objects.create(
+        name=name, size='100mm', remarks='', current_condition=current_condition,
+        full_open_condition=full_open_condition, **fields,
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ValveAPITestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(email='admin@example.com', username='admin', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class OpeningCurveTests(TestCase):
+    def test_matches_logistic_curve_and_defaults(self):
+        self.assertEqual(float(opening_percentages(50, 100, 0.5, 12.5)), 50.0)
+        self.assertEqual(float(opening_percentages(0, 100, 0.5, 12.5)), 0.2)
+        # Zero N, x0 and k fall back to the model defaults; a missing n is closed.
+        self.assertEqual(float(opening_percentages(50, 0, 0, 0)), 50.0)
+        self.assertEqual(float(opening_percentages(None, 100, 0.5, 12.5)), 0.2)
+
+    def test_arrays_match_scalars(self):
+        turns = [0, 25, 50, 75, 100]
+        self.assertEqual(
+            opening_percentages(turns, [100] * 5, [0.5] * 5, [12.5] * 5).tolist(),
+            [float(opening_percentages(n, 100, 0.5, 12.5)) for n in turns],
+        )
+
+
+class OpeningSimulationTests(ValveAPITestCase):
+    def test_simulation_does_not_save(self):
+        closed, half = make_valve('A', 0), make_valve('B', 50)
+        response = self.client.post('/api/valve/valves/openings/', {
+            'ids': [closed.id, half.id],
+            'changes': [{'ids': [closed.id], 'current_condition': 100}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['simulated'])
+        openings = {row['id']: row['opening'] for row in response.data['results']}
+        self.assertEqual(openings, {closed.id: 99.8, half.id: 50.0})
+        closed.refresh_from_db()
+        self.assertEqual((closed.current_condition, closed.opening), (0, 0.2))
+
+    def test_unknown_ids_are_rejected(self):
+        valve = make_valve()
+        response = self.client.post('/api/valve/valves/openings/', {
+            'ids': [valve.id], 'changes': [{'ids': [valve.id + 1], 'current_condition': 10}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class StoredOpeningTests(ValveAPITestCase):
+    def test_opening_follows_saves(self):
+        valve = make_valve(current_condition=0)
+        self.assertEqual(valve.opening, 0.2)
+        valve.current_condition = 100
+        valve.save(update_fields=['current_condition'])
+        valve.refresh_from_db()
+        self.assertEqual(valve.opening, 99.8)
+
+    def test_range_filter_and_ordering(self):
+        for name, turns in (('closed', 0), ('half', 50), ('open', 100)):
+            make_valve(name, turns)
+        response = self.client.get('/api/valve/valves/', {'opening_gte': 10, 'opening_lte': 90})
+        self.assertEqual([valve['name'] for valve in response.data], ['half'])
+        response = self.client.get('/api/valve/valves/', {'ordering': '-opening'})
+        self.assertEqual([valve['name'] for valve in response.data], ['open', 'half', 'closed'])
+
+    def test_migration_backfills_existing_rows(self):
+        migration = import_module('valves.migrations.0006_valve_opening')
+        for turns in (0, 13, 50, 87, 100, 1000):
+            self.assertEqual(
+                migration.opening_percentage(turns, 100, 0.5, 12.5), float(opening_percentages(turns, 100, 0.5, 12.5))
+            )
+        self.assertEqual(migration.opening_percentage(None, 0, 0, 0), float(opening_percentages(None, 0, 0, 0)))
+
+        valve = make_valve(current_condition=75)
+        Valve.objects.update(opening=0)
+        migration.backfill_opening(apps, MIGRATION_EDITOR)
+        valve.refresh_from_db()
+        self.assertEqual(valve.opening, valve.compute_opening())
+
+
+class BulkUpdateTests(ValveAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.valves = [make_valve(f'V{i}', 50) for i in range(5)]
+
+    def test_updates_all_valves_and_logs_each_change(self):
+        body = {'valves': [{'id': valve.id, 'current_condition': 0, 'remarks': 'burst'} for valve in self.valves]}
+        with self.assertNumQueries(7):
+            # The same for any number of valves: one locking read, one insert for all logs and
+            # one update for all valves, plus the savepoints of the two nested atomic blocks.
+            response = self.client.post('/api/valve/valves/bulk-update/', body, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({valve['opening'] for valve in response.data}, {0.2})
+        logs = ValveLog.objects.filter(changed_field='current_condition')
+        self.assertEqual(logs.count(), 5)
+        self.assertEqual({(log.old, log.new) for log in logs}, {(50.0, 0.0)})
+        self.assertEqual(ValveLog.objects.filter(changed_field='remarks').first().new, 'burst')
+        self.assertEqual(set(Valve.objects.values_list('previous_position', flat=True)), {'50.0'})
+
+    def test_one_invalid_entry_applies_nothing(self):
+        body = {'valves': [
+            {'id': self.valves[0].id, 'current_condition': 10},
+            {'id': self.valves[1].id, 'current_condition': 'wide open'},
+        ]}
+        response = self.client.post('/api/valve/valves/bulk-update/', body, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(self.valves[1].id, response.data['errors'])
+        self.assertFalse(ValveLog.objects.exists())
+        self.assertEqual(Valve.objects.get(pk=self.valves[0].id).current_condition, 50)
+
+    def test_unknown_and_duplicate_ids_are_rejected(self):
+        for ids in ([self.valves[0].id, self.valves[0].id], [self.valves[-1].id + 100], [True]):
+            body = {'valves': [{'id': valve_id, 'current_condition': 1} for valve_id in ids]}
+            self.assertEqual(self.client.post('/api/valve/valves/bulk-update/', body, format='json').status_code, 400)
+        self.assertFalse(ValveLog.objects.exists())
+
+
+class RetentionTests(ValveAPITestCase):
+    def log(self, valve, field, old, new, at):
+        log = ValveLog.for_change(valve, self.user, field, old, new)
+        log.save()
+        ValveLog.objects.filter(pk=log.pk).update(timestamp=at)
+
+    def test_months_ago_clamps_to_month_end(self):
+        now = timezone.make_aware(datetime(2024, 3, 31, 12, 0))
+        self.assertEqual(months_ago(1, now), timezone.make_aware(datetime(2024, 2, 29, 12, 0)))
+        self.assertEqual(months_ago(14, now), timezone.make_aware(datetime(2023, 1, 31, 12, 0)))
+
+    def test_compaction_summarises_per_day_across_chunks_and_runs(self):
+        valve = make_valve()
+        day = timezone.now() - timedelta(days=400)
+        self.log(valve, 'current_condition', 50, 10, day)
+        self.log(valve, 'current_condition', 10, 80, day + timedelta(minutes=1))
+        self.log(valve, 'remarks', 'old', 'new', day)
+        recent = timezone.now() - timedelta(days=1)
+        self.log(valve, 'current_condition', 80, 20, recent)
+
+        cutoff = months_ago(12)
+        self.assertEqual(compact_valve_logs(cutoff, chunk_size=1)[0], 3)
+        # A later log for the same day merges into the existing summary.
+        self.log(valve, 'current_condition', 80, 5, day + timedelta(minutes=2))
+        compact_valve_logs(cutoff)
+
+        summary = ValveLogSummary.objects.get(changed_field='current_condition')
+        self.assertEqual(
+            (summary.first_value, summary.last_value, summary.min_value, summary.max_value, summary.change_count),
+            ('50.0', '5.0', 5.0, 80.0, 3),
+        )
+        remarks = ValveLogSummary.objects.get(changed_field='remarks')
+        self.assertEqual((remarks.first_value, remarks.last_value, remarks.min_value), ('old', 'new', None))
+        self.assertEqual(list(ValveLog.objects.values_list('timestamp', flat=True)), [recent])
+
+    def test_log_cursor_pages_are_continuous(self):
+        valve = make_valve()
+        start = timezone.now() - timedelta(hours=1)
+        for i in range(7):
+            # Pairs share a timestamp so the id tie-breaker matters.
+            self.log(valve, 'current_condition', i, i + 1, start + timedelta(minutes=i // 2))
+        seen, url = [], f'/api/valve/logs/?valve_id={valve.id}&page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen += [log['id'] for log in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, list(ValveLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True)))
+        self.assertEqual(len(seen), 7)
+
+
+class NumericHistoryTests(ValveAPITestCase):
+    def legacy_log(self, valve, old, new, field='current_condition'):
+        return ValveLog.objects.create(valve=valve, changed_field=field, old_value=old, new_value=new)
+
+    def check_encoding(self, encode):
+        valve = make_valve()
+        plain = self.legacy_log(valve, '12.5', '-.5')
+        cleared = self.legacy_log(valve, '10.0', 'None', field='latitude')
+        exponent = self.legacy_log(valve, '1e-05', '3.')
+        typo = self.legacy_log(valve, 'about 3 turns', '4')
+        text = self.legacy_log(valve, 'Old', 'New', field='remarks')
+        encode()
+
+        for log, expected in ((plain, (12.5, -0.5)), (cleared, (10.0, None)), (exponent, (1e-05, 3.0))):
+            log.refresh_from_db()
+            self.assertEqual((log.old_number, log.new_number, log.old_value, log.new_value), (*expected, None, None))
+        # Text a CAST could choke on is left alone and still reads back as logged.
+        typo.refresh_from_db()
+        self.assertEqual((typo.old, typo.new, typo.old_number), ('about 3 turns', '4', None))
+        text.refresh_from_db()
+        self.assertEqual((text.old, text.new), ('Old', 'New'))
+
+    def test_encode_numeric_history(self):
+        self.check_encoding(lambda: encode_numeric_history(chunk_size=2))
+
+    def test_migration_is_self_contained(self):
+        migration = import_module('valves.migrations.0009_encode_numeric_valvelog_history')
+        self.check_encoding(lambda: migration.encode_history(apps, MIGRATION_EDITOR))
+
+    def test_api_shows_numbers_for_new_logs(self):
+        valve = make_valve()
+        self.client.patch(f'/api/valve/valves/{valve.id}/', {'current_condition': 20}, format='json')
+        log = self.client.get('/api/valve/logs/', {'valve_id': valve.id}).data['results'][0]
+        self.assertEqual((log['old_value'], log['new_value']), (50.0, 20.0))
+
+
+class SnapshotTests(ValveAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.valve = make_valve(current_condition=0)
+        self.start = timezone.now() - timedelta(hours=3)
+        checkpoint = write_checkpoint()
+        ValveCheckpoint.objects.filter(pk=checkpoint.pk).update(taken_at=self.start)
+
+    def change(self, at, **data):
+        self.client.patch(f'/api/valve/valves/{self.valve.id}/', data, format='json')
+        ValveLog.objects.filter(timestamp__gt=at).update(timestamp=at)
+
+    def test_replays_logs_up_to_the_requested_time(self):
+        self.change(self.start + timedelta(hours=1), current_condition=100, remarks='opened')
+        self.change(self.start + timedelta(hours=2), current_condition=50)
+
+        snapshot = valve_state_at(self.start + timedelta(minutes=90))
+        state = snapshot['results'][0]
+        self.assertEqual((state['current_condition'], state['remarks'], state['opening']), (100.0, 'opened', 99.8))
+        self.assertEqual(snapshot['replayed_logs'], 2)
+        self.assertTrue(snapshot['complete'])
+
+        self.assertEqual(valve_state_at(self.start)['results'][0]['current_condition'], 0)
+        self.assertEqual(valve_state_at(timezone.now())['results'][0]['opening'], 50.0)
+
+    def test_replays_unconverted_legacy_rows(self):
+        at = self.start + timedelta(hours=1)
+        ValveLog.objects.bulk_create([
+            ValveLog(valve=self.valve, changed_field='latitude', old_value='None', new_value='11,5', timestamp=at),
+            ValveLog(valve=self.valve, changed_field='current_condition', old_value='0', new_value='40.0', timestamp=at),
+        ])
+        ValveLog.objects.filter(valve=self.valve).update(timestamp=at)
+        state = valve_state_at(self.start + timedelta(hours=2))['results'][0]
+        self.assertEqual((state['latitude'], state['current_condition']), (11.5, 40.0))
+
+    def test_endpoint_rejects_times_it_cannot_answer(self):
+        url = '/api/valve/valves/snapshot/'
+        self.assertEqual(self.client.get(url, {'at': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'at': (timezone.now() + timedelta(hours=1)).isoformat()}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'at': (self.start - timedelta(hours=1)).isoformat()}).status_code, 404)
+        response = self.client.get(url, {'at': timezone.now().isoformat()})
+        self.assertEqual((response.status_code, response.data['count']), (200, 1))
+
+
+class GeoTests(ValveAPITestCase):
+    def test_encode_matches_reference_hashes(self):
+        # The worked example from the geohash documentation.
+        self.assertEqual(encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertIsNone(encode(None, 76.2673))
+
+    def test_cover_bounds_use_only_geohash_characters(self):
+        # '{' and similar sentinels sort before digits under MySQL's utf8mb4_0900_ai_ci.
+        for box in ((9.9, 76.2, 10.0, 76.3), (-10, 170, 10, -170), (-90, -180, 90, 180)):
+            for low, high in cover(*box):
+                self.assertTrue(set(low) <= set(BASE32))
+                self.assertTrue(high is None or (set(high) <= set(BASE32) and len(high) == len(low) and low < high))
+
+    def test_bbox_filter_matches_brute_force(self):
+        rng = random.Random(7)
+        for i in range(300):
+            make_valve(f'V{i}', latitude=rng.uniform(9.5, 10.5), longitude=rng.uniform(76.0, 77.0))
+        make_valve('far north', latitude=89.99, longitude=179.99)
+        for south, west, north, east in ((9.8, 76.2, 10.1, 76.6), (9.95, 76.45, 9.96, 76.46), (89, 179, 90, 180)):
+            found = set(Valve.objects.filter(bbox_filter(south, west, north, east)).values_list('id', flat=True))
+            expected = {
+                valve.id for valve in Valve.objects.all()
+                if south <= valve.latitude <= north and west <= valve.longitude <= east
+            }
+            self.assertEqual(found, expected)
+
+    def test_within_and_nearest_endpoints(self):
+        near = make_valve('near', latitude=9.9312, longitude=76.2673)
+        make_valve('far', latitude=10.5, longitude=76.9)
+        make_valve('unlocated')
+        response = self.client.get('/api/valve/valves/within/', {'bbox': '76.2,9.9,76.3,10.0'})
+        self.assertEqual([valve['id'] for valve in response.data['results']], [near.id])
+        for limit in ('0', '-1', 'all'):
+            response = self.client.get('/api/valve/valves/within/', {'bbox': '76.2,9.9,76.3,10.0', 'limit': limit})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/valve/valves/nearest/', {'lat': 9.93, 'lon': 76.26, 'k': 2})
+        self.assertEqual([valve['name'] for valve in response.data], ['near', 'far'])
+        self.assertLess(response.data[0]['distance_m'], 1000)
+
+    def test_migration_encoder_matches_live_one(self):
+        migration = import_module('valves.migrations.0012_backfill_valve_geohash')
+        for lat, lon in ((9.9312, 76.2673), (-90, -180), (90, 180), (0, 0), (-33.86, 151.21)):
+            self.assertEqual(migration.encode(lat, lon), encode(lat, lon))
+
+
+class TileTests(ValveAPITestCase):
+    ZOOM = 12
+
+    def setUp(self):
+        super().setUp()
+        caches['tiles'].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.valve = make_valve(latitude=9.9312, longitude=76.2673)
+        self.home = tiles.tile_for(9.9312, 76.2673, self.ZOOM)
+        self.away = tiles.tile_for(10.5, 76.9, self.ZOOM)
+
+    def count(self, tile):
+        return self.client.get(f'/api/valve/valves/tiles/{self.ZOOM}/{tile[0]}/{tile[1]}/').data['count']
+
+    def test_tiles_follow_a_moved_valve(self):
+        self.assertEqual((self.count(self.home), self.count(self.away)), (1, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/valve/valves/{self.valve.id}/', {'latitude': 10.5, 'longitude': 76.9}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.count(self.home), self.count(self.away)), (0, 1))
+
+        # Model saves (admin, shell) refresh the tile the valve left as well.
+        valve = Valve.objects.get(pk=self.valve.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            valve.latitude, valve.longitude = 9.9312, 76.2673
+            valve.save()
+        self.assertEqual((self.count(self.home), self.count(self.away)), (1, 0))
+
+    def test_build_racing_a_move_is_not_served(self):
+        build = tiles.cluster_tile
+
+        def move_during_build(*args):
+            tile = build(*args)
+            # The valve leaves after the rows were read but before the tile is cached.
+            Valve.objects.filter(pk=self.valve.pk).update(latitude=10.5, longitude=76.9)
+            tiles.invalidate_tiles([(9.9312, 76.2673), (10.5, 76.9)])
+            return tile
+
+        with mock.patch.object(tiles, 'cluster_tile', side_effect=move_during_build):
+            self.assertEqual(self.count(self.home), 1)
+        self.assertEqual(self.count(self.home), 0)
+
+    def test_warmed_tiles_are_served_from_cache(self):
+        make_valve('other', latitude=10.5, longitude=76.9)
+        occupied = sum(
+            len({tiles.tile_for(lat, lon, zoom) for lat, lon in ((9.9312, 76.2673), (10.5, 76.9))})
+            for zoom in range(self.ZOOM + 1)
+        )
+        self.assertEqual(tiles.warm_tiles(Valve.objects.all(), max_zoom=self.ZOOM), occupied)
+        with self.assertNumQueries(0):
+            tile = tiles.get_tile(Valve.objects.all(), self.ZOOM, *self.home)
+        self.assertEqual(tile['count'], 1)
+        self.assertEqual(tiles.get_tile(Valve.objects.all(), 0, 0, 0)['count'], 2)
+
+
+class StreamTests(ValveAPITestCase):
+    def test_events_carry_logs_then_one_delta_per_valve(self):
+        valve = make_valve(current_condition=0)
+        start = ValveLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.client.patch(f'/api/valve/valves/{valve.id}/', {'current_condition': 100, 'remarks': 'open'}, format='json')
+
+        events, last_id, count = fetch_events(start)
+        self.assertEqual(count, 2)
+        self.assertEqual([name for _, name, _ in events], ['log', 'log', 'valve'])
+        logs = {payload['changed_field']: payload for _, name, payload in events if name == 'log'}
+        self.assertEqual((logs['current_condition']['old_value'], logs['current_condition']['new_value']), (0.0, 100.0))
+        event_id, _, delta = events[-1]
+        self.assertEqual(event_id, last_id)
+        self.assertEqual(delta, {
+            'id': valve.id, 'opening': 99.8, 'current_condition': 100.0, 'remarks': 'open', 'previous_position': '0.0',
+        })
+        self.assertEqual(fetch_events(last_id), ([], last_id, 0))
+
+    def test_sse_framing(self):
+        text = format_event(7, 'valve', {'id': 1, 'opening': 50.0})
+        self.assertEqual(text, 'id: 7\nevent: valve\ndata: {"id":1,"opening":50.0}\n\n')
+        self.assertEqual(json.loads(text.split('data: ')[1]), {'id': 1, 'opening': 50.0})
+
+    def test_slow_subscriber_is_told_to_resync(self):
+        hub = ValveEventHub(queue_size=2)
+        queue = asyncio.Queue(maxsize=2)
+        hub._subscribers.add(queue)
+        for batch in ([1], [2], [3]):
+            hub._publish(batch)
+        self.assertEqual((queue.qsize(), queue.get_nowait()), (1, RESYNC))
+
+    def test_stream_requires_a_token(self):
+        self.assertEqual(APIClient().get('/api/valve/stream/').status_code, 401)
+
+
+class CalibrationTests(ValveAPITestCase):
+    def observations(self, valve, steepness, mid_point, noise=0.0, seed=3):
+        rng = random.Random(seed)
+        turns = [5 * i for i in range(21)]
+        openings = opening_percentages(turns, [100] * 21, [mid_point] * 21, [steepness] * 21).tolist()
+        return [
+            {'valve': valve.id, 'turns': n, 'opening': min(max(opening + rng.uniform(-noise, noise), 0), 100)}
+            for n, opening in zip(turns, openings)
+        ]
+
+    def test_recovers_curve_parameters_for_many_valves(self):
+        first, second, sparse = make_valve('A'), make_valve('B'), make_valve('C')
+        rows = (
+            self.observations(first, 8.0, 0.4) + self.observations(second, 20.0, 0.6, noise=1.0)
+            + self.observations(sparse, 8.0, 0.4)[:2]
+        )
+        result = calibrate_valves(*observations_from_rows(rows)[:3])
+        fits = {fit['id']: fit for fit in result['results']}
+        self.assertAlmostEqual(fits[first.id]['steepness'], 8.0, delta=0.1)
+        self.assertAlmostEqual(fits[first.id]['mid_point'], 0.4, delta=0.01)
+        self.assertAlmostEqual(fits[second.id]['steepness'], 20.0, delta=1.5)
+        self.assertAlmostEqual(fits[second.id]['mid_point'], 0.6, delta=0.02)
+        self.assertEqual(fits[sparse.id]['status'], 'insufficient_data')
+        self.assertEqual(result['summary']['fitted'], 2)
+
+    def test_row_errors_name_the_row(self):
+        *_, errors = observations_from_rows([
+            {'valve': 1, 'turns': 10, 'opening': 50},
+            {'valve': 1, 'turns': -1, 'opening': 50},
+            {'valve': 'x', 'turns': 10, 'opening': 50},
+            {'valve': 1, 'turns': 10, 'opening': 150},
+        ])
+        self.assertEqual([error['row'] for error in errors], [2, 3, 4])
+
+    def test_apply_saves_improved_fits_through_the_audit_log(self):
+        valve = make_valve()
+        response = self.client.post('/api/valve/valves/calibrate/', {
+            'observations': self.observations(valve, 8.0, 0.4), 'apply': True,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary']['applied'], 1)
+        valve.refresh_from_db()
+        self.assertAlmostEqual(valve.steepness, 8.0, delta=0.1)
+        self.assertEqual(
+            set(ValveLog.objects.filter(valve=valve).values_list('changed_field', flat=True)), {'mid_point', 'steepness'}
+        )
@@ -0,0 +1,163 @@
+import math
+import numpy as np
+from django.core.cache import caches
+from authapp.cache import new_stamp
+from .geo import bbox_filter
+
+MAX_TILE_ZOOM = 16  # past this the map asks /within/ for individual valves
+CLUSTER_GRID = 8  # each tile aggregates into at most 8 x 8 clusters
+MAX_MERCATOR_LAT = 85.05112878
+TILE_CACHE_TIMEOUT = 60 * 60 * 6  # backstop for edits that bypass invalidation
+# Tiles are cached under their tile's current version stamp. Invalidation replaces
+# the stamp instead of deleting the tile, so a build that raced a valve move
+# lands under a version no reader asks for.
+TILE_KEY = 'valves:tile:{}:{}:{}:{}'
+TILE_VERSION_KEY = 'valves:tile_version:{}:{}:{}'
+
+
+def tile_for(lat, lon, zoom):
+    """Web Mercator (slippy map) tile containing the point."""
+    n = 1 << zoom
+    lat = math.radians(max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat)))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom, x, y):
+    """(south, west, north, east) of a tile in degrees."""
+    n = 1 << zoom
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def _mercator(lats, lons, zoom):
+    """Fractional tile coordinates of arrays of points."""
+    n = 1 << zoom
+    lats = np.radians(np.clip(lats, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    fx = (lons + 180.0) / 360.0 * n
+    fy = (1.0 - np.arcsinh(np.tan(lats)) / np.pi) / 2.0 * n
+    return np.clip(fx, 0, n - 1e-9), np.clip(fy, 0, n - 1e-9)
+
+
+def cluster_tile(zoom, x, y, lats, lons, openings):
+    """
+    Compact payload for one tile: valves binned on a CLUSTER_GRID grid, each
+    cluster as centroid, count and average opening in parallel arrays.
+    """
+    lats, lons, openings = (np.asarray(values, dtype=float) for values in (lats, lons, openings))
+    fx, fy = _mercator(lats, lons, zoom)
+    cells = (
+        np.clip(((fy - y) * CLUSTER_GRID).astype(np.int64), 0, CLUSTER_GRID - 1) * CLUSTER_GRID
+        + np.clip(((fx - x) * CLUSTER_GRID).astype(np.int64), 0, CLUSTER_GRID - 1)
+    )
+    size = CLUSTER_GRID * CLUSTER_GRID
+    counts = np.bincount(cells, minlength=size)
+    used = np.nonzero(counts)[0]
+    count = counts[used]
+
+    def mean(values):
+        return np.bincount(cells, weights=values, minlength=size)[used] / count
+
+    return {
+        'z': zoom, 'x': x, 'y': y,
+        'count': int(count.sum()),
+        'clusters': {
+            'lat': np.round(mean(lats), 5).tolist(),
+            'lon': np.round(mean(lons), 5).tolist(),
+            'count': count.tolist(),
+            'opening': np.round(mean(openings), 1).tolist(),
+        },
+    }
+
+
+def tile_versions(tiles):
+    """Current version stamp of each ``(zoom, x, y)`` tile, creating missing ones."""
+    cache = caches['tiles']
+    keys = {TILE_VERSION_KEY.format(*tile): tile for tile in tiles}
+    versions = cache.get_many(keys)
+    missing = set(keys) - set(versions)
+    if missing:
+        for key in missing:
+            cache.add(key, new_stamp(), timeout=None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_tile(queryset, zoom, x, y):
+    """Cached tile payload for ``queryset`` (all located valves), built on a miss."""
+    cache = caches['tiles']
+    # Read the version before the rows, so a move committed mid-build bumps it past this entry.
+    version = tile_versions([(zoom, x, y)])[(zoom, x, y)]
+    key = TILE_KEY.format(zoom, x, y, version)
+    tile = cache.get(key)
+    if tile is None:
+        south, west, north, east = tile_bounds(zoom, x, y)
+        rows = list(
+            queryset.filter(bbox_filter(south, west, north, east)).values_list('latitude', 'longitude', 'opening')
+        )
+        lats, lons, openings = zip(*rows) if rows else ((), (), ())
+        tile = cluster_tile(zoom, x, y, lats, lons, openings)
+        cache.set(key, tile, TILE_CACHE_TIMEOUT)
+    return tile
+
+
+def _located_rows(queryset):
+    return np.array(
+        list(queryset.exclude(latitude=None).exclude(longitude=None).values_list('latitude', 'longitude', 'opening')),
+        dtype=float,
+    ).reshape(-1, 3)
+
+
+def _group_by_tile(rows, zoom):
+    """``(x, y, row indices)`` for every tile at ``zoom`` holding at least one row."""
+    fx, fy = _mercator(rows[:, 0], rows[:, 1], zoom)
+    tiles = fx.astype(np.int64) * (1 << zoom) + fy.astype(np.int64)
+    order = np.argsort(tiles, kind='stable')
+    boundaries = np.flatnonzero(np.diff(tiles[order])) + 1
+    for group in np.split(order, boundaries) if len(order) else []:
+        x, y = divmod(int(tiles[group[0]]), 1 << zoom)
+        yield x, y, group
+
+
+def warm_tiles(queryset, max_zoom=MAX_TILE_ZOOM):
+    """
+    Build and cache every non-empty tile up to ``max_zoom``, grouping valves by
+    tile with NumPy. Returns the number of tiles written.
+
+    Tile versions are read between a first pass that finds the occupied tiles
+    and the pass that fills them, for the same reason as in get_tile. A tile
+    that only became occupied in between is left to be built on demand.
+    """
+    rows = _located_rows(queryset)
+    versions = tile_versions([
+        (zoom, x, y) for zoom in range(max_zoom + 1) for x, y, _ in _group_by_tile(rows, zoom)
+    ])
+    rows = _located_rows(queryset)
+    written = 0
+    for zoom in range(max_zoom + 1):
+        payloads = {
+            TILE_KEY.format(zoom, x, y, versions[zoom, x, y]): cluster_tile(
+                zoom, x, y, rows[group, 0], rows[group, 1], rows[group, 2]
+            )
+            for x, y, group in _group_by_tile(rows, zoom)
+            if (zoom, x, y) in versions
+        }
+        caches['tiles'].set_many(payloads, TILE_CACHE_TIMEOUT)
+        written += len(payloads)
+    return written
+
+
+def invalidate_tiles(points):
+    """Move the tiles, at every zoom, containing any of ``points`` [(lat, lon), ...] to new versions."""
+    keys = {
+        TILE_VERSION_KEY.format(zoom, *tile_for(lat, lon, zoom))
+        for lat, lon in points
+        if lat is not None and lon is not None
+        for zoom in range(MAX_TILE_ZOOM + 1)
+    }
+    if keys:
+        caches['tiles'].set_many({key: new_stamp() for key in keys}, timeout=None)
@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ValveViewSet, ValveLogViewSet
+from .views import ValveViewSet, ValveLogViewSet, ValveLogSummaryViewSet, valve_stream
 
 router = DefaultRouter()
 router.register(r'valves', ValveViewSet)
 router.register(r'logs', ValveLogViewSet)
+router.register(r'log-summaries', ValveLogSummaryViewSet)
 
 urlpatterns = [
+    path('stream/', valve_stream, name='valve-stream'),
     path('', include(router.urls)),
 ]
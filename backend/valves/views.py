@@ -1,30 +1,306 @@
-from rest_framework import viewsets
+import csv
+import io
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django_filters.rest_framework import DjangoFilterBackend, FilterSet, CharFilter
-from .models import Valve, ValveLog
-from .serializers import ValveSerializer, ValveLogSerializer
+from django_filters.rest_framework import DjangoFilterBackend, FilterSet, CharFilter, NumberFilter, DateFilter, DateTimeFilter
+from rest_framework.filters import OrderingFilter
+from rest_framework.exceptions import AuthenticationFailed
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Valve, ValveLog, ValveLogSummary
+from .serializers import ValveSerializer, ValveLogSerializer, ValveLogSummarySerializer, ValveSimulationSerializer
+from .engine import CURVE_FIELDS, load_curve_arrays, simulate_openings
+from .changes import apply_valve_changes
+from .snapshots import valve_state_at
+from .stream import stream_events
+from authapp.authentication import CachedJWTAuthentication
+from .geo import bbox_filter, nearest
+from .tiles import MAX_TILE_ZOOM, get_tile
+from .calibration import calibrate_valves, observations_from_rows
+from .pagination import ValveLogCursorPagination, ValveLogSummaryCursorPagination
+from authapp.permissions import has_permission
 from .permissions import HasDeletePermission
 
 class ValveFilter(FilterSet):
     name = CharFilter(field_name='name', lookup_expr='icontains')
+    opening_gte = NumberFilter(field_name='opening', lookup_expr='gte')
+    opening_lte = NumberFilter(field_name='opening', lookup_expr='lte')
 
     class Meta:
         model = Valve
-        fields = ['name']
+        fields = ['name', 'opening_gte', 'opening_lte']
+
+class ValveLogFilter(FilterSet):
+    timestamp_gte = DateTimeFilter(field_name='timestamp', lookup_expr='gte')
+    timestamp_lte = DateTimeFilter(field_name='timestamp', lookup_expr='lte')
+
+    class Meta:
+        model = ValveLog
+        fields = ['timestamp_gte', 'timestamp_lte']
+
+class ValveLogSummaryFilter(FilterSet):
+    day_gte = DateFilter(field_name='day', lookup_expr='gte')
+    day_lte = DateFilter(field_name='day', lookup_expr='lte')
+    changed_field = CharFilter(field_name='changed_field')
+
+    class Meta:
+        model = ValveLogSummary
+        fields = ['day_gte', 'day_lte', 'changed_field']
 
 class ValveViewSet(viewsets.ModelViewSet):
     queryset = Valve.objects.all()
     serializer_class = ValveSerializer
     permission_classes = [IsAuthenticated, HasDeletePermission]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = ValveFilter
+    ordering_fields = ['name', 'opening']
     page_name = 'valves'
 
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """
+        Update many valves at once, e.g. closing every valve around a burst.
+        Body: ``{"valves": [{"id": 1, "current_condition": 0}, ...]}``.
+        All entries are validated first; either every change is applied or none.
+        """
+        if not has_permission(request.user, self.page_name, 'can_edit', request.auth):
+            return Response(
+                {'detail': 'You do not have permission to edit valves.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        items = request.data.get('valves') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            return Response({'valves': ['A non-empty list of valve changes is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        ids = [item.get('id') for item in items]
+        # bool is an int subclass; {"id": true} must not address valve 1.
+        if not all(type(valve_id) is int for valve_id in ids) or len(ids) != len(set(ids)):
+            return Response({'valves': ['Every entry needs a distinct integer id.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Rows stay locked (in id order, so overlapping batches cannot deadlock)
+        # until the changes commit; a concurrent edit waits and diffs against ours.
+        with transaction.atomic():
+            valves = {valve.id: valve for valve in Valve.objects.select_for_update().filter(id__in=ids).order_by('id')}
+            missing = sorted(set(ids) - set(valves))
+            if missing:
+                return Response({'valves': [f"Valves not found: {missing}"]}, status=status.HTTP_400_BAD_REQUEST)
+
+            changes, errors = [], {}
+            for item in items:
+                data = {key: value for key, value in item.items() if key != 'id'}
+                serializer = self.get_serializer(valves[item['id']], data=data, partial=True)
+                if serializer.is_valid():
+                    changes.append((serializer.instance, serializer.validated_data))
+                else:
+                    errors[item['id']] = serializer.errors
+            if errors:
+                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            updated, _ = apply_valve_changes(changes, request.user)
+        return Response(self.get_serializer(updated, many=True).data)
+
+    @action(detail=False, methods=['get', 'post'])
+    def openings(self, request):
+        """
+        Opening percentages for many valves in one vectorized pass.
+        GET uses the list filters; POST may restrict to ``ids`` and apply
+        hypothetical ``changes`` (e.g. set 200 valves to N turns) without saving.
+        """
+        serializer = ValveSimulationSerializer(data=request.data if request.method == 'POST' else {})
+        serializer.is_valid(raise_exception=True)
+        queryset = self.filter_queryset(self.get_queryset())
+        if 'ids' in serializer.validated_data:
+            queryset = queryset.filter(id__in=serializer.validated_data['ids'])
+        ids, arrays = load_curve_arrays(queryset)
+
+        changes = serializer.validated_data.get('changes', [])
+        unknown = {valve_id for change in changes for valve_id in change['ids']} - set(ids.tolist())
+        if unknown:
+            return Response(
+                {'changes': [f"Unknown or filtered-out valve ids: {sorted(unknown)}"]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        arrays, openings = simulate_openings(ids, arrays, changes)
+        return Response({
+            'count': len(ids),
+            'simulated': bool(changes),
+            'results': [
+                {'id': valve_id, **dict(zip(CURVE_FIELDS, values)), 'opening': opening}
+                for valve_id, *values, opening in zip(
+                    ids.tolist(), *(arrays[field].tolist() for field in CURVE_FIELDS), openings.tolist()
+                )
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    def snapshot(self, request):
+        """
+        State of every valve at ``?at=<ISO datetime>``, rebuilt from the nearest
+        earlier checkpoint plus the ValveLog rows written since.
+        """
+        at = parse_datetime(request.query_params.get('at', ''))
+        if at is None:
+            return Response({'error': 'Query parameter "at" must be an ISO 8601 datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        if at > timezone.now():
+            return Response({'error': 'Snapshots cannot be taken in the future.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        snapshot = valve_state_at(at)
+        if snapshot is None:
+            return Response({'error': 'No valve checkpoint exists before that time.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'at': at, 'count': len(snapshot['results']), **snapshot})
+
+    @action(detail=False, methods=['get'])
+    def within(self, request):
+        """
+        Valves inside ``?bbox=west,south,east,north`` (degrees), e.g. the map viewport.
+        Uses the geohash index; combines with the list filters.
+        """
+        try:
+            west, south, east, north = (float(value) for value in request.query_params.get('bbox', '').split(','))
+        except ValueError:
+            return Response({'error': 'bbox must be "west,south,east,north" in degrees.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            return Response({'error': 'bbox is out of range.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 5000))
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be at least 1.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, 5000)
+
+        queryset = self.filter_queryset(self.get_queryset()).filter(bbox_filter(south, west, north, east))
+        valves = list(queryset[:limit + 1])
+        return Response({
+            'truncated': len(valves) > limit,
+            'results': self.get_serializer(valves[:limit], many=True).data,
+        })
+
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """The ``?k=`` (default 10, max 100) valves closest to ``?lat=&lon=``, with distances in metres."""
+        try:
+            lat = float(request.query_params['lat'])
+            lon = float(request.query_params['lon'])
+            k = int(request.query_params.get('k', 10))
+        except (KeyError, ValueError):
+            return Response({'error': 'lat and lon are required numbers; k must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or not 1 <= k <= 100:
+            return Response({'error': 'lat, lon or k is out of range.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        found = nearest(self.filter_queryset(self.get_queryset()), lat, lon, k)
+        valves = Valve.objects.in_bulk([valve_id for valve_id, _ in found])
+        return Response([
+            {**self.get_serializer(valves[valve_id]).data, 'distance_m': round(distance, 1)}
+            for valve_id, distance in found
+        ])
+
+    @action(detail=False, methods=['get'], url_path=r'tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)')
+    def tiles(self, request, z, x, y):
+        """
+        Clustered map tile ``z/x/y`` (Web Mercator): per cluster centroid, valve
+        count and average opening. Covers every located valve; list filters do
+        not apply because tiles are cached and shared.
+        """
+        z, x, y = int(z), int(x), int(y)
+        if z > MAX_TILE_ZOOM or x >= 1 << z or y >= 1 << z:
+            return Response(
+                {'error': f'Tiles exist for zoom 0-{MAX_TILE_ZOOM} with x and y below 2^zoom.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(get_tile(Valve.objects.all(), z, x, y))
+
+    @action(detail=False, methods=['post'])
+    def calibrate(self, request):
+        """
+        Fit mid_point and steepness per valve from field readings, all valves in
+        one vectorized pass. Send ``{"observations": [{"valve", "turns", "opening"}, ...]}``
+        or a CSV ``file`` with those columns. ``apply=true`` saves improved fits
+        through the ValveLog audit path and needs edit permission.
+        """
+        apply = str(request.data.get('apply', '')).lower() in ('true', '1')
+        if apply and not has_permission(request.user, self.page_name, 'can_edit', request.auth):
+            return Response(
+                {'detail': 'You do not have permission to edit valves.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        upload = request.FILES.get('file')
+        if upload is not None:
+            rows = csv.DictReader(io.TextIOWrapper(upload.file, encoding='utf-8-sig'))
+        else:
+            rows = request.data.get('observations')
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                return Response(
+                    {'observations': ['Send a list of {valve, turns, opening} objects or a CSV file.']},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        valve_ids, turns, openings, errors = observations_from_rows(rows)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        if not len(valve_ids):
+            return Response({'observations': ['No observations were sent.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = calibrate_valves(valve_ids, turns, openings, apply=apply, user=request.user)
+        if 'unknown' in result:
+            return Response(
+                {'observations': [f"Valves not found: {result['unknown']}"]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(result)
+
 class ValveLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = ValveLog.objects.all()
     serializer_class = ValveLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ValveLogCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ValveLogFilter
 
     def get_queryset(self):
         valve_id = self.request.query_params.get('valve_id')
         return ValveLog.objects.filter(valve_id=valve_id)
+
+class ValveLogSummaryViewSet(viewsets.ReadOnlyModelViewSet):
+    """Per-day history for entries rolled up by the compact_valve_logs command."""
+    queryset = ValveLogSummary.objects.all()
+    serializer_class = ValveLogSummarySerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ValveLogSummaryCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ValveLogSummaryFilter
+
+    def get_queryset(self):
+        valve_id = self.request.query_params.get('valve_id')
+        return ValveLogSummary.objects.filter(valve_id=valve_id)
+
+def _authenticate_stream(request):
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+async def valve_stream(request):
+    """
+    Server-sent events with valve deltas and new ValveLog entries. Needs the
+    ASGI app; send the JWT in the Authorization header and, when reconnecting,
+    Last-Event-ID to resume. A ``resync`` event means reload the valve list.
+    """
+    user = await sync_to_async(_authenticate_stream)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+
+    last_event_id = request.headers.get('Last-Event-ID')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    response = StreamingHttpResponse(stream_events(last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -84,37 +84,27 @@ const PrivateRoute = ({ element, requiredPage, requiredAction = 'view' }) => {
       }
 
       try {
-        const response = await apiClient.get('/auth/profile/');
-        const user = response.data;
+        const response = await apiClient.get('/auth/session/');
+        const { user, role, permissions: rolePermissions } = response.data;
         console.log('User Data:', user);
 
         setIsAuthenticated(true);
 
-        if (user.is_superuser || user.role?.name === 'Superadmin') {
+        if (user.is_superuser || role?.name === 'Superadmin') {
           console.log('User is superadmin, granting all access');
           setPermissions({ can_view: true, can_add: true, can_edit: true, can_delete: true });
           return;
         }
 
-        const roleId = user.role?.id;
-        if (!roleId) {
+        if (!role?.id) {
           console.warn('No role ID found, denying access');
           setPermissions({});
           return;
         }
 
-        try {
-          const roleResponse = await apiClient.get(`/auth/roles/${roleId}/`);
-          const perms = roleResponse.data.permissions || [];
-          console.log(`Permissions for role ${roleId}:`, perms);
-          const pagePerm = perms.find((p) => p.page === requiredPage);
-          const permObj = pagePerm || { can_view: false, can_add: false, can_edit: false, can_delete: false };
-          console.log(`Permission for ${requiredPage}:`, permObj);
-          setPermissions(permObj);
-        } catch (error) {
-          console.error('Role fetch error:', error.response?.status, error.response?.data);
-          setPermissions({});
-        }
+        const permObj = rolePermissions[requiredPage] || { can_view: false, can_add: false, can_edit: false, can_delete: false };
+        console.log(`Permission for ${requiredPage}:`, permObj);
+        setPermissions(permObj);
       } catch (error) {
         console.error('Auth check failed:', error.response?.status, error.response?.data);
         setIsAuthenticated(false);
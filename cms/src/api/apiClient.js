@@ -37,17 +37,20 @@ apiClient.interceptors.response.use(
           throw new Error("No refresh token available");
         }
         const response = await axios.post(
-          "https://backend.oandmkwa.com/api/token/refresh/",
+          "https://backend.oandmkwa.com/api/auth/token/refresh/",
           {
             refresh: refreshToken,
           }
         );
-        const { access } = response.data;
+        const { access, refresh } = response.data;
 
+        // Refresh tokens are rotated and the old one revoked, so keep the new one.
         if (localStorage.getItem("refresh_token")) {
           localStorage.setItem("access_token", access);
+          localStorage.setItem("refresh_token", refresh);
         } else if (sessionStorage.getItem("refresh_token")) {
           sessionStorage.setItem("access_token", access);
+          sessionStorage.setItem("refresh_token", refresh);
         }
         originalRequest.headers.Authorization = `Bearer ${access}`;
         return apiClient(originalRequest);
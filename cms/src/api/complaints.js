@@ -0,0 +1,20 @@
+import apiClient from "./apiClient";
+
+/**
+ * Fetch one page of /complaint/complaints/. The list is keyset-paginated, so
+ * the following page is requested with the cursor taken from the `next` link.
+ * Resolves to { results, count, countIsExact, nextCursor }.
+ */
+const fetchComplaintPage = async (params, cursor = null) => {
+  const query = new URLSearchParams(params);
+  if (cursor) query.set("cursor", cursor);
+  const { data } = await apiClient.get(`/complaint/complaints/?${query.toString()}`);
+  return {
+    results: data.results,
+    count: data.count,
+    countIsExact: data.count_is_exact,
+    nextCursor: data.next ? new URL(data.next).searchParams.get("cursor") : null,
+  };
+};
+
+export default fetchComplaintPage;
@@ -0,0 +1,75 @@
+import apiClient from "./apiClient";
+
+const RETRY_DELAY = 3000;
+
+const getToken = () =>
+  localStorage.getItem("access_token") || sessionStorage.getItem("access_token");
+
+// Splits a server-sent events buffer into complete events; returns the leftover text.
+const parseEvents = (buffer, onEvent) => {
+  const blocks = buffer.split("\n\n");
+  const rest = blocks.pop();
+  blocks.forEach((block) => {
+    const event = { id: null, name: "message", data: "" };
+    block.split("\n").forEach((line) => {
+      if (line.startsWith("id: ")) event.id = line.slice(4);
+      else if (line.startsWith("event: ")) event.name = line.slice(7);
+      else if (line.startsWith("data: ")) event.data += line.slice(6);
+    });
+    if (event.data) onEvent(event);
+  });
+  return rest;
+};
+
+/**
+ * Subscribe to /valve/stream/. Uses fetch rather than EventSource so the JWT can
+ * go in the Authorization header. Reconnects with Last-Event-ID after errors.
+ * Returns a function that closes the stream.
+ */
+const subscribeValveStream = ({ onValve, onLog, onResync }) => {
+  const controller = new AbortController();
+  let lastEventId = null;
+
+  const handleEvent = (event) => {
+    if (event.id) lastEventId = event.id;
+    const payload = JSON.parse(event.data);
+    if (event.name === "valve" && onValve) onValve(payload);
+    else if (event.name === "log" && onLog) onLog(payload);
+    else if (event.name === "resync" && onResync) onResync();
+  };
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const headers = { Authorization: `Bearer ${getToken()}` };
+        if (lastEventId) headers["Last-Event-ID"] = lastEventId;
+        const response = await fetch(`${apiClient.defaults.baseURL}/valve/stream/`, {
+          headers,
+          signal: controller.signal,
+        });
+        if (response.status === 401) {
+          // Let the shared client refresh the access token, then reconnect.
+          await apiClient.get("/auth/session/").catch(() => {});
+        } else if (response.ok) {
+          const reader = response.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = "";
+          for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer = parseEvents(buffer + decoder.decode(value, { stream: true }), handleEvent);
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error("Valve stream disconnected:", error);
+      }
+      await new Promise((resolve) => setTimeout(resolve, RETRY_DELAY));
+    }
+  };
+
+  connect();
+  return () => controller.abort();
+};
+
+export default subscribeValveStream;
@@ -248,16 +248,12 @@ const Sidebar = ({ isOpen, toggleSidebar }) => {
   useEffect(() => {
     const fetchProfile = async () => {
       try {
-        const response = await apiClient.get('/auth/profile/');
-        const user = response.data;
-        setIsSuperadmin(user.is_superuser || user.role?.name === 'Superadmin');
-        const roleId = user.role?.id;
-        if (roleId) {
-          const res = await apiClient.get(`/auth/roles/${roleId}/`);
-          setPermissions(res.data.permissions || []);
-        } else {
-          setPermissions([]);
-        }
+        const response = await apiClient.get('/auth/session/');
+        const { user, role, permissions: rolePermissions } = response.data;
+        setIsSuperadmin(user.is_superuser || role?.name === 'Superadmin');
+        setPermissions(
+          Object.entries(rolePermissions || {}).map(([page, perm]) => ({ page, ...perm }))
+        );
       } catch (error) {
         setError('Unable to fetch user profile. Some features may not be available.');
         setPermissions([]);
@@ -81,31 +81,27 @@ const Permissions = () => {
 
   const saveModalPermissions = async () => {
     try {
-      for (const perm of modalPermissions) {
-        const data = {
-          role: selectedRoleId,
+      const data = {
+        role: selectedRoleId,
+        permissions: modalPermissions.map((perm) => ({
           page: perm.page,
           can_view: perm.can_view,
           can_add: perm.can_add,
           can_edit: perm.can_edit,
           can_delete: perm.can_delete,
           is_login_page: false,
-        };
-        console.log(`Saving permission for ${perm.page}:`, data);
-
-        if (perm.id) {
-          await apiClient.put(`/auth/permissions/${perm.id}/`, data);
-        } else {
-          await apiClient.post('/auth/permissions/', data);
-        }
-      }
+        })),
+      };
+      console.log('Saving permissions:', data);
+      const response = await apiClient.post('/auth/permissions/bulk/', data);
       setSuccess('Permissions saved successfully');
       setIsModalOpen(false);
       setSelectedRoleId(null);
       setModalPermissions([]);
-      const permissionsResponse = await apiClient.get('/auth/permissions/list/');
-      console.log('Updated permissions:', permissionsResponse.data);
-      setPermissions(permissionsResponse.data);
+      setPermissions((prev) => [
+        ...prev.filter((perm) => perm.role !== selectedRoleId),
+        ...response.data,
+      ]);
     } catch (error) {
       setWarnings({
         ...warnings,
@@ -3,7 +3,7 @@ import apiClient from '../../../api/apiClient';
 
 const UserRoles = () => {
   const [users, setUsers] = useState([]);
-  const [filteredUsers, setFilteredUsers] = useState([]);
+  const [nextUsersUrl, setNextUsersUrl] = useState(null);
   const [roles, setRoles] = useState([]);
   const [permissions, setPermissions] = useState([]); 
   const [hasDeletePermission, setHasDeletePermission] = useState(true); 
@@ -47,25 +47,28 @@ const UserRoles = () => {
     }
   }, [warnings]);
 
-  const fetchUsers = useCallback(async () => {
+  // One cursor page at a time; search and role filtering happen on the server.
+  const fetchUsers = useCallback(async (url, params) => {
     try {
-      const response = await apiClient.get('/auth/users/');
-      setUsers(response.data || []);
-      setFilteredUsers(response.data || []);
+      const response = await apiClient.get(url, { params });
+      const { results, roles, next } = response.data;
+      return {
+        results: results.map((user) => ({ ...user, role: roles[user.role_id] || null })),
+        next,
+      };
     } catch (error) {
       if (error.response?.status === 403) {
         console.warn('User lacks permission to fetch users');
-        setUsers([]);
-        setFilteredUsers([]);
       } else {
         console.error('Failed to fetch users:', error);
-        setWarnings({
-          ...warnings,
+        setWarnings((prev) => ({
+          ...prev,
           general: 'Failed to fetch users. Please try again.',
-        });
+        }));
       }
+      return null;
     }
-  }, [warnings]);
+  }, []);
 
   const fetchProfile = useCallback(async () => {
     try {
@@ -98,7 +101,7 @@ const UserRoles = () => {
 
     const loadData = async () => {
       if (isMounted) {
-        await Promise.all([fetchRoles(), fetchUsers(), fetchProfile(), fetchPermissions()]);
+        await Promise.all([fetchRoles(), fetchProfile(), fetchPermissions()]);
       }
     };
 
@@ -107,7 +110,7 @@ const UserRoles = () => {
     return () => {
       isMounted = false;
     };
-  }, [fetchRoles, fetchUsers, fetchProfile, fetchPermissions]);
+  }, [fetchRoles, fetchProfile, fetchPermissions]);
 
   useEffect(() => {
     if (roleId && permissions.length > 0) {
@@ -119,23 +122,29 @@ const UserRoles = () => {
   }, [roleId, permissions]);
 
   useEffect(() => {
-    let filtered = users;
-
-    if (searchQuery) {
-      const query = searchQuery.toLowerCase();
-      filtered = filtered.filter(user =>
-        (user.first_name?.toLowerCase() || '').includes(query) ||
-        (user.last_name?.toLowerCase() || '').includes(query) ||
-        (user.username?.toLowerCase() || '').includes(query)
-      );
-    }
+    let isCurrent = true;
+    const params = {};
+    if (searchQuery) params.search = searchQuery;
+    if (selectedRoleId) params.role = selectedRoleId;
+
+    fetchUsers('/auth/users/', params).then((page) => {
+      // A slower response for an earlier filter must not overwrite this one.
+      if (!isCurrent) return;
+      setUsers(page?.results || []);
+      setNextUsersUrl(page?.next || null);
+    });
 
-    if (selectedRoleId) {
-      filtered = filtered.filter(user => user.role?.id === parseInt(selectedRoleId));
-    }
+    return () => {
+      isCurrent = false;
+    };
+  }, [searchQuery, selectedRoleId, fetchUsers]);
 
-    setFilteredUsers(filtered);
-  }, [users, searchQuery, selectedRoleId]);
+  const loadMoreUsers = async () => {
+    const page = await fetchUsers(nextUsersUrl);
+    if (!page) return;
+    setUsers((prev) => [...prev, ...page.results]);
+    setNextUsersUrl(page.next);
+  };
 
   const handleChange = (e) => {
     const { name, value } = e.target;
@@ -472,7 +481,7 @@ const UserRoles = () => {
               </tr>
             </thead>
             <tbody>
-              {filteredUsers.map(user => (
+              {users.map(user => (
                 <tr key={user.id} className="bg-white border-b">
                   <td className="px-6 py-4">{user.email}</td>
                   <td className="px-6 py-4">{user.username}</td>
@@ -500,6 +509,16 @@ const UserRoles = () => {
             </tbody>
           </table>
         </div>
+        {nextUsersUrl && (
+          <div className="mt-4 text-center">
+            <button
+              onClick={loadMoreUsers}
+              className="px-6 py-2 bg-gray-200 text-gray-800 hover:bg-gray-300 text-sm font-medium rounded-sm transition-all duration-300"
+            >
+              Load more
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
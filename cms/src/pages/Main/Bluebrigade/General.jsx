@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from "react";
 import apiClient from "../../../api/apiClient";
+import fetchComplaintPage from "../../../api/complaints";
 import { useAlert } from "../../../context/AlertContext";
 import DatePicker from "react-datepicker";
 import "react-datepicker/dist/react-datepicker.css";
@@ -11,7 +12,9 @@ const GeneralBlueBrigade = () => {
   const [statusFilter, setStatusFilter] = useState("");
   const [startDate, setStartDate] = useState(null);
   const [endDate, setEndDate] = useState(null);
-  const [useApiFiltering, setUseApiFiltering] = useState(false);
+  const [useApiFiltering, setUseApiFiltering] = useState(true);
+  const [listQuery, setListQuery] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
   const [hasEditPermission, setHasEditPermission] = useState(false);
   const [hasDeletePermission, setHasDeletePermission] = useState(false);
   const [loading, setLoading] = useState(true);
@@ -67,10 +70,12 @@ const GeneralBlueBrigade = () => {
           if (endDate) params.append("date__lte", endDate.toISOString().split("T")[0]);
         }
 
-        const response = await apiClient.get(`/complaint/complaints/?${params.toString()}`);
-        let filtered = response.data;
+        const page = await fetchComplaintPage(params);
+        setListQuery(params.toString());
+        setNextCursor(page.nextCursor);
+        let filtered = page.results;
         if (!useApiFiltering) {
-          filtered = response.data.filter(
+          filtered = page.results.filter(
             (complaint) => complaint.complaint_type === "general" && complaint.department === "bluebrigade"
           );
           if (statusFilter) filtered = filtered.filter((complaint) => complaint.status === statusFilter);
@@ -83,7 +88,7 @@ const GeneralBlueBrigade = () => {
           });
         }
 
-        setComplaints(response.data);
+        setComplaints(page.results);
         setFilteredComplaints(filtered);
       } catch (error) {
         console.error("Error fetching complaints:", error);
@@ -96,6 +101,18 @@ const GeneralBlueBrigade = () => {
     fetchComplaints();
   }, [sortOrder, statusFilter, startDate, endDate, useApiFiltering]);
 
+  const loadMore = async () => {
+    try {
+      const page = await fetchComplaintPage(listQuery, nextCursor);
+      setNextCursor(page.nextCursor);
+      setComplaints((prev) => [...prev, ...page.results]);
+      setFilteredComplaints((prev) => [...prev, ...page.results]);
+    } catch (error) {
+      console.error("Error fetching complaints:", error);
+      showAlert("Failed to fetch complaints.", "error");
+    }
+  };
+
   const handleStatusChange = (complaintId, newStatus) => {
     if (!hasEditPermission) {
       showAlert("You do not have permission to edit complaint status.", "error");
@@ -303,6 +320,16 @@ const GeneralBlueBrigade = () => {
               ))}
             </tbody>
           </table>
+          {nextCursor && (
+            <div className="mt-4 text-center">
+              <button
+                onClick={loadMore}
+                className="bg-blue-500 text-white px-4 py-2 rounded hover:bg-blue-600"
+              >
+                Load more
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from "react";
 import apiClient from "../../../api/apiClient";
+import fetchComplaintPage from "../../../api/complaints";
 import { useAlert } from "../../../context/AlertContext";
 import DatePicker from "react-datepicker";
 import "react-datepicker/dist/react-datepicker.css";
@@ -17,7 +18,10 @@ const ViewComplaints = () => {
   const [permissions, setPermissions] = useState([]);
   const [isSuperadmin, setIsSuperadmin] = useState(false);
   const { showAlert } = useAlert();
-  const [useApiFiltering, setUseApiFiltering] = useState(false);
+  const [useApiFiltering, setUseApiFiltering] = useState(true);
+  const [listQuery, setListQuery] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalCount, setTotalCount] = useState(null);
 
   const statusOptions = [
     { value: "completed", label: "Completed" },
@@ -65,7 +69,7 @@ const ViewComplaints = () => {
             params.append("date__lte", endDate.toISOString().split("T")[0]);
           }
           if (searchQuery) {
-            params.append("name", searchQuery);
+            params.append("q", searchQuery);
           }
           if (departmentFilter) {
             params.append("department", departmentFilter);
@@ -75,17 +79,17 @@ const ViewComplaints = () => {
           }
         }
 
-        const response = await apiClient.get(
-          `/complaint/complaints/?${params.toString()}`
-        );
-        console.log("Fetched complaints:", response.data);
-        setComplaints(response.data);
-        setFilteredComplaints(response.data);
+        const page = await fetchComplaintPage(params);
+        setListQuery(params.toString());
+        setNextCursor(page.nextCursor);
+        setTotalCount(page.countIsExact ? `${page.count}` : `about ${page.count}`);
+        setComplaints(page.results);
+        setFilteredComplaints(page.results);
 
-        const uniqueDepartments = [
-          ...new Set(response.data.map((complaint) => complaint.department)),
-        ];
-        setDepartments(uniqueDepartments);
+        // Keep departments seen on earlier loads so the filter can be changed back.
+        setDepartments((prev) => [
+          ...new Set([...prev, ...page.results.map((complaint) => complaint.department)]),
+        ]);
       } catch (error) {
         console.error("Error fetching complaints:", error);
         showAlert("Failed to fetch complaints.", "error");
@@ -103,6 +107,18 @@ const ViewComplaints = () => {
     useApiFiltering,
   ]);
 
+  const loadMore = async () => {
+    try {
+      const page = await fetchComplaintPage(listQuery, nextCursor);
+      setNextCursor(page.nextCursor);
+      setComplaints((prev) => [...prev, ...page.results]);
+      setFilteredComplaints((prev) => [...prev, ...page.results]);
+    } catch (error) {
+      console.error("Error fetching complaints:", error);
+      showAlert("Failed to fetch complaints.", "error");
+    }
+  };
+
   useEffect(() => {
     if (useApiFiltering) return;
 
@@ -224,12 +240,12 @@ const ViewComplaints = () => {
       {/* Filters */}
       <div className="mb-6 flex flex-col gap-4 sm:flex-row sm:flex-wrap sm:gap-4">
         <div className="flex flex-col sm:flex-row sm:items-center gap-2">
-          <label className="text-sm font-semibold text-gray-700">Search by Name:</label>
+          <label className="text-sm font-semibold text-gray-700">Search:</label>
           <input
             type="text"
             value={searchQuery}
             onChange={(e) => setSearchQuery(e.target.value)}
-            placeholder="Enter name"
+            placeholder="Name, phone, address or ticket"
             className="w-full sm:w-48 p-2 text-sm border border-gray-200 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-300"
           />
         </div>
@@ -436,6 +452,22 @@ const ViewComplaints = () => {
           </div>
         ))}
       </div>
+
+      {nextCursor && (
+        <div className="mt-4 text-center">
+          <button
+            onClick={loadMore}
+            className="bg-blue-500 text-white px-4 py-2 rounded hover:bg-blue-600"
+          >
+            Load more
+          </button>
+        </div>
+      )}
+      {totalCount && (
+        <p className="mt-2 text-center text-sm text-gray-500">
+          Showing {filteredComplaints.length} of {totalCount} complaints
+        </p>
+      )}
     </div>
   );
 };
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from "react";
 import apiClient from "../../../api/apiClient";
+import subscribeValveStream from "../../../api/valveStream";
 
 const ViewValves = () => {
   const [valves, setValves] = useState([]);
@@ -14,6 +15,7 @@ const ViewValves = () => {
   const [useApiFiltering, setUseApiFiltering] = useState(false);
   const [userPermissions, setUserPermissions] = useState({});
   const [isSuperadmin, setIsSuperadmin] = useState(false);
+  const [reloadKey, setReloadKey] = useState(0);
 
   useEffect(() => {
     const fetchValves = async () => {
@@ -29,7 +31,20 @@ const ViewValves = () => {
     };
 
     fetchValves();
-  }, [searchQuery, useApiFiltering]);
+  }, [searchQuery, useApiFiltering, reloadKey]);
+
+  // Live changes from other operators, applied in place instead of re-fetching the list.
+  useEffect(() => {
+    const applyDelta = (delta) => (valve) => (valve.id === delta.id ? { ...valve, ...delta } : valve);
+    return subscribeValveStream({
+      onValve: (delta) => {
+        setValves((current) => current.map(applyDelta(delta)));
+        setFilteredValves((current) => current.map(applyDelta(delta)));
+        setSelectedValve((current) => (current ? applyDelta(delta)(current) : current));
+      },
+      onResync: () => setReloadKey((key) => key + 1),
+    });
+  }, []);
 
   useEffect(() => {
     if (useApiFiltering) return;
@@ -169,7 +184,7 @@ const ViewValves = () => {
     apiClient
       .get(`/valve/logs/?valve_id=${valveId}`)
       .then((response) => {
-        setLogs(response.data);
+        setLogs(response.data.results);
         setShowLogs(true);
         setSelectedValve(null);
         setShowAllLogs(false);